@@ -15,6 +15,10 @@ export async function POST(req: NextRequest) {
       // Create a Blob from the text content
       const blob = new Blob([data.text], { type: "text/plain" });
       formData.append("files", blob, "diff_report.txt");
+      // One index per project / API pair; omitted = the backend's "default" collection
+      if (data.collection) {
+        formData.append("collection", data.collection);
+      }
 
       const response = await fetch(`${RAG_BACKEND_URL}/ingest`, {
         method: "POST",
@@ -41,6 +45,7 @@ export async function POST(req: NextRequest) {
         },
         body: JSON.stringify({
           query: data.query,
+          collection: data.collection || undefined,
           top_k: data.top_k || 5,
           max_new_tokens: data.max_new_tokens || 256,
           temperature: data.temperature || 0.3,
@@ -0,0 +1,106 @@
+"""
+Recall@k vs. latency report for the VectorStore index types.
+
+Compares flat / SQ8 / IVF-Flat / IVF-PQ / HNSW against exact (flat) search on either
+the ingested corpus or a synthetic set of vectors.
+
+  python ann_report.py                       # vectors from data/index.faiss
+  python ann_report.py --synthetic 200000    # random clustered vectors
+  python ann_report.py --json report.json
+"""
+import argparse, json, time
+from typing import Dict, List
+import numpy as np
+import faiss
+
+from rag import VectorStore, INDEX_PARAMS, make_index, set_search_params
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Clustered data behaves more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 500), dim)).astype("float32")
+    X = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(X)
+    return X
+
+def corpus_vectors() -> np.ndarray:
+    vs = VectorStore()
+    vs.load()
+    return vs._vectors(np.array(vs._open_store().vectors(), dtype="int64")).astype("float32")
+
+def evaluate(X: np.ndarray, Q: np.ndarray, k: int, configs: List[Dict]) -> List[Dict]:
+    """
+    configs: [{"type": ..., build params..., "search": [{"nprobe": 8}, ...]}]
+    Each index is built once and measured under every search setting.
+    """
+    exact = faiss.IndexFlatIP(X.shape[1])
+    exact.add(X)
+    _, truth = exact.search(Q, k)
+    ids = np.arange(len(X), dtype="int64")
+    rows = []
+    for cfg in configs:
+        params = {**INDEX_PARAMS, **{key: v for key, v in cfg.items() if key != "search"}, "min_vectors": 0}
+        t0 = time.perf_counter()
+        index, built = make_index(cfg["type"], X.shape[1], X, params)
+        index.add_with_ids(X, ids)
+        build_s = time.perf_counter() - t0
+
+        for search in cfg.get("search", [{}]):
+            spec = {**built, **search}
+            set_search_params(index, spec)
+            index.search(Q[:10], k)  # warm up
+            lat = []
+            found = np.empty_like(truth)
+            for i in range(len(Q)):
+                t0 = time.perf_counter()
+                _, I = index.search(Q[i:i + 1], k)
+                lat.append((time.perf_counter() - t0) * 1000)
+                found[i] = I[0]
+            recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(Q))])
+            rows.append({
+                "spec": spec,
+                f"recall@{k}": round(float(recall), 4),
+                "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "p99_ms": round(float(np.percentile(lat, 99)), 3),
+                "build_s": round(build_s, 2),
+            })
+    return rows
+
+def default_configs(n: int) -> List[Dict]:
+    configs = [
+        {"type": "flat"},
+        {"type": "sq8"},
+        {"type": "ivf", "search": [{"nprobe": p} for p in (1, 8, 32)]},
+        {"type": "hnsw", "search": [{"ef_search": ef} for ef in (16, 64, 256)]},
+    ]
+    if n >= 256:
+        configs.insert(2, {"type": "ivfpq", "search": [{"nprobe": p} for p in (8, 32)]})
+    return configs
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--synthetic", type=int, default=0, help="number of random vectors (0 = use ingested corpus)")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    X = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else corpus_vectors()
+    rng = np.random.default_rng(1)
+    # Queries: perturbed corpus vectors, so every query has real neighbours
+    Q = X[rng.integers(0, len(X), args.queries)] + 0.05 * rng.standard_normal((args.queries, X.shape[1])).astype("float32")
+    faiss.normalize_L2(Q)
+
+    rows = evaluate(X, Q, args.k, default_configs(len(X)))
+    print(f"{len(X)} vectors, dim {X.shape[1]}, {args.queries} queries, k={args.k}\n")
+    print(f"{'index':<40} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    for r in rows:
+        spec = ",".join(f"{key}={val}" for key, val in r["spec"].items())
+        print(f"{spec:<40} {r[f'recall@{args.k}']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['build_s']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"n": len(X), "dim": int(X.shape[1]), "k": args.k, "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio, time
+from typing import Callable, Dict, List, Tuple
+
+class SearchBatcher:
+    """
+    Coalesces concurrent single-query searches into one batched call.
+
+    Requests arriving within window_ms of the first pending one (or until
+    max_batch are waiting) are sent together to fn(queries, k) in a worker
+    thread, and each caller gets back just its own hits. Throughput then scales
+    with the batch size rather than the number of requests.
+    """
+    def __init__(self, fn: Callable[[List[str], int], List[List]], window_ms: float = 5.0, max_batch: int = 64):
+        self.fn = fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._timer = None
+        self.batches = 0
+        self.queries = 0
+        self.largest = 0
+        self.busy_s = 0.0
+
+    async def search(self, query: str, k: int) -> List:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((query, k, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, int, asyncio.Future]]):
+        k = max(k for _, k, _ in batch)
+        started = time.perf_counter()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, self.fn, [q for q, _, _ in batch], k)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.busy_s += time.perf_counter() - started
+        self.batches += 1
+        self.queries += len(batch)
+        self.largest = max(self.largest, len(batch))
+        for (_, want, fut), hits in zip(batch, results):
+            if not fut.done():
+                fut.set_result(hits[:want])
+
+    def stats(self) -> Dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest,
+            "busy_s": round(self.busy_s, 4),
+        }
@@ -0,0 +1,253 @@
+"""
+Benchmark harness for the ingest, retrieval and generation paths.
+
+Runs fully offline in a scratch directory: synthetic diff-report documents
+and JSON schema pairs are generated, embeddings come from a deterministic
+hashing stub and completions from stub_llm.py on a local port.
+
+  python bench.py                               # default sizes, table on stdout
+  python bench.py --docs 2000 --json run.json   # bigger corpus, machine-readable results
+  python bench.py --concurrency 32 --requests 200
+
+Results (chunks/s, search p50/p99, /chat and /generate latency, peak RSS per
+phase) are emitted as JSON so runs can be compared over time.
+"""
+import argparse, asyncio, hashlib, json, os, platform, resource, socket, subprocess, sys, tempfile, threading, time
+from typing import Dict, List
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORDS = ("user account order item price address billing shipping status token session profile "
+         "payment invoice customer product inventory currency amount region created updated").split()
+TYPES = ("string", "number", "boolean", "object", "array", "null")
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def pct(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3) if values else 0.0
+
+def stub_embeddings(texts: List[str], dim: int = 384) -> np.ndarray:
+    """Deterministic text -> vector (seeded by sha1 of the text); no model, no network."""
+    out = np.empty((len(texts), dim), dtype="float32")
+    for i, t in enumerate(texts):
+        seed = int.from_bytes(hashlib.sha1(t.encode("utf-8")).digest()[:8], "little")
+        out[i] = np.random.default_rng(seed).standard_normal(dim, dtype="float32")
+    return out
+
+def synthetic_path(rng: np.random.Generator) -> str:
+    depth = int(rng.integers(1, 4))
+    parts = [str(rng.choice(WORDS)) + ("[]" if rng.random() < 0.15 else "") for _ in range(depth)]
+    return ".".join(parts)
+
+def write_corpus(folder: str, docs: int, changes_per_doc: int, seed: int = 0) -> None:
+    """Diff-report style .md files like the ones /ingest sees in production."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    for d in range(docs):
+        lines = [f"# API Schema Migration Report {d}", "", "## Detailed Changes", ""]
+        for i in range(changes_per_doc):
+            path, kind = synthetic_path(rng), rng.choice(["REMOVED", "ADDED", "TYPE CHANGED"])
+            if kind == "TYPE CHANGED":
+                lines.append(f"{i + 1}. TYPE CHANGED: Field \"{path}\" changed from {rng.choice(TYPES)} to {rng.choice(TYPES)}.")
+            else:
+                lines.append(f"{i + 1}. {kind}: Field \"{path}\" (type: {rng.choice(TYPES)}) was {kind.lower()}.")
+            if rng.random() < 0.3:
+                lines.append(f"   Clients reading {path} should migrate before the v1 sunset; see the {rng.choice(WORDS)} guide.")
+        with open(os.path.join(folder, f"report_{d:05d}.md"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+def synthetic_schema(rng: np.random.Generator, fields: int, depth: int = 3) -> Dict:
+    """Nested JSON document with about `fields` leaf values."""
+    def value(level: int, budget: int):
+        if level >= depth or budget <= 1:
+            kind = rng.integers(0, 4)
+            return [None, int(rng.integers(0, 1000)), f"v{int(rng.integers(0, 1000))}", bool(rng.integers(0, 2))][kind]
+        width = max(1, int(budget ** (1 / (depth - level))))
+        node = {f"{rng.choice(WORDS)}_{j}": value(level + 1, budget // width) for j in range(width)}
+        # Arrays of objects below the root; /generate takes an object at the top
+        return [node, node] if level and rng.random() < 0.1 else node
+    return value(0, fields)
+
+def mutate_schema(doc, rng: np.random.Generator, rate: float):
+    """v2 of a document: fields removed, added and retyped with probability `rate` each."""
+    if isinstance(doc, list):
+        return [mutate_schema(v, rng, rate) for v in doc]
+    if not isinstance(doc, dict):
+        return str(doc) if rng.random() < rate else doc
+    out = {}
+    for k, v in doc.items():
+        if rng.random() < rate:
+            continue
+        out[k] = mutate_schema(v, rng, rate)
+    if rng.random() < rate:
+        out[f"{rng.choice(WORDS)}_new"] = int(rng.integers(0, 100))
+    return out
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def start_stub_llm(port: int, delay: float) -> None:
+    import uvicorn
+    from stub_llm import create_app
+    server = uvicorn.Server(uvicorn.Config(create_app(delay=delay), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    for _ in range(100):
+        if server.started:
+            return
+        time.sleep(0.05)
+    raise RuntimeError("stub LLM did not start")
+
+async def http_latency(app, path: str, bodies: List[Dict], concurrency: int) -> Dict:
+    import httpx
+    sem = asyncio.Semaphore(concurrency)
+    lat: List[float] = []
+    errors = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        async def one(body):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(path, json=body)
+                lat.append((time.perf_counter() - t0) * 1000)
+                if r.status_code != 200 or not r.json().get("ok"):
+                    errors += 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(b) for b in bodies))
+        wall = time.perf_counter() - t0
+    return {"requests": len(bodies), "concurrency": concurrency, "errors": errors,
+            "p50_ms": pct(lat, 50), "p99_ms": pct(lat, 99), "rps": round(len(bodies) / wall, 1)}
+
+def run(args) -> Dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="nemotron-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    port = free_port()
+    # Everything (index, caches) lives under the scratch dir; the service talks to the stub LLM
+    os.chdir(workdir)
+    os.environ.update({
+        "NVIDIA_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "NVIDIA_API_KEY": "bench",
+        "EMBED_CACHE": "1" if args.embed_cache else "0",
+        "RESPONSE_CACHE": "0",
+        "INDEX_TYPE": args.index,
+    })
+    sys.path.insert(0, HERE)
+    import hf
+    hf._compute_embeddings = lambda texts: (stub_embeddings(texts, args.dim), "local")
+    from utils import iter_chunks_parallel, dedupe_chunks
+    from rag import VectorStore
+    from schema_diff import diff_schemas
+    import main as service
+
+    results: Dict = {"meta": {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": git_rev(), "python": platform.python_version(),
+        "machine": platform.machine(), "cpus": os.cpu_count(), "args": vars(args), "workdir": workdir,
+    }}
+    rng = np.random.default_rng(args.seed)
+
+    # Ingest: chunking alone, then chunk + embed + index
+    folder = os.path.join(workdir, "docs")
+    write_corpus(folder, args.docs, args.changes_per_doc, args.seed)
+    t0 = time.perf_counter()
+    n_chunks = sum(1 for _ in iter_chunks_parallel(folder, args.workers))
+    chunk_s = time.perf_counter() - t0
+    vs = VectorStore()
+    t0 = time.perf_counter()
+    stats = vs.build(dedupe_chunks(iter_chunks_parallel(folder, args.workers)))
+    ingest_s = time.perf_counter() - t0
+    results["ingest"] = {
+        "docs": args.docs, "chunks": stats["chunks"],
+        "chunking_chunks_per_s": round(n_chunks / chunk_s, 1),
+        "ingest_chunks_per_s": round(stats["chunks"] / ingest_s, 1),
+        "ingest_s": round(ingest_s, 3), "index": vs.index_spec, "peak_rss_mb": peak_rss_mb(),
+    }
+
+    # Retrieval: single-query search and batched search
+    queries = [f"what happened to {synthetic_path(rng)}?" for _ in range(args.queries)]
+    vs.search(queries[0], args.k)  # warm up
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        vs.search(q, args.k)
+        lat.append((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    for i in range(0, len(queries), 32):
+        vs.search_batch(queries[i:i + 32], args.k)
+    batch_s = time.perf_counter() - t0
+    results["search"] = {"queries": len(queries), "k": args.k, "p50_ms": pct(lat, 50), "p99_ms": pct(lat, 99),
+                         "batched_qps": round(len(queries) / batch_s, 1), "peak_rss_mb": peak_rss_mb()}
+
+    # Schema diff on generated v1/v2 pairs
+    pairs = []
+    for _ in range(args.schemas):
+        old = synthetic_schema(rng, args.schema_fields)
+        pairs.append((old, mutate_schema(old, rng, args.mutation_rate)))
+    lat, n_changes = [], []
+    for old, new in pairs:
+        t0 = time.perf_counter()
+        report = diff_schemas(old, new)
+        lat.append((time.perf_counter() - t0) * 1000)
+        n_changes.append(len(report["changes"]))
+    results["diff"] = {"pairs": len(pairs), "fields": args.schema_fields, "avg_changes": round(float(np.mean(n_changes)), 1),
+                       "p50_ms": pct(lat, 50), "p99_ms": pct(lat, 99)}
+
+    # Endpoints, in-process over ASGI, against the stub LLM
+    start_stub_llm(port, args.llm_delay)
+    chat_bodies = [{"query": queries[i % len(queries)], "cache": False} for i in range(args.requests)]
+    results["chat"] = asyncio.run(http_latency(service.nemotron, "/chat", chat_bodies, args.concurrency))
+    gen_bodies = []
+    for i in range(args.requests):
+        old, new = pairs[i % len(pairs)]
+        gen_bodies.append({"changes": diff_schemas(old, new)["changes"], "old_schema": old, "new_schema": new,
+                           "cache": False, "mode": "single"})
+    results["generate"] = asyncio.run(http_latency(service.nemotron, "/generate", gen_bodies, args.concurrency))
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--changes-per-doc", type=int, default=40)
+    ap.add_argument("--workers", type=int, default=0, help="chunking processes (0 = INGEST_WORKERS)")
+    ap.add_argument("--index", default="flat", help="INDEX_TYPE for the benchmark store")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--embed-cache", action="store_true", help="keep the embedding cache on")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--schemas", type=int, default=20)
+    ap.add_argument("--schema-fields", type=int, default=2000)
+    ap.add_argument("--mutation-rate", type=float, default=0.05)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--llm-delay", type=float, default=0.005, help="stub LLM seconds per token")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = run(args)
+    ing, s, d = results["ingest"], results["search"], results["diff"]
+    print(f"ingest    {ing['chunks']} chunks  {ing['ingest_chunks_per_s']} chunks/s  (chunking alone {ing['chunking_chunks_per_s']}/s)")
+    print(f"search    p50 {s['p50_ms']} ms  p99 {s['p99_ms']} ms  batched {s['batched_qps']} q/s")
+    print(f"diff      {d['avg_changes']} changes/pair  p50 {d['p50_ms']} ms  p99 {d['p99_ms']} ms")
+    for name in ("chat", "generate"):
+        r = results[name]
+        print(f"/{name:<8} p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  {r['rps']} req/s  errors {r['errors']}")
+    print(f"peak RSS  {results['peak_rss_mb']} MB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Named collections: one VectorStore per project / API pair, versioned on disk.
+
+  data/collections/<name>/CURRENT            name of the published version
+  data/collections/<name>/v<ms>-<pid>/       index.faiss + meta.sqlite
+
+A rebuild is written to a fresh version directory and published by replacing
+CURRENT (write-then-rename), so readers in every worker keep searching the old
+version until they pick up the new one and never see a half-built index.
+Incremental ingests (sync / append) update the current version in place, as
+VectorStore always did; readers notice through the index file's mtime.
+Writers to one collection are serialized across workers with a file lock.
+
+The "default" collection falls back to the single-index layout in data/ when
+it has never been rebuilt as a collection.
+"""
+import os, re, time, shutil, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+from rag import VectorStore, DATA_DIR
+
+COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", os.path.join(DATA_DIR, "collections"))
+# Loaded collections kept in memory (LRU), by count and by total index size
+COLLECTIONS_MAX_LOADED = int(os.getenv("COLLECTIONS_MAX_LOADED", "8"))
+COLLECTIONS_MAX_MB = float(os.getenv("COLLECTIONS_MAX_MB", "2048"))
+# Versions kept on disk per collection, current included: older ones may still be open in other workers
+COLLECTION_KEEP_VERSIONS = int(os.getenv("COLLECTION_KEEP_VERSIONS", "2"))
+DEFAULT_COLLECTION = "default"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+_VERSION_RE = re.compile(r"^v(\d+)-\d+$")
+
+def _stamp(path: str) -> int:
+    # Changes whenever VectorStore.save() replaces the index file
+    try:
+        return os.stat(os.path.join(path, "index.faiss")).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+class Collections:
+    def __init__(self, root: str = COLLECTIONS_DIR, max_loaded: int = COLLECTIONS_MAX_LOADED,
+                 max_mb: float = COLLECTIONS_MAX_MB, keep_versions: int = COLLECTION_KEEP_VERSIONS,
+                 store_factory: Callable[[str], VectorStore] = lambda path: VectorStore(path=path)):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.max_bytes = int(max_mb * 2**20)
+        self.keep_versions = max(1, keep_versions)
+        self.store_factory = store_factory
+        # name -> (version path, index stamp, store); most recently used last
+        self.loaded: "OrderedDict[str, Tuple[str, int, VectorStore]]" = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+
+    def _dir(self, name: str) -> str:
+        if not _NAME_RE.match(name or ""):
+            raise ValueError(f"Invalid collection name: {name!r} (letters, digits, '_', '-', '.'; max 64)")
+        return os.path.join(self.root, name)
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._name_locks.setdefault(name, threading.Lock())
+
+    def current_path(self, name: str) -> str | None:
+        """Directory of the published version of name, None if there is none."""
+        folder = self._dir(name)
+        try:
+            with open(os.path.join(folder, "CURRENT"), "r", encoding="utf-8") as f:
+                return os.path.join(folder, f.read().strip())
+        except FileNotFoundError:
+            if name == DEFAULT_COLLECTION and os.path.exists(os.path.join(DATA_DIR, "index.faiss")):
+                return DATA_DIR
+            return None
+
+    def names(self) -> List[str]:
+        found = set()
+        if os.path.isdir(self.root):
+            found = {n for n in os.listdir(self.root) if os.path.exists(os.path.join(self.root, n, "CURRENT"))}
+        if self.current_path(DEFAULT_COLLECTION):
+            found.add(DEFAULT_COLLECTION)
+        return sorted(found)
+
+    def get(self, name: str) -> VectorStore:
+        """
+        Loaded store of the current version of name. Raises FileNotFoundError if
+        the collection does not exist yet.
+        """
+        path = self.current_path(name)
+        if path is None:
+            raise FileNotFoundError(f"Collection '{name}' not found. Run /ingest first.")
+        stamp = _stamp(path)
+        hit = self._cached(name, path, stamp)
+        if hit is not None:
+            return hit
+        # Only loads of the same collection wait for each other
+        with self._name_lock(name):
+            hit = self._cached(name, path, stamp)
+            if hit is not None:
+                return hit
+            vs = self.store_factory(path)
+            vs.load()
+            self._remember(name, path, stamp, vs)
+            return vs
+
+    def _cached(self, name: str, path: str, stamp: int) -> VectorStore | None:
+        with self._lock:
+            entry = self.loaded.get(name)
+            if entry is None or entry[0] != path or entry[1] != stamp:
+                return None
+            self.loaded.move_to_end(name)
+            return entry[2]
+
+    def _remember(self, name: str, path: str, stamp: int, vs: VectorStore):
+        # Replaced and evicted stores are only dropped, never closed: a search may still be using them
+        with self._lock:
+            self.loaded[name] = (path, stamp, vs)
+            self.loaded.move_to_end(name)
+            while len(self.loaded) > 1 and (len(self.loaded) > self.max_loaded or self._bytes() > self.max_bytes):
+                self.loaded.popitem(last=False)
+                self.evictions += 1
+
+    def _bytes(self) -> int:
+        return sum(vs.memory_bytes() for _, _, vs in self.loaded.values())
+
+    @contextmanager
+    def _writer(self, name: str):
+        # One writer per collection: threads of this worker, then other workers (flock)
+        folder = self._dir(name)
+        os.makedirs(folder, exist_ok=True)
+        with self._name_lock(f"{name}\0write"), open(os.path.join(folder, ".lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield folder
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def rebuild(self, name: str, chunks: Iterable[Dict[str, str]],
+                progress: Callable[[Dict[str, int]], None] | None = None) -> Dict[str, int]:
+        """
+        Build name from scratch in a new version directory, then publish it.
+        If the build fails (or progress raises to cancel it) nothing is published.
+        """
+        with self._writer(name) as folder:
+            version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+            path = os.path.join(folder, version)
+            vs = self.store_factory(path)
+            try:
+                stats = vs.build(chunks, progress)  # saves into path
+            except BaseException:
+                if vs.store is not None:
+                    vs.store.close()
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+            if vs.index is None:
+                shutil.rmtree(path, ignore_errors=True)
+                return stats
+            # Atomic pointer swap: readers see either the old version or the complete new one
+            tmp = os.path.join(folder, f"CURRENT.tmp{os.getpid()}")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, os.path.join(folder, "CURRENT"))
+            self._remember(name, path, _stamp(path), vs)
+            self._prune(folder, version)
+            return {**stats, "version": version}
+
+    def update(self, name: str, chunks: Iterable[Dict[str, str]], prune: bool,
+               progress: Callable[[Dict[str, int]], None] | None = None) -> Dict[str, int]:
+        """
+        Incremental ingest into the current version (prune=True: sync, False: append).
+        A collection that does not exist yet is created through rebuild().
+        """
+        if self.current_path(name) is None:
+            return self.rebuild(name, chunks, progress)
+        with self._writer(name):
+            path = self.current_path(name)
+            vs = self.get(name)
+            stats = vs.ingest_stream(chunks, prune=prune, progress=progress)
+            # Our copy is already up to date: do not reload it for the file we just wrote
+            self._remember(name, path, _stamp(path), vs)
+            return stats
+
+    def _prune(self, folder: str, current: str):
+        versions = sorted((int(m.group(1)), d) for d in os.listdir(folder) if (m := _VERSION_RE.match(d)))
+        cutoff = int(_VERSION_RE.match(current).group(1))
+        # Only versions older than the one just published (and past the keep count) go
+        older = [d for ts, d in versions if ts < cutoff]
+        for d in older[:max(0, len(older) - (self.keep_versions - 1))]:
+            shutil.rmtree(os.path.join(folder, d), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            loaded = {name: {"version": os.path.basename(path), "chunks": int(vs.index.ntotal) if vs.index is not None else 0,
+                             "mb": round(vs.memory_bytes() / 2**20, 2)} for name, (path, _, vs) in self.loaded.items()}
+            return {"loaded": loaded, "count": len(loaded), "loaded_mb": round(self._bytes() / 2**20, 2), "max_loaded": self.max_loaded,
+                    "max_mb": self.max_bytes / 2**20, "evictions": self.evictions}
@@ -0,0 +1,158 @@
+import os, json, hashlib, threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, sha1 of normalized text).
+
+    Memory tier is an LRU of row vectors. Disk tier is an append-only float32
+    matrix (vectors.f32, read through np.memmap) plus keys.txt mapping each
+    key to its row. Both are wiped when the embedding model changes.
+    """
+    def __init__(self, model: str, cache_dir: str, max_items: int = 10000):
+        self.model = model
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.rows: Dict[str, int] = {}
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._mm = None
+        self._lock = threading.Lock()
+        self._vec_path = os.path.join(cache_dir, "vectors.f32")
+        self._keys_path = os.path.join(cache_dir, "keys.txt")
+        self._meta_path = os.path.join(cache_dir, "cache.json")
+        self._keys_read = 0
+        self._open()
+
+    def _open(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta = {}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta.get("model") != self.model:
+            # EMBED_MODEL changed (or fresh dir): old vectors are meaningless
+            for p in (self._vec_path, self._keys_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            meta = {"model": self.model, "dim": None}
+            self._write_meta(meta)
+        self.dim = meta.get("dim")
+        self._refresh_keys()
+
+    def _write_meta(self, meta: Dict):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def _refresh_keys(self):
+        # Pick up rows appended by other workers since we last looked
+        if not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, "r", encoding="utf-8") as f:
+            f.seek(self._keys_read)
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                key, row = line.split()
+                self.rows[key] = int(row)
+                self._keys_read += len(line.encode("utf-8"))
+
+    def _matrix(self) -> Optional[np.ndarray]:
+        if not self.dim or not os.path.exists(self._vec_path):
+            return None
+        n = os.path.getsize(self._vec_path) // (4 * self.dim)
+        if self._mm is None or self._mm.shape[0] < n:
+            self._mm = np.memmap(self._vec_path, dtype="float32", mode="r", shape=(n, self.dim))
+        return self._mm
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self.mem[key] = vec
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.max_items:
+            self.mem.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = []
+        with self._lock:
+            if any(k not in self.mem and k not in self.rows for k in keys):
+                self._refresh_keys()
+            mm = None
+            for key in keys:
+                vec = self.mem.get(key)
+                if vec is not None:
+                    self.mem.move_to_end(key)
+                    self.hits += 1
+                elif key in self.rows:
+                    mm = mm if mm is not None else self._matrix()
+                    row = self.rows[key]
+                    if mm is not None and row < mm.shape[0]:
+                        vec = np.array(mm[row])
+                        self._remember(key, vec)
+                        self.hits += 1
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+                else:
+                    self.misses += 1
+                out.append(vec)
+        return out
+
+    def put_many(self, keys: List[str], X: np.ndarray):
+        X = np.ascontiguousarray(X, dtype="float32")
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(X.shape[1])
+                self._write_meta({"model": self.model, "dim": self.dim})
+            if X.shape[1] != self.dim:
+                return
+            for key, vec in zip(keys, X):
+                self._remember(key, vec.copy())
+            with open(self._vec_path, "ab") as vf, open(self._keys_path, "a", encoding="utf-8") as kf:
+                if fcntl:
+                    fcntl.flock(vf.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._refresh_keys()
+                    fresh: Dict[str, int] = {}
+                    for i, key in enumerate(keys):
+                        if key not in self.rows and key not in fresh:
+                            fresh[key] = i
+                    if not fresh:
+                        return
+                    vf.seek(0, os.SEEK_END)
+                    start = vf.tell() // (4 * self.dim)
+                    vf.write(X[list(fresh.values())].tobytes())
+                    vf.flush()
+                    kf.write("".join(f"{key} {start + j}\n" for j, key in enumerate(fresh)))
+                    kf.flush()
+                    self._refresh_keys()
+                finally:
+                    if fcntl:
+                        fcntl.flock(vf.fileno(), fcntl.LOCK_UN)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_items": len(self.mem),
+            "disk_items": len(self.rows),
+        }
@@ -0,0 +1,177 @@
+"""
+Offline embedder: hashed character n-grams, vectorized over a whole batch.
+
+Used when neither sentence-transformers nor the HF API is available. Every
+text is lowercased and padded with spaces, all of its 2..4-byte n-grams are
+hashed (packed into a uint64 and mixed, with NumPy over the concatenated
+batch) into `dim` signed buckets, counts are log-scaled, optionally
+IDF-weighted, and rows are L2-normalized. Texts that share words,
+word pieces or field paths end up close, so retrieval still works without a model.
+
+IDF weights are fitted once on a corpus and saved; vectors embedded with and
+without them are not comparable, so rebuild the index after fitting:
+
+  python hash_embed.py fit ../docs                  # writes data/fallback_idf.npz
+  FALLBACK_IDF=data/fallback_idf.npz python main.py
+"""
+import os, sys, argparse, threading
+from typing import List, Tuple
+import numpy as np
+
+FALLBACK_DIM = int(os.getenv("FALLBACK_DIM", "384"))
+# Inclusive byte n-gram range, "min,max"
+FALLBACK_NGRAMS = tuple(int(n) for n in os.getenv("FALLBACK_NGRAMS", "2,4").split(","))
+# IDF stats written by `python hash_embed.py fit` (unset: plain log-TF)
+FALLBACK_IDF = os.getenv("FALLBACK_IDF", "")
+# Document-frequency table size (2**bits uint32 slots)
+FALLBACK_IDF_BITS = int(os.getenv("FALLBACK_IDF_BITS", "20"))
+
+_MIX1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX2 = np.uint64(0xC4CEB9FE1A85EC53)
+_S33 = np.uint64(33)
+# (text, n-gram) keys: text number in the top 20 bits, n-gram hash in the low 44
+_HASH_BITS = np.uint64(44)
+_HASH_MASK = np.uint64((1 << 44) - 1)
+_MAX_ROWS = 1 << 20
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    # murmur3 fmix64: spreads the packed bytes over all 64 bits
+    h = h ^ (h >> _S33)
+    h = h * _MIX1
+    h = h ^ (h >> _S33)
+    h = h * _MIX2
+    return h ^ (h >> _S33)
+
+def ngram_hashes(texts: List[str], ngrams: Tuple[int, int] = FALLBACK_NGRAMS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (row, hash) for every byte n-gram of every text; n-grams never span two texts.
+    An n-gram (n <= 8) is packed into one uint64 and mixed, no per-byte hashing.
+    """
+    data = [(" " + " ".join(t.lower().split()) + " ").encode("utf-8") for t in texts]
+    lens = np.fromiter((len(d) for d in data), dtype=np.int64, count=len(data))
+    buf = np.frombuffer(b"".join(data), dtype=np.uint8).astype(np.uint64)
+    owner = np.repeat(np.arange(len(data), dtype=np.int64), lens)
+    rows, hashes = [], []
+    packed = buf
+    for n in range(1, ngrams[1] + 1):
+        if n > 1:
+            # n-gram at i = (n-1)-gram at i | byte i+n-1 shifted into the next free byte
+            packed = packed[:-1] | (buf[n - 1:] << np.uint64(8 * (n - 1)))
+        if n < ngrams[0] or not len(packed):
+            continue
+        m = len(packed)
+        keep = owner[:m] == owner[n - 1:]
+        rows.append(owner[:m][keep])
+        hashes.append(_mix(packed[keep] ^ (np.uint64(n) << np.uint64(59))))
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    return np.concatenate(rows), np.concatenate(hashes)
+
+class HashingEmbedder:
+    """
+    Feature-hashing vectorizer. The only state is the optional document
+    frequency table for IDF weighting, kept per n-gram hash (in 2**idf_bits
+    slots, far more than `dim`) so that colliding output buckets do not share one weight.
+    """
+    def __init__(self, dim: int = FALLBACK_DIM, ngrams: Tuple[int, int] = FALLBACK_NGRAMS,
+                 idf_bits: int = FALLBACK_IDF_BITS):
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+        self.idf_bits = idf_bits
+        self.df = None  # type: np.ndarray | None
+        self.n_docs = 0
+
+    def _counts(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Distinct (row, n-gram) pairs and how often each occurs. The row goes above the
+        # low _HASH_BITS (44) of the key, the n-gram hash is cut to them (_HASH_MASK); embed()
+        # passes at most _MAX_ROWS (2**20) texts at a time, so the row fits the top 20 bits.
+        rows, h = ngram_hashes(texts, self.ngrams)
+        keys, counts = np.unique((rows.astype(np.uint64) << _HASH_BITS) | (h & _HASH_MASK), return_counts=True)
+        return (keys >> _HASH_BITS).astype(np.int64), keys & _HASH_MASK, counts
+
+    def _slots(self, h: np.ndarray) -> np.ndarray:
+        return (h >> (_HASH_BITS - np.uint64(self.idf_bits))).astype(np.int64)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """float32 matrix (len(texts), dim), rows L2-normalized."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype="float32")
+        if len(texts) > _MAX_ROWS:
+            return np.concatenate([self.embed(texts[i:i + _MAX_ROWS]) for i in range(0, len(texts), _MAX_ROWS)])
+        rows, h, counts = self._counts(texts)
+        weights = 1.0 + np.log(counts)
+        if self.df is not None:
+            # n-grams never seen while fitting carry no weight (they would only add collision noise)
+            df = self.df[self._slots(h)]
+            weights *= np.where(df > 0, np.log((1 + self.n_docs) / (1 + df)) + 1.0, 0.0)
+        # Signed hashing (low bit): colliding n-grams cancel out on average instead of piling up
+        weights[(h & np.uint64(1)).astype(bool)] *= -1.0
+        buckets = ((h >> np.uint64(1)) % np.uint64(self.dim)).astype(np.int64)
+        X = np.bincount(rows * self.dim + buckets, weights=weights, minlength=len(texts) * self.dim)
+        X = X.reshape(len(texts), self.dim)
+        X /= np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+        return X.astype("float32")
+
+    def partial_fit(self, texts: List[str]):
+        """Accumulate the document frequency of every n-gram in texts."""
+        if not texts:
+            return
+        if self.df is None:
+            self.df = np.zeros(1 << self.idf_bits, dtype=np.uint32)
+        for i in range(0, len(texts), _MAX_ROWS):
+            _, h, _ = self._counts(texts[i:i + _MAX_ROWS])
+            self.df += np.bincount(self._slots(h), minlength=len(self.df)).astype(np.uint32)
+        self.n_docs += len(texts)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, df=self.df, n_docs=self.n_docs, dim=self.dim, ngrams=np.asarray(self.ngrams))
+
+    @classmethod
+    def load(cls, path: str) -> "HashingEmbedder":
+        data = np.load(path)
+        df = data["df"]
+        emb = cls(dim=int(data["dim"]), ngrams=tuple(int(n) for n in data["ngrams"]),
+                  idf_bits=int(len(df)).bit_length() - 1)
+        emb.df, emb.n_docs = df, int(data["n_docs"])
+        return emb
+
+_lock = threading.Lock()
+
+def get_hashing_embedder() -> HashingEmbedder:
+    """Process-wide embedder, with the FALLBACK_IDF weights when configured."""
+    with _lock:
+        if not hasattr(get_hashing_embedder, "_emb"):
+            emb = None
+            if FALLBACK_IDF:
+                try:
+                    emb = HashingEmbedder.load(FALLBACK_IDF)
+                    print(f"✅ Fallback embeddings use IDF from {FALLBACK_IDF} ({emb.n_docs} docs)")
+                except Exception as e:
+                    print(f"⚠️  Could not load FALLBACK_IDF={FALLBACK_IDF}: {e}")
+            get_hashing_embedder._emb = emb or HashingEmbedder()
+        return get_hashing_embedder._emb
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    fit = sub.add_parser("fit", help="fit IDF weights on the chunks of a docs folder")
+    fit.add_argument("folder")
+    fit.add_argument("--out", default=os.path.join("data", "fallback_idf.npz"))
+    fit.add_argument("--dim", type=int, default=FALLBACK_DIM)
+    args = ap.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from utils import iter_chunks_parallel
+    emb, batch = HashingEmbedder(dim=args.dim), []
+    for c in iter_chunks_parallel(args.folder):
+        batch.append(c["text"])
+        if len(batch) >= 1024:
+            emb.partial_fit(batch)
+            batch = []
+    emb.partial_fit(batch)
+    emb.save(args.out)
+    print(f"✅ IDF over {emb.n_docs} chunks written to {args.out}; rebuild the index to use it")
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,75 @@
-import os, json, requests
-from typing import List
+import os, re, json, time, threading, requests
+from typing import AsyncIterator, List, Dict, Tuple, Optional
 import numpy as np
-import hashlib
+
+from embed_cache import EmbeddingCache, cache_key
+from hash_embed import FALLBACK_DIM, HashingEmbedder, get_hashing_embedder
+from llm_client import get_llm_manager
+from metrics import EMBED_SECONDS, EMBED_TEXTS, GENERATION_SECONDS, span, record_span
 
 # NVIDIA API Configuration
 NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY", "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")
-NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
+NVIDIA_BASE_URL = os.getenv("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1")
 NVIDIA_MODEL = "nvidia/nvidia-nemotron-nano-9b-v2"
 
 # HuggingFace for embeddings (keep existing)
 HF_TOKEN = os.getenv("HF_TOKEN", "")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
+# Embedding cache (memory LRU + memory-mapped file under data/)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") != "0"
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(os.getcwd(), "data", "embed_cache"))
+
 HEADERS_JSON = {
     "Content-Type": "application/json",
 }
 if HF_TOKEN:
     HEADERS_JSON["Authorization"] = f"Bearer {HF_TOKEN}"
 
-def simple_text_embedding(text: str, dim: int = 384) -> List[float]:
+def simple_text_embedding(text: str, dim: int = FALLBACK_DIM) -> List[float]:
     """
-    Simple fallback embedding using text hashing and basic NLP features.
-    This is a backup when HuggingFace API is unavailable.
+    Fallback embedding of one text (hashed character n-grams, see hash_embed.py).
     """
-    text_lower = text.lower().strip()
-    features = []
-    
-    char_hash = int(hashlib.md5(text_lower.encode()).hexdigest()[:8], 16) % (2**31)
-    features.extend([
-        char_hash / (2**31),
-        len(text) / 1000.0,
-        text.count(' ') / len(text) if len(text) > 0 else 0,
-    ])
-    
-    words = text_lower.split()
-    if words:
-        avg_word_len = sum(len(w) for w in words) / len(words)
-        features.append(avg_word_len / 20.0)
-    else:
-        features.append(0.0)
-    
-    while len(features) < dim:
-        seed = len(features)
-        hash_val = int(hashlib.md5(f"{text_lower}_{seed}".encode()).hexdigest()[:8], 16)
-        features.append((hash_val % 1000) / 1000.0)
-    
-    return features[:dim]
+    emb = get_hashing_embedder()
+    if dim != emb.dim:
+        emb = HashingEmbedder(dim=dim)
+    return emb.embed([text])[0].tolist()
 
-def hf_feature_extraction(texts: List[str]) -> List[List[float]]:
+_model_lock = threading.Lock()
+
+def get_local_model():
+    """
+    The sentence-transformers model, loaded once per process (None when the
+    package is not installed or the model failed to load).
+    """
+    with _model_lock:
+        if not hasattr(hf_feature_extraction, '_local_model'):
+            model = None
+            try:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(EMBED_MODEL)
+                print(f"✅ Using local embedding model: {EMBED_MODEL}")
+            except ImportError:
+                pass  # sentence-transformers not installed
+            except Exception as e:
+                print(f"Local model failed: {e}")
+            hf_feature_extraction._local_model = model
+        return hf_feature_extraction._local_model
+
+def _compute_embeddings(texts: List[str]) -> Tuple[np.ndarray, str]:
     """
     Gets embeddings - tries local sentence-transformers first, then API, then fallback.
+    Returns the float32 matrix and which backend produced it ("local", "api" or "fallback").
     """
     # Try local sentence-transformers (best option)
-    try:
-        from sentence_transformers import SentenceTransformer
-        if not hasattr(hf_feature_extraction, '_local_model'):
-            print(f"✅ Using local embedding model: {EMBED_MODEL}")
-            hf_feature_extraction._local_model = SentenceTransformer(EMBED_MODEL)
-        embeddings = hf_feature_extraction._local_model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        return embeddings.tolist()
-    except ImportError:
-        pass  # sentence-transformers not installed
-    except Exception as e:
-        print(f"Local model failed: {e}")
+    model = get_local_model()
+    if model is not None:
+        try:
+            embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+            return np.asarray(embeddings, dtype="float32"), "local"
+        except Exception as e:
+            print(f"Local model failed: {e}")
     
     # Try HuggingFace API
     try:
@@ -72,64 +79,173 @@ def hf_feature_extraction(texts: List[str]) -> List[List[float]]:
         if r.status_code == 200:
             out = r.json()
             if isinstance(out, list) and isinstance(out[0], list):
-                return out
+                return np.asarray(out, dtype="float32"), "api"
             if isinstance(out[0], dict) and "embedding" in out[0]:
-                return [row["embedding"] for row in out]
+                return np.asarray([row["embedding"] for row in out], dtype="float32"), "api"
     except Exception:
         pass
     
-    # Fallback
-    print("⚠️  Using simple fallback embeddings")
-    return [simple_text_embedding(text) for text in texts]
+    # Fallback: hashed n-grams over the whole batch
+    if not hasattr(_compute_embeddings, "_warned"):
+        print("⚠️  Using hashed n-gram fallback embeddings")
+        _compute_embeddings._warned = True
+    return get_hashing_embedder().embed(texts), "fallback"
+
+def _embed_model(texts: List[str]) -> Tuple[np.ndarray, str]:
+    # _compute_embeddings, timed and counted per backend (local / api / fallback)
+    start = time.perf_counter()
+    X, backend = _compute_embeddings(texts)
+    EMBED_SECONDS.observe(time.perf_counter() - start, backend=backend)
+    EMBED_TEXTS.inc(len(texts), backend=backend)
+    return X, backend
+
+def get_embed_cache() -> Optional[EmbeddingCache]:
+    if not EMBED_CACHE_ENABLED:
+        return None
+    if not hasattr(get_embed_cache, "_cache"):
+        get_embed_cache._cache = EmbeddingCache(EMBED_MODEL, EMBED_CACHE_DIR, EMBED_CACHE_SIZE)
+    return get_embed_cache._cache
+
+def embed_texts(texts: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Embeddings as a float32 matrix, served from the embedding cache where possible.
+    Only texts missing from the cache are sent to the model.
+    If `out` is given (shape (len(texts), dim)), rows are written into it and it is returned.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    with span("embed"):
+        return _embed_cached(texts, out)
+
+def _embed_cached(texts: List[str], out: Optional[np.ndarray]) -> np.ndarray:
+    cache = get_embed_cache()
+    if cache is None:
+        X = _embed_model(texts)[0]
+        if out is None:
+            return X
+        out[:] = X
+        return out
+
+    keys = [cache_key(EMBED_MODEL, t) for t in texts]
+    cached = cache.get_many(keys)
+    missing = [i for i, v in enumerate(cached) if v is None]
+    fresh: Dict[str, np.ndarray] = {}
+    if missing:
+        # Embed each distinct missing text once
+        uniq: Dict[str, int] = {}
+        for i in missing:
+            uniq.setdefault(keys[i], i)
+        X, backend = _embed_model([texts[i] for i in uniq.values()])
+        if backend != "fallback":
+            # Never persist hash-fallback vectors under the model's name
+            cache.put_many(list(uniq), X)
+        fresh = dict(zip(uniq, X))
+
+    if out is None:
+        dim = next(iter(fresh.values())).shape[0] if fresh else cached[0].shape[0]
+        out = np.empty((len(texts), dim), dtype="float32")
+    for i, v in enumerate(cached):
+        out[i] = v if v is not None else fresh[keys[i]]
+    return out
+
+def warm_up() -> Dict:
+    """
+    Load the embedding model and tokenizer and run one encode, so the first
+    request does not pay for imports, weight loading or kernel warm-up.
+    """
+    start = time.perf_counter()
+    X, backend = _embed_model(["warm-up: field user.address.zip changed from number to string"])
+    count_tokens(["warm-up"])
+    return {"backend": backend, "dim": int(X.shape[1]), "seconds": round(time.perf_counter() - start, 3)}
+
+def hf_feature_extraction(texts: List[str]) -> List[List[float]]:
+    """
+    Gets embeddings as nested lists (see embed_texts for the cached, NumPy path).
+    """
+    return embed_texts(texts).tolist()
+
+# Rough stand-in for a WordPiece/BPE tokenizer: words and single punctuation marks
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def get_tokenizer():
+    """
+    The embedding model's tokenizer (None if transformers is unavailable).
+    Reuses the loaded sentence-transformers model when there is one.
+    """
+    if not hasattr(get_tokenizer, "_tok"):
+        tok = None
+        model = getattr(hf_feature_extraction, "_local_model", None)
+        if model is not None:
+            tok = model.tokenizer
+        else:
+            try:
+                from transformers import AutoTokenizer
+                tok = AutoTokenizer.from_pretrained(EMBED_MODEL)
+            except Exception:
+                tok = None
+        get_tokenizer._tok = tok
+    return get_tokenizer._tok
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """
+    Token counts for a batch of texts, tokenized in one call.
+    """
+    if not texts:
+        return []
+    tok = get_tokenizer()
+    if tok is None:
+        return [len(_TOKEN_RE.findall(t)) for t in texts]
+    return [len(ids) for ids in tok(texts, add_special_tokens=False)["input_ids"]]
+
+def build_chat_messages(prompt: str) -> List[Dict[str, str]]:
+    """
+    Turns a format_prompt() prompt into chat messages for the NVIDIA API.
+    """
+    # Extract context and query from prompt for better formatting
+    lines = prompt.split('\n')
+    context_text = ""
+    user_query = ""
+    in_context = False
+    
+    for line in lines:
+        if line.strip().startswith("Context:"):
+            in_context = True
+            continue
+        elif line.strip().startswith("User Question:") or line.strip().startswith("User:"):
+            in_context = False
+            user_query = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
+        elif in_context and line.strip().startswith("-"):
+            context_text += line.strip()[1:].strip() + "\n"
+    
+    # Create a concise, user-friendly system prompt
+    system_prompt = (
+        "You are an API migration assistant. Explain API schema changes in simple, clear terms. "
+        "Focus on:\n"
+        "- What fields changed (name them)\n"
+        "- What the impact is (breaking vs safe)\n"
+        "- What developers need to do\n"
+        "Keep it short (2-3 sentences per change). Use plain language, avoid technical jargon."
+    )
+    
+    # Build user message with context
+    user_message = f"API Changes Summary:\n{context_text}\n\nQuestion: {user_query or 'Explain these API changes in simple terms'}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
 
 def hf_generate(prompt: str, max_new_tokens: int = 512, temperature: float = 0.3) -> str:
     """
     Uses NVIDIA API for text generation with user-friendly, concise explanations.
+    Blocking; async callers should use hf_generate_async / hf_generate_stream.
     """
     try:
-        from openai import OpenAI
-        
-        client = OpenAI(
-            base_url=NVIDIA_BASE_URL,
-            api_key=NVIDIA_API_KEY
-        )
-        
-        # Extract context and query from prompt for better formatting
-        lines = prompt.split('\n')
-        context_text = ""
-        user_query = ""
-        in_context = False
-        
-        for line in lines:
-            if line.strip().startswith("Context:"):
-                in_context = True
-                continue
-            elif line.strip().startswith("User Question:") or line.strip().startswith("User:"):
-                in_context = False
-                user_query = line.split(":", 1)[-1].strip() if ":" in line else line.strip()
-            elif in_context and line.strip().startswith("-"):
-                context_text += line.strip()[1:].strip() + "\n"
-        
-        # Create a concise, user-friendly system prompt
-        system_prompt = (
-            "You are an API migration assistant. Explain API schema changes in simple, clear terms. "
-            "Focus on:\n"
-            "- What fields changed (name them)\n"
-            "- What the impact is (breaking vs safe)\n"
-            "- What developers need to do\n"
-            "Keep it short (2-3 sentences per change). Use plain language, avoid technical jargon."
-        )
-        
-        # Build user message with context
-        user_message = f"API Changes Summary:\n{context_text}\n\nQuestion: {user_query or 'Explain these API changes in simple terms'}"
+        client = get_llm_manager().sync_client(NVIDIA_BASE_URL, NVIDIA_API_KEY)
         
         # Call NVIDIA API
         completion = client.chat.completions.create(
             model=NVIDIA_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
+            messages=build_chat_messages(prompt),
             temperature=temperature,
             max_tokens=min(max_new_tokens, 500),  # Limit for concise responses
             top_p=0.9,
@@ -148,6 +264,68 @@ def hf_generate(prompt: str, max_new_tokens: int = 512, temperature: float = 0.3
         print("Falling back to simple generation...")
         return simple_text_generation(prompt, max_new_tokens)
 
+async def stream_completion(base_url: str = NVIDIA_BASE_URL, api_key: str = NVIDIA_API_KEY,
+                            **kwargs) -> AsyncIterator[Dict[str, str]]:
+    """
+    Runs a streaming chat completion on the shared client pool and yields
+    {"type": "token" | "reasoning", "text": ...} deltas as they arrive.
+    Time to first delta and total time are recorded in GENERATION_SECONDS.
+    """
+    start = time.perf_counter()
+    first = None
+    try:
+        async for chunk in get_llm_manager().stream(base_url, api_key, **kwargs):
+            if chunk.choices and len(chunk.choices) > 0:
+                delta = chunk.choices[0].delta
+                reasoning = getattr(delta, "reasoning_content", None)
+                if first is None and (reasoning or delta.content):
+                    first = time.perf_counter() - start
+                    GENERATION_SECONDS.observe(first, phase="first_token")
+                if reasoning:
+                    yield {"type": "reasoning", "text": reasoning}
+                if delta.content:
+                    yield {"type": "token", "text": delta.content}
+    finally:
+        elapsed = time.perf_counter() - start
+        GENERATION_SECONDS.observe(elapsed, phase="total")
+        record_span("generate", elapsed)
+
+async def hf_generate_stream(prompt: str, max_new_tokens: int = 512, temperature: float = 0.3) -> AsyncIterator[Dict[str, str]]:
+    """
+    Streaming, non-blocking hf_generate. Falls back to simple_text_generation
+    (as a single token event marked "fallback") if the API fails before anything was streamed.
+    """
+    sent = False
+    try:
+        async for event in stream_completion(
+            model=NVIDIA_MODEL,
+            messages=build_chat_messages(prompt),
+            temperature=temperature,
+            max_tokens=min(max_new_tokens, 500),  # Limit for concise responses
+            top_p=0.9,
+        ):
+            sent = True
+            yield event
+    except ImportError:
+        print("⚠️  openai package not installed. Install with: pip install openai")
+    except Exception as e:
+        print(f"⚠️  NVIDIA API failed: {e}")
+        if sent:
+            raise
+    if not sent:
+        print("Falling back to simple generation...")
+        yield {"type": "token", "text": simple_text_generation(prompt, max_new_tokens), "fallback": True}
+
+async def hf_generate_async(prompt: str, max_new_tokens: int = 512, temperature: float = 0.3) -> str:
+    """
+    Non-blocking hf_generate: drains hf_generate_stream without holding the event loop.
+    """
+    parts = []
+    async for event in hf_generate_stream(prompt, max_new_tokens, temperature):
+        if event["type"] == "token":
+            parts.append(event["text"])
+    return "".join(parts).strip()
+
 def simple_text_generation(prompt: str, max_new_tokens: int = 512) -> str:
     """
     Improved fallback that extracts and formats API changes clearly.
@@ -0,0 +1,67 @@
+"""
+Import-time budget report for the service (cold start).
+
+Imports a module in a fresh interpreter with `python -X importtime` and lists
+the slowest imports, cumulative (including what they pull in) and self.
+With --budget-ms the exit status is 1 when the total goes over, so CI can
+keep cold start from creeping up.
+
+  python import_budget.py                     # main (the FastAPI app)
+  python import_budget.py --top 30 --budget-ms 1500
+  python import_budget.py --module rag --json imports.json
+"""
+import argparse, json, os, re, subprocess, sys, tempfile, time
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure(module: str) -> Dict:
+    """Per-module import times (ms) of `import module` in a new interpreter."""
+    # Run from an empty directory so data/ and .env of the caller are not touched
+    with tempfile.TemporaryDirectory() as cwd:
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")]))}
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows: List[Dict] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append({"module": m.group(4), "self_ms": int(m.group(1)) / 1000,
+                         "cumulative_ms": int(m.group(2)) / 1000, "depth": len(m.group(3)) // 2})
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == module), 0.0)
+    return {"module": module, "total_ms": round(total, 1), "wall_ms": round(wall * 1000, 1), "imports": rows}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--module", default="main")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, help="exit 1 if importing the module takes longer")
+    ap.add_argument("--json", help="write the full report to this file")
+    args = ap.parse_args()
+
+    report = measure(args.module)
+    # Direct dependencies of the module, then the heaviest leaves anywhere in the tree
+    direct = [r for r in report["imports"] if r["depth"] == 1]
+    print(f"import {args.module}: {report['total_ms']} ms (interpreter + import: {report['wall_ms']} ms)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  direct import")
+    for r in sorted(direct, key=lambda r: -r["cumulative_ms"])[:args.top]:
+        print(f"{r['cumulative_ms']:>14.1f} {r['self_ms']:>9.1f}  {r['module']}")
+    print(f"\n{'self ms':>14}  slowest modules")
+    for r in sorted(report["imports"], key=lambda r: -r["self_ms"])[:args.top]:
+        print(f"{r['self_ms']:>14.1f}  {r['module']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.budget_ms is not None:
+        if report["total_ms"] > args.budget_ms:
+            print(f"\n⚠️  import {args.module} took {report['total_ms']} ms, over the {args.budget_ms} ms budget")
+            sys.exit(1)
+        print(f"\n✅ within the {args.budget_ms} ms budget")
+
+if __name__ == "__main__":
+    main()
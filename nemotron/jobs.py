@@ -0,0 +1,340 @@
+"""
+In-process background jobs behind /jobs.
+
+Each job kind has its own priority queue and a fixed number of asyncio
+workers, so e.g. one ingest and a few generations run at a time however
+many are submitted. Job state (params, progress, result) is written through
+to SQLite: jobs that were queued or running when the process stopped are
+queued again on the next start. Any worker process can answer a status poll;
+a job runs in the process it was submitted to (or claimed by after a restart).
+
+A running job records its owner (host:pid) and a heartbeat the owner
+refreshes every JOBS_HEARTBEAT_INTERVAL. It is only taken over by another
+process once its owner is gone (dead pid on this host) or its heartbeat is
+older than JOBS_HEARTBEAT_TIMEOUT. Cancelling a job another process runs
+sets a flag that the owner picks up with its next heartbeat.
+"""
+import os, json, time, uuid, socket, asyncio, sqlite3, threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Finished jobs are kept this long for polling
+JOBS_KEEP_SECONDS = float(os.getenv("JOBS_KEEP_SECONDS", str(7 * 24 * 3600)))
+# Progress is written to SQLite at most this often per job (final states always)
+JOBS_PERSIST_INTERVAL = float(os.getenv("JOBS_PERSIST_INTERVAL", "0.5"))
+# Running jobs' heartbeats are refreshed this often; one older than the timeout is taken over
+JOBS_HEARTBEAT_INTERVAL = float(os.getenv("JOBS_HEARTBEAT_INTERVAL", "2"))
+JOBS_HEARTBEAT_TIMEOUT = float(os.getenv("JOBS_HEARTBEAT_TIMEOUT", "30"))
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """Handle a runner gets: its params, and update() to report progress."""
+    def __init__(self, queue: "JobQueue", row: Dict):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.params = row["params"]
+        self.progress: Dict = row.get("progress") or {}
+        self.cancel_requested = False
+        self._persisted = 0.0
+
+    def update(self, **progress):
+        """
+        Record progress (safe to call from worker threads). Raises JobCancelled
+        once cancellation was requested, so a loop reporting progress stops there.
+        """
+        self.progress.update(progress)
+        now = time.monotonic()
+        if now - self._persisted >= JOBS_PERSIST_INTERVAL:
+            self._persisted = now
+            self.queue.store.update(self.id, progress=self.progress)
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    async def run_blocking(self, executor, fn, *args):
+        """
+        fn(*args) in executor. On cancel() this waits for fn to stop at its next
+        update() (and clean up) before the job counts as cancelled.
+        """
+        future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self.cancel_requested:
+                await asyncio.gather(future, return_exceptions=True)
+            raise
+
+class JobStore:
+    """Jobs table in SQLite (WAL), shared by the event loop and worker threads."""
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id       TEXT PRIMARY KEY,
+                kind     TEXT NOT NULL,
+                status   TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                params   TEXT NOT NULL,
+                progress TEXT NOT NULL,
+                result   TEXT,
+                error    TEXT,
+                created  REAL NOT NULL,
+                started  REAL,
+                finished REAL,
+                owner    TEXT,
+                heartbeat REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Tables created before running jobs had an owner
+        have = {r[1] for r in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, decl in (("owner", "TEXT"), ("heartbeat", "REAL"), ("cancel_requested", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in have:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {decl}")
+        self.conn.execute("DELETE FROM jobs WHERE finished < ?", (time.time() - JOBS_KEEP_SECONDS,))
+        self.conn.commit()
+
+    _COLUMNS = ("id", "kind", "status", "priority", "params", "progress", "result", "error", "created", "started", "finished",
+                "owner", "heartbeat", "cancel_requested")
+
+    def _row(self, values) -> Dict:
+        row = dict(zip(self._COLUMNS, values))
+        for k in ("params", "progress", "result"):
+            row[k] = json.loads(row[k]) if row[k] is not None else None
+        row["cancel_requested"] = bool(row["cancel_requested"])
+        return row
+
+    def insert(self, row: Dict):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, params, progress, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (row["id"], row["kind"], row["status"], row["priority"], json.dumps(row["params"]),
+                 json.dumps(row["progress"]), row["created"]))
+            self.conn.commit()
+
+    def update(self, job_id: str, **fields):
+        for k in ("progress", "result"):
+            if k in fields:
+                fields[k] = json.dumps(fields[k], default=str)
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                              (*fields.values(), job_id))
+            self.conn.commit()
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """queued -> running by owner; False if it was cancelled or another worker process took it."""
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute("UPDATE jobs SET status = 'running', started = ?, owner = ?, heartbeat = ? "
+                                    "WHERE id = ? AND status = 'queued'", (now, owner, now, job_id))
+            self.conn.commit()
+        return cur.rowcount == 1
+
+    def heartbeat(self, owner: str, job_ids: List[str]) -> List[str]:
+        """Refresh owner's running jobs; returns those another process asked to cancel."""
+        if not job_ids:
+            return []
+        marks = ", ".join("?" * len(job_ids))
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running' AND id IN ({marks})",
+                              (time.time(), owner, *job_ids))
+            self.conn.commit()
+            rows = self.conn.execute(f"SELECT id FROM jobs WHERE owner = ? AND cancel_requested = 1 AND id IN ({marks})",
+                                     (owner, *job_ids)).fetchall()
+        return [r[0] for r in rows]
+
+    def release(self, row: Dict) -> bool:
+        """
+        An abandoned running job back to queued (cancelled, if that was requested).
+        False if its owner touched it since row was read, i.e. it is not abandoned.
+        """
+        with self._lock:
+            if row["cancel_requested"]:
+                cur = self.conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                                        "WHERE id = ? AND status = 'running' AND heartbeat IS ?",
+                                        (time.time(), row["id"], row["heartbeat"]))
+            else:
+                cur = self.conn.execute("UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, heartbeat = NULL "
+                                        "WHERE id = ? AND status = 'running' AND heartbeat IS ?",
+                                        (row["id"], row["heartbeat"]))
+            self.conn.commit()
+        return cur.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            values = self.conn.execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(values) if values else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        sql = f"SELECT {', '.join(self._COLUMNS)} FROM jobs"
+        args: Tuple = ()
+        if status:
+            sql, args = sql + " WHERE status = ?", (status,)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY created DESC LIMIT ?", (*args, limit)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE status IN ('queued', 'running') "
+                                     "ORDER BY created").fetchall()
+        return [self._row(r) for r in rows]
+
+Runner = Callable[[Job], Awaitable[Dict]]
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+class JobQueue:
+    """
+    runners: kind -> (async runner(job) returning the result dict, concurrency).
+    Higher priority runs first; equal priorities run in submission order.
+    """
+    def __init__(self, path: str, runners: Dict[str, Tuple[Runner, int]]):
+        self.path = path
+        self.runners = runners
+        self.store: JobStore | None = None
+        self.queues: Dict[str, asyncio.PriorityQueue] = {}
+        self.running: Dict[str, Tuple[Job, asyncio.Task]] = {}
+        self.workers: List[asyncio.Task] = []
+        self.owner = ""
+        self._seq = 0
+        self._stopping = False
+
+    async def start(self):
+        # Set here rather than in __init__: worker processes may be forked after import
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = False
+        self.store = JobStore(self.path)
+        self.queues = {kind: asyncio.PriorityQueue() for kind in self.runners}
+        requeued = self._requeue_abandoned()
+        for row in self.store.unfinished():
+            if row["status"] == "queued" and row["kind"] in self.runners:
+                self._enqueue(row["kind"], row["priority"], row["id"])
+        if requeued:
+            print(f"✅ Re-queued {len(requeued)} job(s) interrupted by the last shutdown")
+        for kind, (_, concurrency) in self.runners.items():
+            self.workers += [asyncio.create_task(self._worker(kind)) for _ in range(max(1, concurrency))]
+        self.workers.append(asyncio.create_task(self._heartbeat()))
+
+    def _abandoned(self, row: Dict) -> bool:
+        """A running job whose owner is gone: dead pid on this host, or no recent heartbeat."""
+        if row["heartbeat"] is None or time.time() - row["heartbeat"] > JOBS_HEARTBEAT_TIMEOUT:
+            return True
+        host, _, pid = (row["owner"] or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False  # another machine: only its heartbeat tells
+        if int(pid) == os.getpid():
+            return row["id"] not in self.running  # this pid before a restart
+        return not _pid_alive(int(pid))
+
+    def _requeue_abandoned(self) -> List[Dict]:
+        """Put abandoned running jobs back in the store's queue (runners are safe to run again)."""
+        return [row for row in self.store.unfinished()
+                if row["status"] == "running" and row["kind"] in self.runners
+                and self._abandoned(row) and self.store.release(row) and not row["cancel_requested"]]
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(JOBS_HEARTBEAT_INTERVAL)
+            try:
+                for job_id in self.store.heartbeat(self.owner, list(self.running)):
+                    job, task = self.running.get(job_id, (None, None))
+                    if job is not None and not job.cancel_requested:
+                        job.cancel_requested = True
+                        task.cancel()
+                # Take over the jobs of worker processes that died
+                for row in self._requeue_abandoned():
+                    print(f"⚠️  Job {row['id']} ({row['kind']}) lost its worker {row['owner']}: re-queued")
+                    self._enqueue(row["kind"], row["priority"], row["id"])
+            except sqlite3.Error as e:
+                print(f"⚠️  Job heartbeat failed: {e}")
+
+    async def stop(self):
+        # Running jobs stay "running" in the store and are picked up again on the next start
+        self._stopping = True
+        tasks = self.workers + [task for _, task in self.running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+
+    def _enqueue(self, kind: str, priority: int, job_id: str):
+        self._seq += 1
+        self.queues[kind].put_nowait((-priority, self._seq, job_id))
+
+    def submit(self, kind: str, params: Dict, priority: int = 0) -> Dict:
+        if kind not in self.runners:
+            raise ValueError(f"Unknown job kind: {kind!r} (one of {', '.join(self.runners)})")
+        row = {"id": uuid.uuid4().hex, "kind": kind, "status": "queued", "priority": int(priority),
+               "params": params, "progress": {}, "created": time.time()}
+        self.store.insert(row)
+        self._enqueue(kind, row["priority"], row["id"])
+        return self.get(row["id"])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self.store.get(job_id)
+        if row is None:
+            return None
+        running = self.running.get(job_id)
+        if running is not None:
+            row["progress"] = dict(running[0].progress)  # fresher than the throttled copy in SQLite
+        row.pop("params", None)
+        return row
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        rows = self.store.list(status, limit)
+        for row in rows:
+            row.pop("params", None)
+        return rows
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        row = self.store.get(job_id)
+        if row is None:
+            return None
+        if row["status"] == "queued":
+            # Dropped when a worker pops it
+            self.store.update(job_id, status="cancelled", finished=time.time())
+        elif job_id in self.running:
+            job, task = self.running[job_id]
+            # Threaded runners stop at their next job.update(); async ones are cancelled right away
+            job.cancel_requested = True
+            task.cancel()
+        elif row["status"] == "running":
+            # Run by another worker process: it cancels the job on its next heartbeat
+            self.store.update(job_id, cancel_requested=1)
+        return self.get(job_id)
+
+    async def _worker(self, kind: str):
+        runner = self.runners[kind][0]
+        queue = self.queues[kind]
+        while True:
+            _, _, job_id = await queue.get()
+            if not self.store.claim(job_id, self.owner):
+                continue
+            job = Job(self, self.store.get(job_id))
+            task = asyncio.create_task(runner(job))
+            self.running[job_id] = (job, task)
+            try:
+                result = await asyncio.shield(task)
+                self.store.update(job_id, status="done", progress=job.progress, result=result, finished=time.time())
+            except (JobCancelled, asyncio.CancelledError):
+                # The runner's task may already show as cancelled by stop() too: only cancel() marks the job
+                if self._stopping or (not task.cancelled() and not job.cancel_requested):
+                    raise  # the worker itself is being stopped (shutdown)
+                self.store.update(job_id, status="cancelled", progress=job.progress, finished=time.time())
+            except Exception as e:
+                print(f"⚠️  Job {job_id} ({kind}) failed: {e}")
+                self.store.update(job_id, status="failed", progress=job.progress, error=str(e), finished=time.time())
+            finally:
+                self.running.pop(job_id, None)
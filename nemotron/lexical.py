@@ -0,0 +1,73 @@
+import re, math
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# Identifiers, optionally dotted and/or indexed: user.address.zip, items[].price, items[0].price
+_PATH_RE = re.compile(r"[A-Za-z_$][\w$-]*(?:\[\d*\])*(?:\.[A-Za-z_$][\w$-]*(?:\[\d*\])*)*")
+_INDEX_RE = re.compile(r"\[\d*\]")
+_PART_RE = re.compile(r"[_-]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by did do does for from how in is it of on or that the this
+to was were what when where which who why will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25 terms for text, aware of field paths.
+
+    `Items[0].unit_price` yields the normalized path `items[].unit_price`, its
+    prefix `items[]`, the field names `items` and `unit_price`, and the name
+    parts `unit` and `price`, so a question naming the path, a parent or just
+    the leaf all match. Array indices are folded to `[]`.
+    """
+    terms: List[str] = []
+    for m in _PATH_RE.finditer(text):
+        segs = [_INDEX_RE.sub("[]", s) for s in m.group(0).lower().split(".")]
+        if len(segs) > 1 or "[]" in segs[0]:
+            for i in range(len(segs), 0, -1):
+                prefix = ".".join(segs[:i])
+                if i > 1 or prefix.endswith("[]"):
+                    terms.append(prefix)
+        for seg in segs:
+            name = seg.replace("[]", "")
+            if not name or name in STOPWORDS:
+                continue
+            terms.append(name)
+            parts = [p for p in _PART_RE.split(name) if p]
+            if len(parts) > 1:
+                terms.extend(parts)
+    return terms
+
+def term_counts(text: str) -> Tuple[Dict[str, int], int]:
+    """({term: tf}, document length in terms)."""
+    terms = tokenize(text)
+    return dict(Counter(terms)), len(terms)
+
+def bm25(query_terms: Iterable[str], postings: Dict[str, List[Tuple[int, int]]], doclens: Dict[int, int],
+         n_docs: int, avgdl: float, k1: float = 1.2, b: float = 0.75) -> Dict[int, float]:
+    """Okapi BM25 of every document that contains at least one query term."""
+    scores: Dict[int, float] = {}
+    avgdl = avgdl or 1.0
+    for term in set(query_terms):
+        plist = postings.get(term)
+        if not plist:
+            continue
+        idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+        for fid, tf in plist:
+            norm = k1 * (1 - b + b * doclens.get(fid, avgdl) / avgdl)
+            scores[fid] = scores.get(fid, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+def rrf(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Reciprocal-rank fusion of several ranked id lists, best first. Scores are
+    scaled so an id ranked first by every non-empty list scores 1.0. Ties
+    keep the order of the earlier ranking.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, fid in enumerate(ranking, 1):
+            fused[fid] = fused.get(fid, 0.0) + 1.0 / (k + rank)
+    top = sum(1 for r in rankings if r) / (k + 1)
+    return sorted(((fid, s / top) for fid, s in fused.items()), key=lambda x: -x[1])
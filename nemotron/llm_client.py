@@ -0,0 +1,188 @@
+import os, time, random, asyncio, threading
+from typing import AsyncIterator, Dict, Tuple
+
+import httpx
+
+# Connection pool / timeout / retry policy for OpenAI-compatible LLM endpoints
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+LLM_KEEPALIVE = int(os.getenv("LLM_KEEPALIVE", "10"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport to count in-flight and total requests."""
+    def __init__(self, inner: httpx.AsyncHTTPTransport):
+        self.inner = inner
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await self.inner.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        # Streaming bodies keep the connection busy until they are closed
+        response.stream = _ReleasingStream(response.stream, self)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+    def open_connections(self) -> int:
+        pool = getattr(self.inner, "_pool", None)
+        return len(getattr(pool, "connections", []) or [])
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, transport: _CountingTransport):
+        self.stream = stream
+        self.transport = transport
+        self.released = False
+
+    async def __aiter__(self):
+        async for part in self.stream:
+            yield part
+
+    async def aclose(self) -> None:
+        if not self.released:
+            self.released = True
+            self.transport.in_flight -= 1
+        await self.stream.aclose()
+
+class LLMClientManager:
+    """
+    Process-wide pool of OpenAI-compatible clients.
+
+    Every AsyncOpenAI client (one per base URL + key) shares a single httpx
+    connection pool, so requests reuse keep-alive connections instead of paying
+    a TLS handshake each time. Retries use exponential backoff with jitter and
+    replace the SDK's own retry loop.
+    """
+    def __init__(self, pool_size: int = LLM_POOL_SIZE, keepalive: int = LLM_KEEPALIVE,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, timeout: float = LLM_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=keepalive)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.transport = _CountingTransport(httpx.AsyncHTTPTransport(limits=self.limits))
+        self.http = httpx.AsyncClient(transport=self.transport, timeout=self.timeout)
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._sync_clients: Dict[Tuple[str, str], object] = {}
+        self._sync_http = None
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    def client(self, base_url: str, api_key: str):
+        from openai import AsyncOpenAI
+        key = (base_url, api_key)
+        if key not in self._clients:
+            self._clients[key] = AsyncOpenAI(base_url=base_url, api_key=api_key,
+                                             http_client=self.http, max_retries=0)
+        return self._clients[key]
+
+    def sync_client(self, base_url: str, api_key: str):
+        """Blocking client for sync code paths; pooled the same way."""
+        from openai import OpenAI
+        with self._lock:
+            if self._sync_http is None:
+                self._sync_http = httpx.Client(limits=self.limits, timeout=self.timeout)
+            key = (base_url, api_key)
+            if key not in self._sync_clients:
+                self._sync_clients[key] = OpenAI(base_url=base_url, api_key=api_key,
+                                                 http_client=self._sync_http, max_retries=self.max_retries)
+            return self._sync_clients[key]
+
+    def _retryable(self, e: Exception) -> bool:
+        import openai
+        if isinstance(e, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True  # APITimeoutError is an APIConnectionError
+        return isinstance(e, httpx.TransportError)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def create(self, base_url: str, api_key: str, **kwargs):
+        """Non-streaming chat completion with retries."""
+        client = self.client(base_url, api_key)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not self._retryable(e):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def stream(self, base_url: str, api_key: str, **kwargs) -> AsyncIterator:
+        """
+        Streaming chat completion. Retried only until the first chunk arrives;
+        after that a failure is passed to the caller, which has already seen output.
+        """
+        client = self.client(base_url, api_key)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                completion = await client.chat.completions.create(stream=True, **kwargs)
+                async with completion:
+                    async for chunk in completion:
+                        started = True
+                        yield chunk
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not self._retryable(e):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+    def stats(self) -> Dict:
+        t = self.transport
+        return {
+            "pool_size": self.pool_size,
+            "in_flight": t.in_flight,
+            "peak_in_flight": t.peak_in_flight,
+            "utilization": round(t.in_flight / self.pool_size, 4) if self.pool_size else 0.0,
+            "open_connections": t.open_connections(),
+            "requests": t.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "clients": len(self._clients),
+        }
+
+    async def aclose(self):
+        await self.http.aclose()
+        if self._sync_http is not None:
+            self._sync_http.close()
+
+_manager: LLMClientManager | None = None
+
+def get_llm_manager() -> LLMClientManager:
+    """The process-wide manager (created on first use if startup did not)."""
+    global _manager
+    if _manager is None:
+        _manager = LLMClientManager()
+    return _manager
+
+def init_llm_manager(**kwargs) -> LLMClientManager:
+    global _manager
+    _manager = LLMClientManager(**kwargs)
+    return _manager
+
+async def close_llm_manager():
+    global _manager
+    if _manager is not None:
+        await _manager.aclose()
+        _manager = None
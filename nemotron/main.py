@@ -1,13 +1,28 @@
-import os
-from fastapi import FastAPI, UploadFile, File, Form
+import os, re, json, time, itertools, asyncio
+# Cold start: time spent importing this module and its dependencies (reported by /ready)
+_IMPORT_START = time.perf_counter()
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
-from openai import OpenAI
-from utils import load_text_files, simple_chunk
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from utils import iter_chunks, iter_chunks_parallel, dedupe_chunks
 from rag import VectorStore, format_prompt
-from nemotron.hf import hf_feature_extraction, hf_generate
-from nemotron.hf import feature_extraction
+from collection_store import Collections, DEFAULT_COLLECTION
+from hf import hf_generate_stream, stream_completion, get_embed_cache, embed_texts, warm_up as warm_up_model, NVIDIA_MODEL
+from llm_client import init_llm_manager, close_llm_manager, get_llm_manager
+from response_cache import ResponseCache, request_key
+from batcher import SearchBatcher
+from rerank import RERANK_ENABLED, get_reranker, candidates, select
+from jobs import Job, JobQueue
+from schema_diff import schema_types, diff_types
+from path_index import get_path_index, lookup_path
+from prioritize import prioritize_changes, pack, omitted_note
+from metrics import REGISTRY, HTTP_SECONDS, start_spans, server_timing, span, init_otel
 
 
 load_dotenv()
@@ -16,7 +31,44 @@ TOP_K = int(os.getenv("TOP_K", "5"))
 MAX_NEW = int(os.getenv("MAX_NEW_TOKENS", "512"))
 TEMP   = float(os.getenv("TEMPERATURE", "0.3"))
 
-nemotron = FastAPI(title="Nemotron RAG (Python)")
+# Response cache for /chat and /generate (exact + semantic tiers, SQLite-backed)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.getcwd(), "data", "response_cache.sqlite"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_SIM = float(os.getenv("RESPONSE_CACHE_SIM", "0.95"))
+
+# Concurrent /chat retrievals arriving within this window are embedded + searched together
+SEARCH_BATCH_WINDOW_MS = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "5"))
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+
+# Background jobs (/jobs): state survives restarts in this SQLite file
+JOBS_PATH = os.getenv("JOBS_PATH", os.path.join(os.getcwd(), "data", "jobs.sqlite"))
+JOB_INGEST_CONCURRENCY = int(os.getenv("JOB_INGEST_CONCURRENCY", "1"))
+JOB_GENERATE_CONCURRENCY = int(os.getenv("JOB_GENERATE_CONCURRENCY", "4"))
+
+# Load the embedding model and index at startup instead of on the first request
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") != "0"
+
+# Readiness, filled in by warm_up(); /ready answers 503 until "ready" is True
+STARTUP = {"ready": False, "import_seconds": None, "warmup_seconds": None, "model": None, "index": None, "error": None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled LLM client set for the whole process
+    init_llm_manager()
+    init_otel()
+    await JOBS.start()
+    if STARTUP_WARMUP:
+        # In the background: the port opens right away and /ready reports when everything is hot
+        app.state.warmup = asyncio.create_task(run_in_threadpool(warm_up))
+    else:
+        STARTUP["ready"] = True
+    yield
+    await JOBS.stop()
+    await close_llm_manager()
+
+nemotron = FastAPI(title="Nemotron RAG (Python)", lifespan=lifespan)
 
 # Add CORS middleware to allow requests from frontend
 nemotron.add_middleware(
@@ -27,13 +79,62 @@ nemotron.add_middleware(
     allow_headers=["*"],
 )
 
-VS = VectorStore()
+@nemotron.middleware("http")
+async def timing(request: Request, call_next):
+    # Per-request spans (embed, search, prompt, generate...) come back as a Server-Timing header
+    spans = start_spans()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                         route=route.path if route is not None else "unmatched", status=response.status_code)
+    if spans:
+        response.headers["Server-Timing"] = server_timing(spans)
+    return response
+
+# Named indexes (one per project / API pair); requests without "collection" use "default"
+COLLECTIONS = Collections()
+# One ingest at a time; chunking fans out to the process pool in utils
+INGEST_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+# Concurrent retrievals against the same collection are coalesced: one batcher per collection
+SEARCHERS: dict[str, SearchBatcher] = {}
+
+def get_searcher(collection: str) -> SearchBatcher:
+    searcher = SEARCHERS.get(collection)
+    if searcher is None:
+        searcher = SEARCHERS[collection] = SearchBatcher(
+            lambda queries, k: COLLECTIONS.get(collection).search_batch(queries, k),
+            SEARCH_BATCH_WINDOW_MS, SEARCH_BATCH_MAX)
+    return searcher
+
+def searcher_stats() -> dict:
+    per = {name: s.stats() for name, s in SEARCHERS.items()}
+    batches = sum(s["batches"] for s in per.values())
+    queries = sum(s["queries"] for s in per.values())
+    return {
+        "window_ms": SEARCH_BATCH_WINDOW_MS, "max_batch": SEARCH_BATCH_MAX,
+        "batches": batches, "queries": queries,
+        "avg_batch": round(queries / batches, 2) if batches else 0.0,
+        "largest_batch": max((s["largest_batch"] for s in per.values()), default=0),
+        "busy_s": round(sum(s["busy_s"] for s in per.values()), 4),
+        "collections": per,
+    }
 
 class ChatIn(BaseModel):
     query: str
+    collection: str = DEFAULT_COLLECTION
+    top_k: int | None = None
+    max_new_tokens: int | None = None
+    temperature: float | None = None
+    cache: bool = True  # False skips the response cache lookup (the answer is still stored)
+
+class ChatBatchIn(BaseModel):
+    queries: list[str]
+    collection: str = DEFAULT_COLLECTION
     top_k: int | None = None
     max_new_tokens: int | None = None
     temperature: float | None = None
+    cache: bool = True
 
 class GenerateIn(BaseModel):
     query: str | None = None
@@ -43,178 +144,467 @@ class GenerateIn(BaseModel):
     top_k: int | None = None
     max_new_tokens: int | None = None
     temperature: float | None = None
+    cache: bool = True
+    # single | map_reduce | auto (map_reduce from GENERATE_MAP_REDUCE_MIN changes up)
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
+
+def get_response_cache() -> ResponseCache | None:
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if not hasattr(get_response_cache, "_cache"):
+        get_response_cache._cache = ResponseCache(
+            RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIM)
+    return get_response_cache._cache
+
+# sync: store ends up holding exactly these chunks, only changed ones are embedded
+# append: upsert these chunks and keep everything else
+# rebuild: drop the index and embed everything again
+IngestMode = Literal["sync", "append", "rebuild"]
+
+def run_ingest(chunks, mode: IngestMode, collection: str, progress=None) -> dict | None:
+    """Blocking ingest of a chunk stream into a collection; None if it yields nothing."""
+    # sync deletes whatever is not in this ingest: never fall into it on an unknown mode
+    if mode not in ("sync", "append", "rebuild"):
+        raise ValueError(f"Unknown ingest mode: {mode!r} (sync, append or rebuild)")
+    # Identical chunks (shared boilerplate) are embedded and stored once
+    chunks = dedupe_chunks(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return None
+    stream = itertools.chain([first], chunks)
+    if mode == "rebuild":
+        # Built in a new version directory and swapped in: /chat keeps using the old one meanwhile
+        return COLLECTIONS.rebuild(collection, stream, progress)
+    # sync prunes chunks missing from this ingest, append keeps them
+    return COLLECTIONS.update(collection, stream, prune=(mode == "sync"), progress=progress)
 
 @nemotron.post("/ingest")
 async def ingest(
     # Option A: ingest whole folder (default: data/docs)
     folder: str = Form(default="data/docs"),
     # Option B: OR upload ad-hoc text files
-    files: list[UploadFile] | None = File(default=None)
+    files: list[UploadFile] | None = File(default=None),
+    # sync | append | rebuild (see IngestMode); anything else is rejected with a 422
+    mode: IngestMode = Form(default="sync"),
+    # chunking processes this ingest may keep busy (clamped to 1..INGEST_WORKERS, the shared pool's size)
+    workers: int | None = Form(default=None),
+    # named index to write to (one per project / API pair)
+    collection: str = Form(default=DEFAULT_COLLECTION),
 ):
-    chunks = []
+    try:
+        COLLECTIONS.current_path(collection)
+    except ValueError as e:
+        return {"ok": False, "msg": str(e)}
     if files:
-        # Push uploaded files into memory and chunk
+        # Uploads are already in memory; chunk them lazily like folder docs
+        docs = []
         for f in files:
-            text = (await f.read()).decode("utf-8", errors="ignore")
-            for i, ch in enumerate(simple_chunk(text)):
-                chunks.append({"id": f.filename + f"#{i}", "text": ch})
+            docs.append({"id": f.filename, "text": (await f.read()).decode("utf-8", errors="ignore")})
+        chunks = iter_chunks(docs)
     else:
-        docs = load_text_files(folder)
-        for d in docs:
-            for i, ch in enumerate(simple_chunk(d["text"])):
-                chunks.append({"id": d["id"] + f"#{i}", "text": ch})
-
-    if not chunks:
+        chunks = iter_chunks_parallel(folder, workers)
+    # File reads, chunking and embedding all block: keep them off the event loop
+    stats = await asyncio.get_running_loop().run_in_executor(INGEST_EXECUTOR, run_ingest, chunks, mode, collection)
+    if stats is None:
         return {"ok": False, "msg": "No text found to ingest."}
+    return {"ok": True, "collection": collection, **stats}
 
-    VS.build(chunks)
-    return {"ok": True, "chunks": len(chunks)}
+def sse(event: dict) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
-@nemotron.post("/chat")
-async def chat(payload: ChatIn):
-    # lazy-load index if needed
+async def get_store(collection: str) -> VectorStore | None:
+    """The collection's current index (loaded if needed); None if there is none yet."""
     try:
-        if VS.index is None:
-            VS.load()
-    except FileNotFoundError:
-        return {"ok": False, "msg": "Index not found. Run /ingest first."}
+        return await run_in_threadpool(COLLECTIONS.get, collection)
+    except (FileNotFoundError, ValueError):
+        return None
 
-    k = payload.top_k or TOP_K
-    hits = VS.search(payload.query, k=k)
-    contexts = [m for _, m in hits]
-    prompt = format_prompt(contexts, payload.query)
+def not_found(collection: str) -> dict:
+    return {"ok": False, "msg": f"Index not found for collection '{collection}'. Run /ingest first."}
 
-    out = hf_generate(
+def warm_up():
+    """
+    Startup warm-up: embedding model (plus one encode), index and metadata
+    store (plus one search, which faults in the memory-mapped pages) and the response cache.
+    """
+    start = time.perf_counter()
+    try:
+        STARTUP["model"] = warm_up_model()
+        try:
+            vs = COLLECTIONS.get(DEFAULT_COLLECTION)
+            vs.search_batch(["warm-up"], 1)
+            STARTUP["index"] = {"chunks": int(vs.index.ntotal), "type": vs.index_spec.get("type")}
+        except FileNotFoundError:
+            STARTUP["index"] = "empty"  # nothing ingested yet: nothing to load
+        if RERANK_ENABLED:
+            get_reranker().score([("warm-up", "field user.address.zip changed from number to string")])
+        get_response_cache()
+        STARTUP["ready"] = True
+        print(f"✅ Warm-up done in {time.perf_counter() - start:.2f}s ({STARTUP['model']['backend']} embeddings)")
+    except Exception as e:
+        STARTUP["error"] = str(e)
+        print(f"⚠️  Warm-up failed: {e}")
+    STARTUP["warmup_seconds"] = round(time.perf_counter() - start, 3)
+
+async def retrieve(query: str, top_k: int | None, collection: str = DEFAULT_COLLECTION):
+    """
+    Embed + FAISS search for one query in a collection, coalesced with concurrent
+    requests by its batcher and run in a thread, then re-ranked / cut down to
+    what goes in the prompt (rerank.py). Returns None if there is no index yet.
+    """
+    if await get_store(collection) is None:
+        return None
+    top_k = top_k or TOP_K
+    # Batches run on executor threads, so time the wait here for this request's spans
+    with span("retrieve"):
+        hits = await get_searcher(collection).search(query, candidates(top_k))
+    with span("rerank"):
+        return (await run_in_threadpool(select, [query], [hits], top_k))[0]
+
+class CachedCall:
+    """
+    Response-cache bookkeeping for one /chat or /generate call.
+
+    key is the exact-match key; scope + the query embedding drive the semantic
+    tier (for /chat the scope pins the retrieved context ids, so a paraphrased
+    question only reuses an answer grounded in the same chunks).
+    """
+    def __init__(self, key: str, scope: str | None = None, query: str | None = None):
+        self.cache = get_response_cache()
+        self.key = key
+        self.scope = scope
+        self.query = query
+        self.vec = None
+        self.hit = None
+
+    async def lookup(self, enabled: bool = True) -> dict | None:
+        if self.cache is None:
+            return None
+        if self.scope and self.query:
+            # Served from the embedding cache when retrieval already embedded this query
+            self.vec = (await run_in_threadpool(embed_texts, [self.query]))[0]
+        if not enabled:
+            return None
+        entry, self.hit = await run_in_threadpool(self.cache.get, self.key, self.scope, self.vec)
+        return entry
+
+    async def store(self, answer: str, reasoning: str | None = None):
+        if self.cache is not None and answer:
+            await run_in_threadpool(self.cache.put, self.key, answer, reasoning, self.scope, self.vec)
+
+    def stats(self) -> dict | None:
+        if self.cache is None:
+            return None
+        return {"hit": self.hit, **self.cache.stats()}
+
+def chat_cache(payload: ChatIn, hits, prompt: str) -> CachedCall:
+    temperature = payload.temperature or TEMP
+    max_tokens = payload.max_new_tokens or MAX_NEW
+    return CachedCall(
+        request_key(kind="chat", model=NVIDIA_MODEL, temperature=temperature, max_tokens=max_tokens, prompt=prompt),
+        scope=request_key(kind="chat", model=NVIDIA_MODEL, temperature=temperature, max_tokens=max_tokens,
+                          collection=payload.collection, contexts=[m["id"] for _, m in hits]),
+        query=payload.query,
+    )
+
+async def generate_chat(prompt: str, payload: ChatIn) -> tuple[str, bool]:
+    """
+    (answer, fallback): fallback answers come from simple_text_generation and are not cached.
+    Raises if the LLM fails after it started answering (before that it falls back).
+    """
+    parts, fallback = [], False
+    async for event in hf_generate_stream(
         prompt,
         max_new_tokens=payload.max_new_tokens or MAX_NEW,
         temperature=payload.temperature or TEMP,
-    )
+    ):
+        if event["type"] == "token":
+            parts.append(event["text"])
+            fallback = fallback or event.get("fallback", False)
+    return "".join(parts).strip(), fallback
+
+@nemotron.post("/chat")
+async def chat(payload: ChatIn):
+    hits = await retrieve(payload.query, payload.top_k, payload.collection)
+    if hits is None:
+        return not_found(payload.collection)
+
+    contexts = [m for _, m in hits]
+    with span("prompt"):
+        prompt = format_prompt(contexts, payload.query)
+
+    cached = chat_cache(payload, hits, prompt)
+    entry = await cached.lookup(payload.cache)
+    if entry is not None:
+        out = entry["answer"]
+    else:
+        try:
+            out, fallback = await generate_chat(prompt, payload)
+        except Exception as e:
+            print(f"⚠️  /chat error: {e}")
+            return {"ok": False, "msg": f"Generation failed: {e}", "contexts": contexts}
+        if not fallback:
+            await cached.store(out)
 
     return {
         "ok": True,
         "answer": out.strip(),
         "contexts": contexts,          # you can show these in the UI as citations
-        "scores": [s for s, _ in hits] # similarity scores (0..1 after L2 norm/IP)
+        "scores": [s for s, _ in hits], # 0..1: cosine, fused rank with HYBRID_SEARCH, cross-encoder with RERANK
+        "cache": cached.stats(),
     }
 
+@nemotron.post("/chat/stream")
+async def chat_stream(payload: ChatIn):
+    """
+    Server-Sent Events version of /chat: a "contexts" event, then "token" events
+    as the model produces them, then "done". A cached answer arrives as one token event.
+    """
+    hits = await retrieve(payload.query, payload.top_k, payload.collection)
+    if hits is None:
+        return not_found(payload.collection)
+
+    contexts = [m for _, m in hits]
+    with span("prompt"):
+        prompt = format_prompt(contexts, payload.query)
+    cached = chat_cache(payload, hits, prompt)
+    entry = await cached.lookup(payload.cache)
+
+    async def events():
+        yield sse({"type": "contexts", "contexts": contexts, "scores": [s for s, _ in hits]})
+        if entry is not None:
+            yield sse({"type": "token", "text": entry["answer"]})
+            yield sse({"type": "done", "cache": cached.stats()})
+            return
+        parts, fallback = [], False
+        try:
+            async for event in hf_generate_stream(
+                prompt,
+                max_new_tokens=payload.max_new_tokens or MAX_NEW,
+                temperature=payload.temperature or TEMP,
+            ):
+                if event["type"] == "token":
+                    parts.append(event["text"])
+                    fallback = fallback or event.get("fallback", False)
+                yield sse(event)
+        except Exception as e:
+            yield sse({"type": "error", "msg": str(e)})
+            return
+        if not fallback:
+            await cached.store("".join(parts).strip())
+        yield sse({"type": "done", "cache": cached.stats()})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@nemotron.post("/chat/batch")
+async def chat_batch(payload: ChatBatchIn):
+    """
+    Several questions in one call: one batched embed + search, then the answers
+    are generated concurrently. Results come back in query order; one whose
+    generation failed has ok: false and a msg.
+    """
+    if not payload.queries:
+        return {"ok": True, "results": []}
+    vs = await get_store(payload.collection)
+    if vs is None:
+        return not_found(payload.collection)
+    top_k = payload.top_k or TOP_K
+    all_hits = await run_in_threadpool(vs.search_batch, payload.queries, candidates(top_k))
+    all_hits = await run_in_threadpool(select, payload.queries, all_hits, top_k)
+
+    async def answer(query: str, hits) -> dict:
+        one = ChatIn(query=query, collection=payload.collection, top_k=payload.top_k,
+                     max_new_tokens=payload.max_new_tokens, temperature=payload.temperature, cache=payload.cache)
+        contexts = [m for _, m in hits]
+        prompt = format_prompt(contexts, query)
+        cached = chat_cache(one, hits, prompt)
+        entry = await cached.lookup(one.cache)
+        if entry is not None:
+            out = entry["answer"]
+        else:
+            try:
+                out, fallback = await generate_chat(prompt, one)
+            except Exception as e:
+                # Only this query fails; the others still get their answers
+                print(f"⚠️  /chat/batch error: {e}")
+                return {"query": query, "ok": False, "msg": f"Generation failed: {e}", "contexts": contexts}
+            if not fallback:
+                await cached.store(out)
+        return {
+            "ok": True,
+            "query": query,
+            "answer": out.strip(),
+            "contexts": contexts,
+            "scores": [s for s, _ in hits],
+            "cache": cached.stats(),
+        }
+
+    results = await asyncio.gather(*(answer(q, h) for q, h in zip(payload.queries, all_hits)))
+    return {"ok": True, "results": list(results)}
+
+@nemotron.get("/search-batching")
+async def search_batching_stats():
+    return {"ok": True, **searcher_stats()}
+
+@nemotron.get("/rerank")
+async def rerank_stats():
+    """Cross-encoder score cache and how many candidates the adaptive cutoff keeps."""
+    return {"ok": True, **get_reranker().stats()}
+
+@nemotron.get("/collections")
+async def collections():
+    """Collections on disk and the ones loaded in this worker (LRU by count and index size)."""
+    return {"ok": True, "collections": await run_in_threadpool(COLLECTIONS.names), **COLLECTIONS.stats()}
+
+REGISTRY.gauge("nemotron_llm_pool", "LLM connection pool", lambda: get_llm_manager().stats())
+REGISTRY.gauge("nemotron_embed_cache", "Embedding cache", lambda: get_embed_cache().stats())
+REGISTRY.gauge("nemotron_response_cache", "Response cache", lambda: get_response_cache().stats())
+REGISTRY.gauge("nemotron_search_batching", "Search micro-batching", searcher_stats)
+REGISTRY.gauge("nemotron_collections", "Loaded collections", COLLECTIONS.stats)
+REGISTRY.gauge("nemotron_rerank", "Re-ranking", lambda: get_reranker().stats())
+REGISTRY.gauge("nemotron_startup", "Startup", lambda: {"ready": int(STARTUP["ready"]), "import_seconds": STARTUP["import_seconds"],
+                                                      "warmup_seconds": STARTUP["warmup_seconds"]})
+
+@nemotron.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the model and index are loaded and warmed up, 503 before."""
+    return JSONResponse({"ok": STARTUP["ready"], **STARTUP}, status_code=200 if STARTUP["ready"] else 503)
+
+@nemotron.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the service histograms, counters and cache/pool gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@nemotron.get("/llm-pool")
+async def llm_pool_stats():
+    return {"ok": True, **get_llm_manager().stats()}
+
+@nemotron.get("/embed-cache")
+async def embed_cache_stats():
+    cache = get_embed_cache()
+    if cache is None:
+        return {"ok": False, "msg": "Embedding cache disabled (EMBED_CACHE=0)."}
+    return {"ok": True, **cache.stats()}
+
+@nemotron.get("/response-cache")
+async def response_cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return {"ok": False, "msg": "Response cache disabled (RESPONSE_CACHE=0)."}
+    return {"ok": True, **cache.stats()}
+
+@nemotron.post("/diff")
+async def diff(old: UploadFile = File(...), new: UploadFile = File(...)):
+    """
+    Schema diff of two JSON documents (same report as diffSchemas in lib/diff.ts).
+    Uploads are parsed as event streams, both at once, so large dumps stay off the heap.
+    """
+    try:
+        A, B = await asyncio.gather(run_in_threadpool(schema_types, old.file),
+                                    run_in_threadpool(schema_types, new.file))
+    except Exception as e:
+        return {"ok": False, "msg": f"Could not parse JSON: {e}"}
+    return {"ok": True, **diff_types(A, B)}
+
 def extract_value_by_path(obj: dict, path: str):
     """
     Extract a value from a nested dictionary using a dot-separated path.
     Example: extract_value_by_path({"user": {"name": "John"}}, "user.name") -> "John"
+    Also accepts "items[0].price" and the diff engine's "items[].price".
+    For many lookups on one document use get_path_index(obj).get(path).
     """
-    try:
-        keys = path.split(".")
-        current = obj
-        for key in keys:
-            # Handle array indices like "items[0]"
-            if "[" in key and "]" in key:
-                key_part = key[:key.index("[")]
-                idx_part = key[key.index("[")+1:key.index("]")]
-                if key_part:
-                    current = current[key_part]
-                current = current[int(idx_part)]
-            else:
-                if isinstance(current, dict):
-                    current = current.get(key)
-                else:
-                    return None
-            if current is None:
-                return None
-        return current
-    except (KeyError, IndexError, TypeError, AttributeError):
-        return None
-    
-@nemotron.post("/generate")
-async def generate(payload: GenerateIn):
-    text_to_embed = payload.query or "Analyze API schema changes"
-    embedding = hf_feature_extraction([text_to_embed])[0]
-    print("Generated embedding:", embedding[:10]) 
+    return lookup_path(obj, path)
     
-@nemotron.post("/generate")
-async def generate(payload: GenerateIn):
+# NVIDIA endpoint for /generate (model/key can differ from the /chat defaults in hf.py)
+GENERATE_BASE_URL = os.getenv("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1")
+
+# Map-reduce /generate: one completion per top-level field group, then a merging completion
+GENERATE_MAP_REDUCE_MIN = int(os.getenv("GENERATE_MAP_REDUCE_MIN", "150"))
+GENERATE_MAP_CONCURRENCY = int(os.getenv("GENERATE_MAP_CONCURRENCY", "4"))
+GENERATE_MAP_MIN_PARTITION = int(os.getenv("GENERATE_MAP_MIN_PARTITION", "3"))  # smaller groups share one partition
+GENERATE_MAP_MAX_TOKENS = int(os.getenv("GENERATE_MAP_MAX_TOKENS", "400"))
+GENERATE_REDUCE_CONTEXT_CHARS = int(os.getenv("GENERATE_REDUCE_CONTEXT_CHARS", "12000"))
+
+GENERATE_QUERY = (
+    "Analyze these API changes and explain WHY the API was changed from v1 to v2. "
+    "Focus on the business logic, data modeling improvements, or technical reasons behind each change. "
+    "Use the field names, types, and actual values to provide insights. "
+    "Explain what problems the changes might solve or what improvements they bring."
+)
+
+def format_value(value) -> str:
+    # Format value nicely (limit length)
+    value_str = json.dumps(value) if not isinstance(value, (str, int, float, bool)) else str(value)
+    if len(value_str) > 100:
+        value_str = value_str[:100] + "..."
+    return value_str
+
+def schema_indexes(payload: GenerateIn) -> tuple:
+    """(old, new) PathIndex of the payload's schemas, None where a schema is missing."""
+    return (get_path_index(payload.old_schema) if payload.old_schema else None,
+            get_path_index(payload.new_schema) if payload.new_schema else None)
+
+def build_generate_request(payload: GenerateIn, indexes: tuple | None = None) -> dict:
     """
-    Generate insights on why API v1 was changed to v2 using fields and values.
-    Accepts changes content with old/new schemas and generates reasoning insights.
+    Chat-completion kwargs (model, messages, sampling params) for a /generate payload.
+    indexes: schema_indexes(payload), when the caller already has them (map-reduce partitions).
     """
-    try:
-        import json
-        
-        # Get NVIDIA API key from environment
-        nvidia_api_key = os.getenv("NVIDIA_API_KEY", "x")
-        
-        client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=nvidia_api_key
-        )
-        
-        # Use available Nemotron models
-        model = os.getenv("NVIDIA_MODEL", "nvidia/llama-3.1-nemotron-nano-8b-v1")
-        
-        # Get parameters from payload or use defaults
-        temperature = payload.temperature or TEMP
-        max_tokens = payload.max_new_tokens or MAX_NEW
-        
-        # Build the context with changes, old schema, and new schema
-        context_parts = []
-        
-        if payload.changes:
-            context_parts.append("=== API CHANGES DETECTED ===\n")
-            for i, change in enumerate(payload.changes[:10], 1):  # Limit to top 10 changes
-                change_path = change.get("path", "unknown")
-                change_kind = change.get("kind", "UNKNOWN")
-                
-                if change_kind == "REMOVED_FIELD":
-                    old_type = change.get("oldType", "unknown")
-                    context_parts.append(f"{i}. REMOVED: Field '{change_path}' (was {old_type})")
-                elif change_kind == "ADDED_FIELD":
-                    new_type = change.get("newType", "unknown")
-                    context_parts.append(f"{i}. ADDED: Field '{change_path}' (now {new_type})")
-                elif change_kind == "TYPE_CHANGED":
-                    old_type = change.get("oldType", "unknown")
-                    new_type = change.get("newType", "unknown")
-                    context_parts.append(f"{i}. TYPE CHANGED: Field '{change_path}' changed from {old_type} to {new_type}")
-        
-        # Add old schema values for changed fields
-        if payload.old_schema and payload.changes:
-            context_parts.append("\n=== OLD API (v1) VALUES ===\n")
-            for change in payload.changes[:10]:
+    # Use available Nemotron models
+    model = os.getenv("NVIDIA_MODEL", "nvidia/llama-3.1-nemotron-nano-8b-v1")
+    
+    # Get parameters from payload or use defaults
+    temperature = payload.temperature or TEMP
+    max_tokens = payload.max_new_tokens or MAX_NEW
+    
+    # Build the context with changes, old schema, and new schema
+    context_parts = []
+    
+    if payload.changes:
+        # Flattened once per document (and cached by its hash), then one dict lookup per change
+        old_index, new_index = indexes or schema_indexes(payload)
+
+        def render(item: dict) -> list[str]:
+            # Values are shown for single changes; collapsed sibling groups are summary lines only
+            item["old"], item["new"] = [], []
+            if len(item["changes"]) == 1:
+                change = item["changes"][0]
                 path = change.get("path", "")
-                if path:
-                    # Extract value from old schema using path
-                    value = extract_value_by_path(payload.old_schema, path)
+                if path and old_index is not None:
+                    value = old_index.get(path)
                     if value is not None:
-                        # Format value nicely (limit length)
-                        value_str = json.dumps(value) if not isinstance(value, (str, int, float, bool)) else str(value)
-                        if len(value_str) > 100:
-                            value_str = value_str[:100] + "..."
-                        context_parts.append(f"  {path}: {value_str}")
-        
+                        item["old"].append(f"  {path}: {format_value(value)}")
+                if path and new_index is not None and change.get("kind") != "REMOVED_FIELD":
+                    value = new_index.get(path)
+                    if value is not None:
+                        item["new"].append(f"  {path}: {format_value(value)}")
+            return [item["line"], *item["old"], *item["new"]]
+
+        # Most severe changes first (lib/score.ts weights), as many as fit the token budget
+        kept, dropped = pack(prioritize_changes(payload.changes), render)
+        context_parts.append("=== API CHANGES DETECTED ===\n")
+        for i, item in enumerate(kept, 1):
+            context_parts.append(f"{i}. {item['line']}")
+        if dropped:
+            context_parts.append(omitted_note(dropped))
+    
+        # Add old schema values for changed fields
+        if old_index is not None:
+            context_parts.append("\n=== OLD API (v1) VALUES ===\n")
+            for item in kept:
+                context_parts.extend(item["old"])
+    
         # Add new schema values for changed fields
-        if payload.new_schema and payload.changes:
+        if new_index is not None:
             context_parts.append("\n=== NEW API (v2) VALUES ===\n")
-            for change in payload.changes[:10]:
-                path = change.get("path", "")
-                if path and change.get("kind") != "REMOVED_FIELD":
-                    # Extract value from new schema using path
-                    value = extract_value_by_path(payload.new_schema, path)
-                    if value is not None:
-                        # Format value nicely (limit length)
-                        value_str = json.dumps(value) if not isinstance(value, (str, int, float, bool)) else str(value)
-                        if len(value_str) > 100:
-                            value_str = value_str[:100] + "..."
-                        context_parts.append(f"  {path}: {value_str}")
-        
-        # Build the user message
-        changes_context = "\n".join(context_parts) if context_parts else "No changes provided."
-        
-        user_query = payload.query or (
-            "Analyze these API changes and explain WHY the API was changed from v1 to v2. "
-            "Focus on the business logic, data modeling improvements, or technical reasons behind each change. "
-            "Use the field names, types, and actual values to provide insights. "
-            "Explain what problems the changes might solve or what improvements they bring."
-        )
-        
-        user_message = f"""API Schema Migration Analysis Request:
+            for item in kept:
+                context_parts.extend(item["new"])
+    
+    # Build the user message
+    changes_context = "\n".join(context_parts) if context_parts else "No changes provided."
+    
+    user_query = payload.query or GENERATE_QUERY
+    
+    user_message = f"""API Schema Migration Analysis Request:
 
 {changes_context}
 
@@ -226,59 +616,204 @@ Please provide insights on why these changes were made, focusing on:
 3. The likely reasoning behind specific field changes based on their values and types
 4. Any patterns or trends in the changes that suggest architectural improvements
 """
+    
+    # Create system prompt focused on reasoning and insights
+    system_prompt = (
+        "You are an API migration analyst with deep expertise in API design and evolution. "
+        "Your task is to analyze API schema changes and provide insights on WHY changes were made, "
+        "not just WHAT changed. Consider:\n"
+        "- Data modeling improvements (better structure, normalization, denormalization)\n"
+        "- Business logic changes (new requirements, feature additions)\n"
+        "- Technical improvements (performance, scalability, maintainability)\n"
+        "- Backward compatibility concerns\n"
+        "- Industry best practices and patterns\n\n"
+        "Use the actual field names, types, and values to infer the reasoning behind changes. "
+        "Be specific and provide actionable insights. Keep explanations clear and concise."
+    )
+
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=temperature,
+        top_p=0.95,
+        max_tokens=min(max_tokens, 800),  # Allow more tokens for detailed insights
+        frequency_penalty=0,
+        presence_penalty=0,
+    )
+
+def generate_target() -> dict:
+    return {"base_url": GENERATE_BASE_URL, "api_key": os.getenv("NVIDIA_API_KEY", "x")}
+
+def generate_cache(payload: GenerateIn, request: dict) -> CachedCall:
+    """
+    Exact tier: the full request (model, sampling params, prompt built from the changes).
+    Semantic tier: same request apart from the free-text question.
+    """
+    params = {k: v for k, v in request.items() if k != "messages"}
+    return CachedCall(
+        request_key(kind="generate", base_url=GENERATE_BASE_URL, **request),
+        scope=request_key(kind="generate", base_url=GENERATE_BASE_URL, changes=payload.changes,
+                          old_schema=payload.old_schema, new_schema=payload.new_schema, **params),
+        query=payload.query,
+    )
+
+def use_map_reduce(payload: GenerateIn) -> bool:
+    n = len(payload.changes or [])
+    if payload.mode == "map_reduce":
+        return n > 0
+    return payload.mode == "auto" and n >= GENERATE_MAP_REDUCE_MIN
+
+def partition_changes(changes: list[dict]) -> list[tuple[str, list[dict]]]:
+    """
+    (name, changes) per top-level field ("user" for user.address.zip, items[].id -> "items").
+    Groups under GENERATE_MAP_MIN_PARTITION changes are pooled into one partition.
+    """
+    groups: dict[str, list[dict]] = {}
+    for c in changes:
+        groups.setdefault(re.split(r"[.\[]", c.get("path", ""), maxsplit=1)[0] or "(root)", []).append(c)
+    parts, other = [], []
+    for name, members in groups.items():
+        if len(members) < GENERATE_MAP_MIN_PARTITION:
+            other.extend(members)
+        else:
+            parts.append((name, members))
+    if other:
+        parts.append(("(other fields)", other))
+    return parts
+
+async def complete(request: dict) -> tuple[str, str | None]:
+    """(answer, reasoning) of one /generate-style completion."""
+    answer, reasoning = [], []
+    async for event in stream_completion(**generate_target(), **request):
+        (reasoning if event["type"] == "reasoning" else answer).append(event["text"])
+    return "".join(answer).strip(), "".join(reasoning).strip() or None
+
+async def map_partitions(payload: GenerateIn):
+    """
+    Map step: one completion per partition, at most GENERATE_MAP_CONCURRENCY at a
+    time, yielded as they finish. Each partition is cached on its own request, so
+    after a small diff change only the partitions it touches are regenerated.
+    """
+    sem = asyncio.Semaphore(GENERATE_MAP_CONCURRENCY)
+    query = ("Analyze only the changes listed here: they are one area of a larger API change, "
+             "and the analyses of all areas will be merged afterwards. Be brief and specific.")
+    if payload.query:
+        query += f" The user asks: {payload.query}"
+    # Partitions share the schemas: look them up (hash + cache) once, not once per partition
+    indexes = schema_indexes(payload)
+
+    async def run(name: str, changes: list[dict]) -> dict:
+        part = payload.model_copy(update={"changes": changes, "query": query,
+                                          "max_new_tokens": GENERATE_MAP_MAX_TOKENS})
+        request = build_generate_request(part, indexes)
+        cached = CachedCall(request_key(kind="generate-map", base_url=GENERATE_BASE_URL, **request))
+        entry = await cached.lookup(payload.cache)
+        if entry is not None:
+            answer = entry["answer"]
+        else:
+            async with sem:
+                answer, _ = await complete(request)
+            await cached.store(answer)
+        return {"name": name, "changes": len(changes), "answer": answer, "cached": entry is not None}
+
+    tasks = [asyncio.create_task(run(name, changes)) for name, changes in partition_changes(payload.changes)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def build_reduce_request(payload: GenerateIn, partials: list[dict]) -> dict:
+    """Reduce step: merge the partition analyses into one answer (same model and system prompt as /generate)."""
+    request = build_generate_request(payload.model_copy(update={"changes": []}))
+    per_part = GENERATE_REDUCE_CONTEXT_CHARS // max(1, len(partials))
+    sections = "\n\n".join(
+        f"### {p['name']} ({p['changes']} changes)\n{p['answer'][:per_part]}"
+        for p in sorted(partials, key=lambda p: p["name"])  # stable prompt -> cacheable
+    )
+    total = sum(p["changes"] for p in partials)
+    request["messages"][1]["content"] = f"""API Schema Migration Analysis Request:
+
+The diff has {total} changes. Each group of fields below was analyzed separately:
+
+{sections}
+
+Question: {payload.query or GENERATE_QUERY}
+
+Merge these partial analyses into one answer, focusing on:
+1. What problems or limitations in v1 these changes address
+2. What improvements or benefits v2 provides
+3. The most important (breaking) changes and what clients must do
+4. Patterns that span several groups and suggest architectural improvements
+"""
+    return request
+
+async def generate_map_reduce(payload: GenerateIn) -> dict:
+    partials = [p async for p in map_partitions(payload)]
+    request = build_reduce_request(payload, partials)
+    cached = CachedCall(request_key(kind="generate-reduce", base_url=GENERATE_BASE_URL, **request))
+    entry = await cached.lookup(payload.cache)
+    if entry is not None:
+        answer, reasoning = entry["answer"], entry["reasoning"]
+    else:
+        answer, reasoning = await complete(request)
+        await cached.store(answer, reasoning)
+    return {
+        "ok": True,
+        "answer": answer or "No response generated.",
+        "reasoning": reasoning,
+        "model": request["model"],
+        "mode": "map_reduce",
+        "partitions": [{k: p[k] for k in ("name", "changes", "cached")} for p in partials],
+        "cache": cached.stats(),
+    }
+
+@nemotron.post("/generate")
+async def generate(payload: GenerateIn):
+    """
+    Generate insights on why API v1 was changed to v2 using fields and values.
+    Accepts changes content with old/new schemas and generates reasoning insights.
+    Large diffs (mode "map_reduce", or "auto" past GENERATE_MAP_REDUCE_MIN changes)
+    are analyzed per top-level field and merged.
+    """
+    try:
+        if use_map_reduce(payload):
+            return await generate_map_reduce(payload)
+        with span("prompt"):
+            request = build_generate_request(payload)
+        cached = generate_cache(payload, request)
+        entry = await cached.lookup(payload.cache)
+        if entry is not None:
+            return {
+                "ok": True,
+                "answer": entry["answer"],
+                "reasoning": entry["reasoning"],
+                "model": request["model"],
+                "cache": cached.stats(),
+            }
         
-        # Create system prompt focused on reasoning and insights
-        system_prompt = (
-            "You are an API migration analyst with deep expertise in API design and evolution. "
-            "Your task is to analyze API schema changes and provide insights on WHY changes were made, "
-            "not just WHAT changed. Consider:\n"
-            "- Data modeling improvements (better structure, normalization, denormalization)\n"
-            "- Business logic changes (new requirements, feature additions)\n"
-            "- Technical improvements (performance, scalability, maintainability)\n"
-            "- Backward compatibility concerns\n"
-            "- Industry best practices and patterns\n\n"
-            "Use the actual field names, types, and values to infer the reasoning behind changes. "
-            "Be specific and provide actionable insights. Keep explanations clear and concise."
-        )
-        
-        # Create completion with streaming
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=temperature,
-            top_p=0.95,
-            max_tokens=min(max_tokens, 800),  # Allow more tokens for detailed insights
-            frequency_penalty=0,
-            presence_penalty=0,
-            stream=True,
-        )
-        
-        # Collect all chunks from the stream
+        # Collect all chunks from the stream (awaited, so the event loop stays free)
         full_response = ""
         reasoning_content = ""
         
-        for chunk in completion:
-            if chunk.choices and len(chunk.choices) > 0:
-                delta = chunk.choices[0].delta
-                
-                # Collect reasoning content if available
-                reasoning = getattr(delta, "reasoning_content", None)
-                if reasoning:
-                    reasoning_content += reasoning
-                
-                # Collect actual content
-                if delta.content is not None:
-                    full_response += delta.content
+        async for event in stream_completion(**generate_target(), **request):
+            if event["type"] == "reasoning":
+                reasoning_content += event["text"]
+            else:
+                full_response += event["text"]
+        await cached.store(full_response.strip(), reasoning_content.strip() or None)
         
         # Return response
         return {
             "ok": True,
             "answer": full_response.strip() if full_response else "No response generated.",
             "reasoning": reasoning_content.strip() if reasoning_content else None,
-            "model": model,
+            "model": request["model"],
+            "cache": cached.stats(),
         }
         
     except Exception as e:
@@ -292,6 +827,158 @@ Please provide insights on why these changes were made, focusing on:
             "ok": False,
             "msg": f"Generation failed: {error_msg}",
         }
+
+async def prepare_generate(payload: GenerateIn) -> tuple:
+    """
+    (request, cached, entry) for single-pass generation: prompt and cache lookup,
+    done before a response starts. All None in map-reduce mode, where the
+    request only exists once the partitions are done.
+    """
+    if use_map_reduce(payload):
+        return None, None, None
+    with span("prompt"):
+        request = build_generate_request(payload)
+    cached = generate_cache(payload, request)
+    return request, cached, await cached.lookup(payload.cache)
+
+async def generate_events(payload: GenerateIn, prepared: tuple):
+    """
+    /generate as events: "partition" (map-reduce, one per finished group),
+    "reasoning" and "token" as the model produces them, then "done" or "error".
+    """
+    request, cached, entry = prepared
+    try:
+        if request is None:
+            partials = []
+            async for p in map_partitions(payload):
+                partials.append(p)
+                yield {"type": "partition", "name": p["name"], "changes": p["changes"], "cached": p["cached"]}
+            request = build_reduce_request(payload, partials)
+            cached = CachedCall(request_key(kind="generate-reduce", base_url=GENERATE_BASE_URL, **request))
+            entry = await cached.lookup(payload.cache)
+        if entry is not None:
+            if entry["reasoning"]:
+                yield {"type": "reasoning", "text": entry["reasoning"]}
+            yield {"type": "token", "text": entry["answer"]}
+            yield {"type": "done", "model": request["model"], "cache": cached.stats()}
+            return
+        answer, reasoning = [], []
+        async for event in stream_completion(**generate_target(), **request):
+            (reasoning if event["type"] == "reasoning" else answer).append(event["text"])
+            yield event
+    except Exception as e:
+        print(f"⚠️  /generate/stream error: {e}")
+        yield {"type": "error", "msg": f"Generation failed: {e}"}
+        return
+    await cached.store("".join(answer).strip(), "".join(reasoning).strip() or None)
+    yield {"type": "done", "model": request["model"], "cache": cached.stats()}
+
+@nemotron.post("/generate/stream")
+async def generate_stream(payload: GenerateIn):
+    """
+    Server-Sent Events version of /generate: "reasoning" and "token" events are
+    forwarded as the model produces them, then "done" (or "error"). In map-reduce
+    mode a "partition" event is sent as each partition finishes, then the merged
+    answer streams.
+    """
+    prepared = await prepare_generate(payload)
+    return StreamingResponse((sse(event) async for event in generate_events(payload, prepared)),
+                             media_type="text/event-stream")
+
+class IngestJobIn(BaseModel):
+    # Same options as /ingest; "docs" ([{"id", "text"}]) instead of file uploads
+    folder: str = "data/docs"
+    docs: list[dict] | None = None
+    mode: IngestMode = "sync"
+    workers: int | None = None
+    collection: str = DEFAULT_COLLECTION
+
+class JobIn(BaseModel):
+    kind: str  # ingest | generate
+    params: dict = {}  # IngestJobIn / GenerateIn fields
+    priority: int = 0  # higher runs first
+
+async def ingest_job(job: Job) -> dict:
+    params = IngestJobIn(**job.params)
+    chunks = iter_chunks(params.docs) if params.docs else iter_chunks_parallel(params.folder, params.workers)
+
+    def progress(stats: dict):
+        # Called from the ingest thread after every batch; raises to stop a cancelled job
+        job.update(chunks=stats["chunks"], embedded=stats["embedded"])
+
+    stats = await job.run_blocking(INGEST_EXECUTOR, run_ingest, chunks, params.mode, params.collection, progress)
+    if stats is None:
+        raise ValueError("No text found to ingest.")
+    return {"collection": params.collection, **stats}
+
+async def generate_job(job: Job) -> dict:
+    payload = GenerateIn(**job.params)
+    answer, reasoning, partitions, done = [], [], [], {}
+    async for event in generate_events(payload, await prepare_generate(payload)):
+        if event["type"] == "token":
+            answer.append(event["text"])
+            job.update(tokens=len(answer))
+        elif event["type"] == "reasoning":
+            reasoning.append(event["text"])
+            job.update(reasoning_tokens=len(reasoning))
+        elif event["type"] == "partition":
+            partitions.append({k: v for k, v in event.items() if k != "type"})
+            job.update(partitions=len(partitions))
+        elif event["type"] == "error":
+            raise RuntimeError(event["msg"])
+        elif event["type"] == "done":
+            done = event
+    return {
+        "answer": "".join(answer).strip() or "No response generated.",
+        "reasoning": "".join(reasoning).strip() or None,
+        "model": done.get("model"),
+        "partitions": partitions or None,
+        "cache": done.get("cache"),
+    }
+
+JOB_PARAMS = {"ingest": IngestJobIn, "generate": GenerateIn}
+JOBS = JobQueue(JOBS_PATH, {
+    "ingest": (ingest_job, JOB_INGEST_CONCURRENCY),
+    "generate": (generate_job, JOB_GENERATE_CONCURRENCY),
+})
+
+@nemotron.post("/jobs")
+async def submit_job(payload: JobIn):
+    """
+    Queue an ingest or generate job and return right away; poll GET /jobs/{id}
+    for progress (chunks embedded / tokens generated) and the result.
+    """
+    if payload.kind not in JOB_PARAMS:
+        return {"ok": False, "msg": f"Unknown job kind: {payload.kind!r} (ingest or generate)"}
+    try:
+        params = JOB_PARAMS[payload.kind](**payload.params)
+        if payload.kind == "ingest":
+            COLLECTIONS.current_path(params.collection)  # validates the name
+    except (ValidationError, ValueError) as e:
+        return {"ok": False, "msg": f"Invalid params: {e}"}
+    return {"ok": True, **JOBS.submit(payload.kind, params.model_dump(), payload.priority)}
+
+@nemotron.get("/jobs")
+async def list_jobs(status: str | None = None, limit: int = 50):
+    return {"ok": True, "jobs": JOBS.list(status, limit)}
+
+@nemotron.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return {"ok": False, "msg": "Job not found."}
+    return {"ok": True, **job}
+
+@nemotron.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job (an ingest stops after its current batch)."""
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return {"ok": False, "msg": "Job not found."}
+    return {"ok": True, **job}
+
+STARTUP["import_seconds"] = round(time.perf_counter() - _IMPORT_START, 3)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(nemotron, host="0.0.0.0", port=8000)
\ No newline at end of file
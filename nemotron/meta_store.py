@@ -0,0 +1,219 @@
+import os, json, sqlite3, threading
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from text_codec import TextCodec
+
+# SQLite caps bound parameters per statement
+_BATCH = 500
+
+def _batches(items: List, n: int = _BATCH) -> Iterator[List]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+class MetaStore:
+    """
+    Chunk metadata in SQLite (WAL mode), keyed by FAISS id.
+
+    Rows are read on demand, so opening the store costs nothing however large
+    the corpus is, and mmap'd pages are shared between workers on the host.
+    The BM25 inverted index (postings + document lengths) lives alongside.
+
+    A chunk normally owns the FAISS vector with its fid. A near-duplicate
+    chunk instead has ref = the fid of the vector it shares; that vector stays
+    in the index while any chunk still refers to it. With a codec set, texts
+    are stored compressed (older plain-text rows are still read as they are).
+    """
+    def __init__(self, path: str, mmap_bytes: int = 256 * 2**20):
+        self.path = path
+        self._lock = threading.Lock()
+        self.codec: TextCodec | None = None
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                fid  INTEGER PRIMARY KEY,
+                id   TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                ref  INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS info (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                fid  INTEGER NOT NULL,
+                tf   INTEGER NOT NULL,
+                PRIMARY KEY (term, fid)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_fid ON postings (fid);
+            CREATE TABLE IF NOT EXISTS doclen (
+                fid INTEGER PRIMARY KEY,
+                len INTEGER NOT NULL
+            );
+        """)
+        if "ref" not in {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}:
+            # Stores from before near-duplicate sharing
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN ref INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_ref ON chunks (ref) WHERE ref IS NOT NULL")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get_info(self, key: str, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_info(self, key: str, value) -> None:
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def lookup(self, ids: List[str]) -> Dict[str, Tuple[int, str]]:
+        """chunk id -> (fid, hash) for the ids that exist."""
+        out = {}
+        with self._lock:
+            for batch in _batches(ids):
+                q = f"SELECT id, fid, hash FROM chunks WHERE id IN ({','.join('?' * len(batch))})"
+                for cid, fid, h in self.conn.execute(q, batch):
+                    out[cid] = (fid, h)
+        return out
+
+    def _text(self, value) -> str:
+        return self.codec.decode(value) if self.codec is not None else value
+
+    def fetch(self, vids: List[int]) -> Dict[int, Dict]:
+        """
+        Vector id (search hit) -> {"id", "text"} of the chunk it belongs to; for
+        a vector shared by near-duplicates, its own chunk or else the oldest one.
+        """
+        out: Dict[int, Tuple[int, Dict]] = {}
+        with self._lock:
+            for batch in _batches(vids, _BATCH // 2):
+                marks = ','.join('?' * len(batch))
+                q = f"SELECT fid, id, text, COALESCE(ref, fid) FROM chunks WHERE fid IN ({marks}) OR ref IN ({marks})"
+                for fid, cid, text, vid in self.conn.execute(q, batch + batch):
+                    rank = -1 if fid == vid else fid
+                    if vid not in out or rank < out[vid][0]:
+                        out[vid] = (rank, {"id": cid, "text": text})
+        return {vid: {"id": row["id"], "text": self._text(row["text"])} for vid, (_, row) in out.items()}
+
+    def vector_ids(self, fids: List[int]) -> Dict[int, int]:
+        """fid -> id of the vector that chunk is searched by (itself unless it is a near-duplicate)."""
+        out = {}
+        with self._lock:
+            for batch in _batches(fids):
+                q = f"SELECT fid, COALESCE(ref, fid) FROM chunks WHERE fid IN ({','.join('?' * len(batch))})"
+                out.update(self.conn.execute(q, batch))
+        return out
+
+    def vectors(self) -> List[int]:
+        """Ids of the vectors still referenced by some chunk, i.e. what the index should hold."""
+        with self._lock:
+            return [r[0] for r in self.conn.execute(
+                "SELECT fid FROM chunks WHERE ref IS NULL UNION SELECT ref FROM chunks WHERE ref IS NOT NULL ORDER BY 1")]
+
+    def shared(self) -> int:
+        """Chunks stored without a vector of their own (near-duplicates)."""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks WHERE ref IS NOT NULL").fetchone()[0]
+
+    def iter_ids(self) -> Iterator[Tuple[str, int]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT id, fid FROM chunks").fetchall()
+        return iter(rows)
+
+    def fids(self) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT fid FROM chunks ORDER BY fid")]
+
+    def put(self, rows: Iterable[Tuple]) -> None:
+        """rows: (fid, id, text, hash[, ref]); replaces any row with the same chunk id."""
+        encode = self.codec.encode if self.codec is not None else (lambda text: text)
+        rows = ((fid, cid, encode(text), h, *(rest or (None,))) for fid, cid, text, h, *rest in rows)
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO chunks (fid, id, text, hash, ref) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def iter_texts(self, n: int = _BATCH) -> Iterator[List[Tuple[int, str]]]:
+        """(fid, text) rows in batches of n, in fid order."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute("SELECT fid, text FROM chunks WHERE fid > ? ORDER BY fid LIMIT ?", (last, n)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [(fid, self._text(text)) for fid, text in rows]
+
+    def put_terms(self, rows: Iterable[Tuple[int, Dict[str, int], int]]) -> None:
+        """rows: (fid, {term: tf}, document length)."""
+        with self._lock:
+            for fid, tfs, length in rows:
+                self.conn.execute("DELETE FROM postings WHERE fid = ?", (fid,))
+                self.conn.executemany("INSERT INTO postings (term, fid, tf) VALUES (?, ?, ?)",
+                                      ((term, fid, tf) for term, tf in tfs.items()))
+                self.conn.execute("INSERT OR REPLACE INTO doclen (fid, len) VALUES (?, ?)", (fid, length))
+
+    def postings(self, terms: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """term -> [(fid, tf)] for the terms that occur anywhere."""
+        out: Dict[str, List[Tuple[int, int]]] = {}
+        with self._lock:
+            for batch in _batches(terms):
+                q = f"SELECT term, fid, tf FROM postings WHERE term IN ({','.join('?' * len(batch))})"
+                for term, fid, tf in self.conn.execute(q, batch):
+                    out.setdefault(term, []).append((fid, tf))
+        return out
+
+    def doc_lengths(self, fids: List[int]) -> Dict[int, int]:
+        out = {}
+        with self._lock:
+            for batch in _batches(fids):
+                q = f"SELECT fid, len FROM doclen WHERE fid IN ({','.join('?' * len(batch))})"
+                out.update(self.conn.execute(q, batch))
+        return out
+
+    def lexical_totals(self) -> Tuple[int, float]:
+        """(documents indexed, average document length)."""
+        with self._lock:
+            n, avg = self.conn.execute("SELECT COUNT(*), AVG(len) FROM doclen").fetchone()
+        return n, avg or 0.0
+
+    def clear_terms(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM doclen")
+
+    def delete(self, fids: List[int]) -> List[int]:
+        """Remove chunks; returns the vector ids no chunk refers to any more (to drop from the index)."""
+        released: Set[int] = set()
+        with self._lock:
+            for batch in _batches(fids):
+                marks = ','.join('?' * len(batch))
+                released.update(r[0] for r in self.conn.execute(
+                    f"SELECT COALESCE(ref, fid) FROM chunks WHERE fid IN ({marks})", batch))
+                self.conn.execute(f"DELETE FROM chunks WHERE fid IN ({marks})", batch)
+                self.conn.execute(f"DELETE FROM postings WHERE fid IN ({marks})", batch)
+                self.conn.execute(f"DELETE FROM doclen WHERE fid IN ({marks})", batch)
+            for batch in _batches(sorted(released), _BATCH // 2):
+                marks = ','.join('?' * len(batch))
+                released.difference_update(r[0] for r in self.conn.execute(
+                    f"SELECT COALESCE(ref, fid) FROM chunks WHERE fid IN ({marks}) OR ref IN ({marks})", batch + batch))
+        return sorted(released)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM doclen")
+
+    def commit(self) -> None:
+        with self._lock:
+            self.conn.commit()
@@ -0,0 +1,184 @@
+"""
+Prometheus-style counters/histograms and per-request timing spans.
+
+Spans recorded while handling a request are returned in its Server-Timing
+header; with OTEL_ENABLED=1 and opentelemetry installed they are also emitted
+as OpenTelemetry spans on the global tracer provider.
+"""
+import os, time, threading, contextvars
+from contextlib import contextmanager, ExitStack
+from typing import Callable, Dict, List, Tuple
+
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "0") != "0"
+
+INF = 'le="+Inf"'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self.values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., sum, count]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self.values.items()):
+                for le, n in zip(self.buckets, row):
+                    bucket = 'le="%s"' % le
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, bucket)} {n}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, INF)} {row[-1]}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {row[-2]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Dict[str, float]]):
+        """fn returns {suffix: value}; rendered as gauges name_<suffix> when scraped."""
+        self.gauges[name] = (help, fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        for name, (help, fn) in self.gauges.items():
+            try:
+                values = fn() or {}
+            except Exception:
+                continue
+            for suffix, v in values.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    lines += [f"# HELP {name}_{suffix} {help}", f"# TYPE {name}_{suffix} gauge", f"{name}_{suffix} {v}"]
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+EMBED_SECONDS = REGISTRY.histogram("nemotron_embed_seconds", "Embedding model calls (cache misses only)", ("backend",))
+EMBED_TEXTS = REGISTRY.counter("nemotron_embed_texts_total", "Texts embedded per backend", ("backend",))
+SEARCH_SECONDS = REGISTRY.histogram("nemotron_search_seconds", "VectorStore.search_batch stages", ("stage",))
+GENERATION_SECONDS = REGISTRY.histogram("nemotron_generation_seconds", "LLM completions", ("phase",))
+CHUNK_SECONDS = REGISTRY.histogram("nemotron_chunk_seconds", "Reading and chunking one document")
+INDEX_IO_SECONDS = REGISTRY.histogram("nemotron_index_io_seconds", "FAISS index save/load", ("op",))
+HTTP_SECONDS = REGISTRY.histogram("nemotron_http_request_seconds", "HTTP requests", ("method", "route", "status"))
+
+# Spans of the request being handled (set by the HTTP middleware)
+_spans: contextvars.ContextVar = contextvars.ContextVar("nemotron_spans", default=None)
+
+def start_spans() -> List[Tuple[str, float]]:
+    spans: List[Tuple[str, float]] = []
+    _spans.set(spans)
+    return spans
+
+def record_span(name: str, seconds: float):
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    total: Dict[str, float] = {}
+    for name, seconds in spans:
+        total[name] = total.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in total.items())
+
+def _tracer():
+    if not hasattr(_tracer, "_t"):
+        _tracer._t = None
+        if OTEL_ENABLED:
+            try:
+                from opentelemetry import trace
+                _tracer._t = trace.get_tracer("nemotron")
+            except ImportError:
+                print("⚠️  OTEL_ENABLED=1 but opentelemetry is not installed")
+    return _tracer._t
+
+def init_otel():
+    """
+    Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set and the SDK is
+    installed. Otherwise spans go to whatever provider the host configured
+    (e.g. an in-memory exporter in tests).
+    """
+    if not (OTEL_ENABLED and os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")):
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("⚠️  OTLP export needs opentelemetry-sdk and opentelemetry-exporter-otlp")
+        return
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times a stage for Server-Timing (and OpenTelemetry) without a histogram."""
+    with ExitStack() as stack:
+        tracer = _tracer()
+        if tracer is not None:
+            stack.enter_context(tracer.start_as_current_span(name, attributes=attributes))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record_span(name, time.perf_counter() - start)
+
+@contextmanager
+def timed(histogram: Histogram, name: str, **labels):
+    """span() that also observes the duration in histogram."""
+    start = time.perf_counter()
+    try:
+        with span(name, **labels):
+            yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
@@ -0,0 +1,102 @@
+import os, re, json, hashlib, threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List
+
+# Concrete "items[3]" paths are kept for the first N items of each array; "items[]" covers all of them
+PATH_INDEX_MAX_ITEMS = int(os.getenv("PATH_INDEX_MAX_ITEMS", "10"))
+# Flattened documents kept, keyed by content hash
+PATH_INDEX_CACHE = int(os.getenv("PATH_INDEX_CACHE", "32"))
+
+_PATH_TOKEN_RE = re.compile(r"\[\d*\]|[^.\[\]]+")
+_CONCRETE_INDEX_RE = re.compile(r"\[(\d+)\]")
+
+def lookup_path(obj: Any, path: str) -> Any:
+    """
+    Walk obj along a diff path: "user.name", "items[0].price", or "items[].price"
+    (the first item that has a non-null value there). None if nothing is found.
+    """
+    def walk(cur: Any, tokens: List[str]) -> Any:
+        for i, tok in enumerate(tokens):
+            if cur is None:
+                return None
+            if tok.startswith("["):
+                if not isinstance(cur, list):
+                    return None
+                if tok == "[]":
+                    for item in cur:
+                        v = walk(item, tokens[i + 1:])
+                        if v is not None:
+                            return v
+                    return None
+                idx = int(tok[1:-1])
+                cur = cur[idx] if idx < len(cur) else None
+            elif isinstance(cur, dict):
+                cur = cur.get(tok)
+            else:
+                return None
+        return cur
+    return walk(obj, _PATH_TOKEN_RE.findall(path))
+
+class PathIndex:
+    """
+    One-pass flattening of a JSON document into path -> value.
+
+    Holds concrete paths ("items[0].price", first PATH_INDEX_MAX_ITEMS items of
+    each array) and wildcard paths ("items[].price") whose value is the first
+    non-null sample across all items. Values are references into the document,
+    not copies.
+    """
+    def __init__(self, doc: Any, max_items: int = PATH_INDEX_MAX_ITEMS):
+        self.doc = doc
+        self.max_items = max_items
+        self.paths: Dict[str, Any] = {}
+        # Breadth-first so the first sample of a wildcard path comes from the earliest item
+        queue = deque([("", "", doc)])  # (concrete path or None, wildcard path, value)
+        while queue:
+            concrete, wild, value = queue.popleft()
+            if concrete:
+                self.paths[concrete] = value
+            if wild and wild != concrete and self.paths.get(wild) is None:
+                self.paths[wild] = value
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    c = None if concrete is None else (f"{concrete}.{k}" if concrete else k)
+                    queue.append((c, f"{wild}.{k}" if wild else k, v))
+            elif isinstance(value, list):
+                for i, v in enumerate(value):
+                    queue.append((f"{concrete}[{i}]" if concrete is not None and i < max_items else None,
+                                  f"{wild}[]", v))
+
+    def get(self, path: str) -> Any:
+        if path in self.paths:
+            return self.paths[path]
+        # Only indices past the concrete cap can be missing from the map
+        if any(int(n) >= self.max_items for n in _CONCRETE_INDEX_RE.findall(path)):
+            return lookup_path(self.doc, path)
+        return None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+def doc_hash(doc: Any) -> str:
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+_cache: "OrderedDict[str, PathIndex]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_path_index(doc: Any) -> PathIndex:
+    """
+    PathIndex for doc, reused across requests that send the same document
+    (same content hash), so repeated /generate calls on a v1/v2 pair skip the traversal.
+    """
+    key = doc_hash(doc)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    index = PathIndex(doc)
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > PATH_INDEX_CACHE:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,136 @@
+"""
+Orders a schema diff by severity and packs it into a prompt token budget.
+
+Weights are the ones lib/score.ts uses for the risk score, so the changes the
+UI counts as most dangerous are the ones the model always sees.
+"""
+import os
+from typing import Callable, Dict, List, Tuple
+
+from hf import count_tokens
+
+# Token budget for the change list + values section of the /generate prompt
+GENERATE_CONTEXT_TOKENS = int(os.getenv("GENERATE_CONTEXT_TOKENS", "1000"))
+# This many same-kind changes under one parent path are summarized as one line
+COLLAPSE_SIBLINGS = int(os.getenv("COLLAPSE_SIBLINGS", "4"))
+
+SCORING_WEIGHTS = {
+    "REMOVED_FIELD": 40,
+    "TYPE_CHANGED_STRUCTURAL": 35,
+    "TYPE_CHANGED_INCOMPATIBLE": 25,
+    "TYPE_CHANGED_COMPATIBLE": 15,
+    "ADDED_FIELD": 5,
+}
+
+def _types(t: str) -> List[str]:
+    # Python diff merges array element types as "number|string"
+    return (t or "unknown").split("|")
+
+def types_compatible(old_type: str, new_type: str) -> bool:
+    """areTypesCompatible from lib/score.ts: null <-> anything, string <-> number."""
+    if old_type == "null" or new_type == "null":
+        return True
+    if {old_type, new_type} == {"string", "number"}:
+        return True
+    return old_type == new_type
+
+def severity(change: Dict) -> Tuple[str, int]:
+    """(scoring category, weight) of one change."""
+    kind = change.get("kind")
+    if kind == "TYPE_CHANGED":
+        old, new = _types(change.get("oldType")), _types(change.get("newType"))
+        if any(t in ("object", "array") for t in old + new):
+            category = "TYPE_CHANGED_STRUCTURAL"
+        elif all(types_compatible(o, n) for o in old for n in new):
+            category = "TYPE_CHANGED_COMPATIBLE"
+        else:
+            category = "TYPE_CHANGED_INCOMPATIBLE"
+    elif kind in SCORING_WEIGHTS:
+        category = kind
+    else:
+        return "UNKNOWN", 0
+    return category, SCORING_WEIGHTS[category]
+
+def parent_path(path: str) -> str:
+    return path.rsplit(".", 1)[0] if "." in path else ""
+
+def describe(change: Dict) -> str:
+    """One prompt line for a change (the /generate wording)."""
+    path = change.get("path", "unknown")
+    kind = change.get("kind", "UNKNOWN")
+    if kind == "REMOVED_FIELD":
+        return f"REMOVED: Field '{path}' (was {change.get('oldType', 'unknown')})"
+    if kind == "ADDED_FIELD":
+        return f"ADDED: Field '{path}' (now {change.get('newType', 'unknown')})"
+    if kind == "TYPE_CHANGED":
+        return (f"TYPE CHANGED: Field '{path}' changed from "
+                f"{change.get('oldType', 'unknown')} to {change.get('newType', 'unknown')}")
+    return f"{kind}: Field '{path}'"
+
+def _describe_group(kind: str, parent: str, changes: List[Dict]) -> str:
+    where = f"under '{parent}'" if parent else "at the top level"
+    names = []
+    for c in changes[:6]:
+        leaf = c.get("path", "")[len(parent) + 1 if parent else 0:]
+        if kind == "TYPE_CHANGED":
+            leaf += f" ({c.get('oldType', 'unknown')} -> {c.get('newType', 'unknown')})"
+        names.append(leaf)
+    more = f", +{len(changes) - 6} more" if len(changes) > 6 else ""
+    label = {"REMOVED_FIELD": "REMOVED", "ADDED_FIELD": "ADDED", "TYPE_CHANGED": "TYPE CHANGED"}.get(kind, kind)
+    return f"{label}: {len(changes)} fields {where}: {', '.join(names)}{more}"
+
+def prioritize_changes(changes: List[Dict], collapse: int = COLLAPSE_SIBLINGS) -> List[Dict]:
+    """
+    Prompt items, most important first. Each item is
+    {"line", "weight", "changes"}: a single change, or `collapse`+ same-kind
+    siblings under one parent path summarized in one line. A group ranks by its
+    most severe member, so many minor changes never outrank one breaking change;
+    equal weights put bigger groups first.
+    """
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for c in changes:
+        groups.setdefault((parent_path(c.get("path", "")), c.get("kind", "UNKNOWN")), []).append(c)
+
+    items = []
+    for (parent, kind), members in groups.items():
+        scored = sorted(((severity(c)[1], c) for c in members), key=lambda x: -x[0])
+        if collapse and len(members) >= collapse:
+            items.append({"line": _describe_group(kind, parent, [c for _, c in scored]),
+                          "weight": scored[0][0], "changes": [c for _, c in scored]})
+        else:
+            items.extend({"line": describe(c), "weight": w, "changes": [c]} for w, c in scored)
+    # Stable: equal weights and sizes keep diff order
+    items.sort(key=lambda item: (-item["weight"], -len(item["changes"])))
+    return items
+
+def pack(items: List[Dict], render: Callable[[Dict], List[str]], budget: int = GENERATE_CONTEXT_TOKENS,
+         batch: int = 32) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Greedily keep items (in priority order) while their rendered lines fit in
+    `budget` tokens. Items that do not fit are skipped, so a smaller one further
+    down can still use the space. Returns (kept, dropped).
+    """
+    kept, dropped, used = [], [], 0
+    for start in range(0, len(items), batch):
+        chunk = items[start:start + batch]
+        if used >= budget:
+            dropped.extend(chunk)
+            continue
+        costs = count_tokens(["\n".join(render(item)) for item in chunk])
+        for item, cost in zip(chunk, costs):
+            if used + cost <= budget:
+                kept.append(item)
+                used += cost
+            else:
+                dropped.append(item)
+    return kept, dropped
+
+def omitted_note(dropped: List[Dict]) -> str:
+    changes = [c for item in dropped for c in item["changes"]]
+    if not changes:
+        return ""
+    counts: Dict[str, int] = {}
+    for c in changes:
+        counts[c.get("kind", "UNKNOWN")] = counts.get(c.get("kind", "UNKNOWN"), 0) + 1
+    parts = [f"{n} {kind.lower().replace('_', ' ')}" for kind, n in sorted(counts.items(), key=lambda x: -x[1])]
+    return f"(+{len(changes)} lower-priority changes not shown: {', '.join(parts)})"
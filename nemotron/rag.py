@@ -1,64 +1,599 @@
-import os, json
-from typing import List, Tuple, Dict
+import os, json, time, hashlib, threading
+from typing import Callable, Dict, Iterable, List, Tuple
 import numpy as np
 import faiss
 
-from hf import hf_feature_extraction
+from hf import embed_texts
+from meta_store import MetaStore
+from text_codec import TextCodec
+from lexical import term_counts, tokenize, bm25, rrf
+from metrics import SEARCH_SECONDS, INDEX_IO_SECONDS, timed
 
 DATA_DIR = os.path.join(os.getcwd(), "data")
 INDEX_PATH = os.path.join(DATA_DIR, "index.faiss")
-META_PATH  = os.path.join(DATA_DIR, "meta.json")
+META_PATH  = os.path.join(DATA_DIR, "meta.sqlite")
+# Pre-SQLite layout, migrated on first load
+LEGACY_META_PATH = os.path.join(DATA_DIR, "meta.json")
+LEGACY_LOG_PATH  = os.path.join(DATA_DIR, "meta.log")
+
+# Index type: flat | sq8 | ivf | ivfsq8 | ivfpq | hnsw (see make_index)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_PARAMS = {
+    "nlist": int(os.getenv("INDEX_NLIST", "0")),          # 0 = ~4*sqrt(n)
+    "pq_m": int(os.getenv("INDEX_PQ_M", "0")),            # 0 = pick a divisor of dim
+    "hnsw_m": int(os.getenv("INDEX_HNSW_M", "32")),
+    "nprobe": int(os.getenv("INDEX_NPROBE", "16")),
+    "ef_search": int(os.getenv("INDEX_EF_SEARCH", "64")),
+    "train_sample": int(os.getenv("INDEX_TRAIN_SAMPLE", "100000")),
+    "min_vectors": int(os.getenv("INDEX_MIN_VECTORS", "1000")),  # below this, flat is fastest anyway
+}
+
+# Compact storage for long-lived, repetitive corpora (see storage_report.py):
+# a new chunk whose vector is at least this similar (cosine) to a stored one
+# shares that vector instead of adding its own (0 = off) ...
+NEAR_DUP_SIM = float(os.getenv("NEAR_DUP_SIM", "0"))
+# ... and chunk texts are compressed with a dictionary trained on the first batch: none | auto | zstd | zlib
+TEXT_COMPRESSION = os.getenv("TEXT_COMPRESSION", "none")
+# SQ8 ranges are trained on the first vectors: widen them so later ones are not clipped
+SQ_RANGE_MARGIN = 0.1
+
+# Characters of each context put in the prompt (format_prompt)
+CONTEXT_CHARS = int(os.getenv("CONTEXT_CHARS", "400"))
+
+# Chunks embedded per model call during ingest (bounds peak memory)
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "256"))
+
+# Hybrid retrieval: BM25 over path-aware terms fused with the dense hits (RRF)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") != "0"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "4"))  # each retriever returns k * this
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Bump when tokenize() changes so stores re-index their terms on load
+LEXICAL_VERSION = 1
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def make_index(index_type: str, dim: int, X: np.ndarray, params: Dict) -> Tuple[faiss.Index, Dict]:
+    """
+    Build an empty inner-product index keyed by fid, trained on a sample of X if needed.
+    Returns the index and the spec actually used (recorded in meta.json).
+    Falls back to flat when X is too small to train the requested type.
+    """
+    n = X.shape[0]
+    if index_type != "flat" and n < params["min_vectors"]:
+        index_type = "flat"
+    if index_type in ("ivf", "ivfsq8", "ivfpq"):
+        # ~4*sqrt(n) lists, but keep >= 39 training points per centroid
+        nlist = params["nlist"] or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        spec = {"type": index_type, "nlist": nlist, "nprobe": params["nprobe"]}
+        min_train = nlist
+        if index_type == "ivfpq":
+            # default: 8 dims per sub-quantizer
+            m = params["pq_m"] or next(m for m in range(max(1, dim // 8), 0, -1) if dim % m == 0)
+            spec["pq_m"] = m
+            factory = f"IVF{nlist},PQ{m}"
+            min_train = max(nlist, 256)  # 8-bit codebooks need 256 points
+        elif index_type == "ivfsq8":
+            factory = f"IVF{nlist},SQ8"
+        else:
+            factory = f"IVF{nlist},Flat"
+        if n < min_train:
+            print(f"⚠️  {n} vectors is too few to train {factory}, using flat index")
+            return make_index("flat", dim, X, params)
+    elif index_type == "hnsw":
+        spec = {"type": "hnsw", "hnsw_m": params["hnsw_m"], "ef_search": params["ef_search"]}
+        factory = f"HNSW{params['hnsw_m']},Flat"
+    elif index_type == "sq8":
+        # Exhaustive like flat, one byte per dimension instead of four
+        spec = {"type": "sq8"}
+        factory = "SQ8"
+    elif index_type == "flat":
+        spec = {"type": "flat"}
+        factory = "Flat"
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    base = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+    if index_type in ("sq8", "ivfsq8"):
+        faiss.downcast_index(base).sq.rangestat_arg = SQ_RANGE_MARGIN
+    if not base.is_trained:
+        sample = X
+        if n > params["train_sample"]:
+            rng = np.random.default_rng(0)
+            sample = X[rng.choice(n, params["train_sample"], replace=False)]
+        base.train(np.ascontiguousarray(sample))
+    ivf = faiss.try_extract_index_ivf(base)
+    if ivf is not None:
+        # IVF keeps the ids itself: under an IndexIDMap2 its labels go stale once vectors are removed
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)  # reconstruct / remove by id
+        index = base
+    else:
+        index = faiss.IndexIDMap2(base)
+    set_search_params(index, spec)
+    return index, spec
+
+def set_search_params(index: faiss.Index, spec: Dict) -> None:
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if spec.get("type", "").startswith("ivf"):
+        faiss.extract_index_ivf(base).nprobe = spec["nprobe"]
+    elif spec.get("type") == "hnsw":
+        base.hnsw.efSearch = spec["ef_search"]
 
 class VectorStore:
-    def __init__(self):
+    """
+    FAISS store keyed by chunk id.
+
+    Vectors live in an id-mapped index so single chunks can be added, replaced
+    or removed without a rebuild. Chunk metadata lives in SQLite (meta.sqlite)
+    and only the rows a search hits are read back. A BM25 inverted index over
+    the same chunks is kept in the store for hybrid search.
+    """
+    def __init__(self, index_type: str | None = None, index_params: Dict | None = None,
+                 hybrid: bool | None = None, path: str | None = None,
+                 near_dup: float | None = None, text_compression: str | None = None):
+        # Directory holding index.faiss + meta.sqlite (default: data/, the single-collection layout)
+        self.path = path or DATA_DIR
+        self.index_path = os.path.join(self.path, os.path.basename(INDEX_PATH))
+        self.meta_path = os.path.join(self.path, os.path.basename(META_PATH))
+        self.hybrid = HYBRID_SEARCH if hybrid is None else hybrid
+        self.near_dup = NEAR_DUP_SIM if near_dup is None else near_dup
+        self.text_compression = text_compression or TEXT_COMPRESSION
+        # Requested type; a loaded store keeps the one it was built with unless index_type is passed
+        self.index_type = index_type or INDEX_TYPE
+        self._index_type_given = index_type is not None
+        self.index_params = {**INDEX_PARAMS, **(index_params or {})}
+        self.index_spec: Dict = {"type": "flat"}
         self.index = None
-        self.meta: List[Dict] = []
+        self.store: MetaStore | None = None
         self.dim = None
+        self.next_id = 0
+        self._mmapped = False
+        self._buf: np.ndarray | None = None
+        # Some chunks share a vector: lexical hits must be mapped to vector ids before fusion
+        self._shared = False
+        # Guards index/store mutation; embedding happens outside it so /chat stays responsive during ingest
+        self.lock = threading.RLock()
 
     def _ensure_dir(self):
-        os.makedirs(DATA_DIR, exist_ok=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _open_store(self) -> MetaStore:
+        if self.store is None:
+            self._ensure_dir()
+            self.store = MetaStore(self.meta_path)
+            codec = self.store.get_info("text_codec")
+            if codec:
+                # Once a store compresses its texts it keeps doing so, whatever TEXT_COMPRESSION says now
+                self.store.codec = TextCodec.from_info(codec)
+        return self.store
+
+    def _ensure_codec(self, texts: List[str]):
+        store = self._open_store()
+        if store.codec is None and self.text_compression != "none":
+            store.codec = TextCodec.train(texts, self.text_compression)
+            store.set_info("text_codec", store.codec.describe())
+
+    def _ensure_loaded(self):
+        # Mutations on a fresh instance must start from what is on disk, not an empty index
+        with self.lock:
+            if self.index is None:
+                try:
+                    self.load()
+                except FileNotFoundError:
+                    pass
+
+    def _writable(self):
+        # Mutating a memory-mapped index aborts inside FAISS: take a private copy first
+        if self._mmapped:
+            self.index = faiss.read_index(self.index_path)
+            set_search_params(self.index, self.index_spec)
+            self._mmapped = False
 
-    def build(self, chunks: List[Dict[str, str]]) -> None:
+    def _new_index(self, X: np.ndarray):
+        self.index, self.index_spec = make_index(self.index_type, X.shape[1], X, self.index_params)
+        self._mmapped = False
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        if nprobe is not None:
+            self.index_spec["nprobe"] = nprobe
+        if ef_search is not None:
+            self.index_spec["ef_search"] = ef_search
+        if self.index is not None:
+            set_search_params(self.index, self.index_spec)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
         """
-        chunks: [{"id": "doc_id#0", "text": "..."}]
+        Embed one batch into a reused (EMBED_BATCH, dim) float32 buffer.
+        The returned view is only valid until the next call.
         """
-        self._ensure_dir()
-        texts = [c["text"] for c in chunks]
-        vecs = hf_feature_extraction(texts)
-        X = np.array(vecs).astype("float32")
-        self.dim = X.shape[1]
-        self.index = faiss.IndexFlatIP(self.dim)
+        if self._buf is not None and self._buf.shape[0] >= len(texts):
+            X = embed_texts(texts, out=self._buf[:len(texts)])
+        else:
+            X = embed_texts(texts)
+            self._buf = np.empty((max(EMBED_BATCH, len(texts)), X.shape[1]), dtype="float32")
         # Normalize for cosine
         faiss.normalize_L2(X)
-        self.index.add(X)
-        self.meta = chunks
-        self.save()
+        return X
+
+    def _vectors(self, fids: np.ndarray) -> np.ndarray:
+        if not len(fids):
+            return np.zeros((0, self.dim), dtype="float32")
+        fids = np.ascontiguousarray(fids, dtype="int64")
+        if isinstance(self.index, faiss.IndexIDMap):
+            # By row position in the wrapped index: needs no direct map, so this also
+            # reads IVF stores written while IVF was still wrapped in an IndexIDMap2
+            ids = faiss.vector_to_array(self.index.id_map)
+            order = np.argsort(ids)
+            return self.index.index.reconstruct_n(0, self.index.ntotal)[order[np.searchsorted(ids, fids, sorter=order)]]
+        # IVF: by id through its direct map
+        return self.index.reconstruct_batch(fids)
+
+    def build(self, chunks: Iterable[Dict[str, str]],
+              progress: Callable[[Dict[str, int]], None] | None = None) -> Dict[str, int]:
+        """
+        Full rebuild from scratch.
+        chunks: [{"id": "doc_id#0", "text": "..."}] (any iterable, consumed in batches)
+        """
+        # A rebuild is not incremental: readers wait for it
+        with self.lock:
+            store = self._open_store()
+            store.clear()
+            store.codec = None
+            store.set_info("text_codec", None)
+            self.index = None
+            self.index_spec = {"type": "flat"}
+            self.dim = None
+            self.next_id = 0
+            self._mmapped = False
+            self._shared = False
+            stats = self._ingest(chunks, prune=False, progress=progress)
+            if not stats["embedded"]:
+                self.save()  # nothing to index: the old index on disk must still go
+            store.commit()
+            return stats
+
+    def add(self, chunks: List[Dict[str, str]], persist: bool = True) -> int:
+        """
+        Append chunks whose id is not in the store yet. Returns how many were embedded.
+        """
+        self._ensure_loaded()
+        known = self._open_store().lookup([c["id"] for c in chunks])
+        return self.upsert([c for c in chunks if c["id"] not in known], persist=persist)
+
+    def upsert(self, chunks: List[Dict[str, str]], persist: bool = True) -> int:
+        """
+        Insert new chunks and replace chunks whose text changed.
+        Unchanged chunks (same id, same content hash) are skipped without embedding.
+        Returns how many chunks were embedded.
+        """
+        self._ensure_loaded()
+        embedded = self._upsert(chunks)
+        if persist and embedded:
+            self.save()
+        return embedded
+
+    def _upsert(self, chunks: List[Dict[str, str]], seen: set | None = None) -> int:
+        """
+        Embed and index the new/changed chunks, EMBED_BATCH at a time.
+        `seen` collects ids across calls so duplicates in a stream are skipped.
+        """
+        embedded = 0
+        seen = set() if seen is None else seen
+        for start in range(0, len(chunks), EMBED_BATCH):
+            embedded += self._upsert_batch(chunks[start:start + EMBED_BATCH], seen)
+        return embedded
+
+    def _upsert_batch(self, chunks: List[Dict[str, str]], seen: set) -> int:
+        store = self._open_store()
+        known = store.lookup([c["id"] for c in chunks])
+        todo = []
+        for c in chunks:
+            if c["id"] in seen:
+                continue
+            seen.add(c["id"])
+            h = content_hash(c["text"])
+            if c["id"] in known and known[c["id"]][1] == h:
+                continue
+            todo.append((c, h))
+        if not todo:
+            return 0
+
+        X = self._embed([c["text"] for c, _ in todo])
+        with self.lock:
+            if self.index is None:
+                self.dim = X.shape[1]
+                self._new_index(X)
+            self._writable()
+            self._remove_fids([known[c["id"]][0] for c, _ in todo if c["id"] in known])
+            fids = np.arange(self.next_id, self.next_id + len(todo), dtype="int64")
+            self.next_id += len(todo)
+            refs = self._near_duplicates(X, fids) if self.near_dup > 0 else [None] * len(todo)
+            own = np.array([ref is None for ref in refs])
+            self.index.add_with_ids(np.ascontiguousarray(X[own]), fids[own])
+            self._ensure_codec([c["text"] for c, _ in todo])
+            store.put((fid, c["id"], c["text"], h, ref) for (c, h), fid, ref in zip(todo, fids.tolist(), refs))
+            self._shared = self._shared or not own.all()
+            store.put_terms((fid, *term_counts(c["text"])) for (c, _), fid in zip(todo, fids.tolist()))
+            self._maybe_upgrade()
+        return len(todo)
+
+    def _near_duplicates(self, X: np.ndarray, fids: np.ndarray) -> List[int | None]:
+        """
+        For each new vector, the id of a stored (or earlier in this batch) vector
+        it is a near-duplicate of, None if it needs its own.
+        """
+        refs: List[int | None] = [None] * len(X)
+        if self.index.ntotal:
+            D, I = self.index.search(X, 1)
+            for j in np.flatnonzero((D[:, 0] >= self.near_dup) & (I[:, 0] != -1)):
+                refs[j] = int(I[j, 0])
+        # Within the batch: the first of a group keeps its vector, the rest point at it
+        S = X @ X.T
+        for j in range(len(X)):
+            if refs[j] is None:
+                prior = np.flatnonzero(S[j, :j] >= self.near_dup)
+                prior = [i for i in prior if refs[i] is None]
+                if prior:
+                    refs[j] = int(fids[prior[0]])
+        return refs
+
+    def ingest_stream(self, chunks: Iterable[Dict[str, str]], prune: bool = True,
+                      progress: Callable[[Dict[str, int]], None] | None = None) -> Dict[str, int]:
+        """
+        Ingest from an iterator of chunks without materializing it: chunks are
+        pulled, embedded and indexed EMBED_BATCH at a time, so peak memory is
+        bounded by the batch size rather than the corpus.
+        prune=True deletes stored chunks that the stream did not yield (like sync).
+        """
+        self._ensure_loaded()
+        return self._ingest(chunks, prune, progress)
+
+    def _ingest(self, chunks: Iterable[Dict[str, str]], prune: bool,
+                progress: Callable[[Dict[str, int]], None] | None) -> Dict[str, int]:
+        seen: set = set()
+        stats = {"chunks": 0, "embedded": 0, "removed": 0}
+        batch: List[Dict[str, str]] = []
+        for c in chunks:
+            batch.append(c)
+            if len(batch) == EMBED_BATCH:
+                stats["chunks"] += len(batch)
+                stats["embedded"] += self._upsert_batch(batch, seen)
+                batch = []
+                if progress:
+                    progress(stats)
+        if batch:
+            stats["chunks"] += len(batch)
+            stats["embedded"] += self._upsert_batch(batch, seen)
+            if progress:
+                progress(stats)
+
+        with self.lock:
+            if prune:
+                stale = [fid for cid, fid in self._open_store().iter_ids() if cid not in seen]
+                if stale:
+                    self._writable()
+                    self._remove_fids(stale)
+                stats["removed"] = len(stale)
+            if stats["embedded"] or stats["removed"]:
+                self.save()
+        stats["unchanged"] = len(seen) - stats["embedded"]
+        return stats
+
+    def _maybe_upgrade(self):
+        # An ANN index asked for on a tiny first ingest starts out flat; switch once there is enough to train on
+        if (self.index_spec["type"] == "flat" and self.index_type != "flat"
+                and self.index.ntotal >= self.index_params["min_vectors"]):
+            X = self.index.index.reconstruct_n(0, self.index.ntotal)
+            index, spec = make_index(self.index_type, self.dim, X, self.index_params)
+            if spec["type"] != "flat":
+                index.add_with_ids(X, faiss.vector_to_array(self.index.id_map).astype("int64"))
+                self.index, self.index_spec = index, spec
+
+    def retrain(self, index_type: str | None = None):
+        """
+        Re-train and rebuild the index from the stored vectors, e.g. after the corpus grew a lot.
+        Vectors are reconstructed from the current index, so this is lossy for ivfpq.
+        IVF stores still wrapped in an IndexIDMap2 come out with IVF keeping the ids.
+        index_type switches the store to another type (default: the one it was built with).
+        """
+        with self.lock:
+            if index_type:
+                self.index_type = index_type
+            self._writable()
+            fids = np.array(self._open_store().vectors(), dtype="int64")
+            X = self._vectors(fids)
+            self.index, self.index_spec = make_index(self.index_type, self.dim, X, self.index_params)
+            self.index.add_with_ids(X, fids)
+            self.save()
+
+    def delete(self, ids: List[str], persist: bool = True) -> int:
+        """
+        Remove chunks by id. Returns how many were removed.
+        """
+        self._ensure_loaded()
+        store = self._open_store()
+        fids = [fid for fid, _ in store.lookup(ids).values()]
+        with self.lock:
+            if fids:
+                self._writable()
+                self._remove_fids(fids)
+                if persist:
+                    self.save()
+        return len(fids)
+
+    def sync(self, chunks: Iterable[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Make the store hold exactly `chunks`: upsert them and delete everything else.
+        """
+        stats = self.ingest_stream(chunks, prune=True)
+        stats.pop("chunks")
+        return stats
+
+    def _remove_fids(self, fids: List[int]) -> None:
+        if not fids:
+            return
+        # Vectors shared with a surviving near-duplicate stay
+        released = self.store.delete(fids)
+        if not released:
+            return
+        try:
+            self.index.remove_ids(np.array(released, dtype="int64"))
+        except RuntimeError:
+            # HNSW cannot remove in place: re-add the survivors to a fresh graph
+            keep = np.array(self.store.vectors(), dtype="int64")
+            X = self._vectors(keep)
+            self.index, self.index_spec = make_index(self.index_spec["type"], self.dim, X, {**self.index_params, **self.index_spec})
+            if len(keep):
+                self.index.add_with_ids(X, keep)
 
     def save(self):
-        assert self.index is not None and self.dim is not None
-        faiss.write_index(self.index, INDEX_PATH)
-        with open(META_PATH, "w", encoding="utf-8") as f:
-            json.dump({"meta": self.meta, "dim": self.dim}, f, ensure_ascii=False)
-
-    def load(self):
-        if not (os.path.exists(INDEX_PATH) and os.path.exists(META_PATH)):
-            raise FileNotFoundError("Index or metadata not found. Run /ingest first.")
-        self.index = faiss.read_index(INDEX_PATH)
-        with open(META_PATH, "r", encoding="utf-8") as f:
+        with self.lock, timed(INDEX_IO_SECONDS, "index_save", op="save"):
+            store = self._open_store()
+            if self.index is None:
+                # Empty store: no index file, so load() reports it as not ingested yet
+                if os.path.exists(self.index_path):
+                    os.remove(self.index_path)
+            else:
+                assert self.dim is not None
+                # Write-then-rename: other workers may have the old file memory-mapped
+                tmp = self.index_path + f".tmp{os.getpid()}"
+                faiss.write_index(self.index, tmp)
+                os.replace(tmp, self.index_path)
+            store.set_info("dim", self.dim)
+            store.set_info("next_id", self.next_id)
+            store.set_info("index", self.index_spec)
+            store.set_info("index_type", self.index_type)
+            store.set_info("lexical", LEXICAL_VERSION)
+            store.commit()
+
+    def load(self, mmap: bool = True):
+        """
+        Open the index (memory-mapped by default, so workers share its pages) and the metadata store.
+        """
+        with self.lock, timed(INDEX_IO_SECONDS, "index_load", op="load"):
+            if self.path == DATA_DIR and os.path.exists(LEGACY_META_PATH) and not os.path.exists(self.meta_path):
+                self._migrate_legacy()
+            if not (os.path.exists(self.index_path) and os.path.exists(self.meta_path)):
+                raise FileNotFoundError("Index or metadata not found. Run /ingest first.")
+            store = self._open_store()
+            self.dim = store.get_info("dim")
+            self.next_id = store.get_info("next_id", 0)
+            self.index_spec = store.get_info("index", {"type": "flat"})
+            if not self._index_type_given:
+                # INDEX_TYPE only applies to new stores: a small ivf store is still flat but stays "ivf"
+                self.index_type = store.get_info("index_type") or self.index_spec["type"]
+            flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) if mmap else 0
+            self.index = faiss.read_index(self.index_path, flags)
+            self._mmapped = bool(mmap)
+            set_search_params(self.index, self.index_spec)
+            self._shared = store.shared() > 0
+            if store.get_info("lexical") != LEXICAL_VERSION:
+                self.reindex_terms()
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the loaded index (its size on disk)."""
+        if self.index is None:
+            return 0
+        try:
+            return os.path.getsize(self.index_path)
+        except OSError:
+            return int(self.index.ntotal) * int(self.dim or 0) * 4
+
+    def reindex_terms(self):
+        """Rebuild the BM25 postings from the stored chunk texts (stores from before hybrid search, or a new tokenizer)."""
+        with self.lock:
+            store = self._open_store()
+            store.clear_terms()
+            for rows in store.iter_texts():
+                store.put_terms((fid, *term_counts(text)) for fid, text in rows)
+            store.set_info("lexical", LEXICAL_VERSION)
+            store.commit()
+
+    def _migrate_legacy(self):
+        # meta.json (+ meta.log journal) -> meta.sqlite, once
+        with open(LEGACY_META_PATH, "r", encoding="utf-8") as f:
             data = json.load(f)
-        self.meta = data["meta"]
+        meta = {}
+        for pos, row in enumerate(data["meta"]):
+            meta[row.get("fid", pos)] = row  # oldest meta.json has no fid: row position
+        if os.path.exists(LEGACY_LOG_PATH):
+            with open(LEGACY_LOG_PATH, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        op = json.loads(line)
+                        if op["op"] == "put":
+                            meta[op["fid"]] = op
+                        else:
+                            meta.pop(op["fid"], None)
+        index = faiss.read_index(self.index_path)
+        if not isinstance(index, faiss.IndexIDMap):
+            # Oldest flat index: ids are row positions
+            legacy = faiss.IndexIDMap2(faiss.IndexFlatIP(data["dim"]))
+            if index.ntotal:
+                legacy.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype="int64"))
+            index = legacy
+        self.index, self._mmapped = index, False
         self.dim = data["dim"]
+        self.index_spec = data.get("index", {"type": "flat"})
+        self.next_id = max(data.get("next_id", 0), max(meta, default=-1) + 1)
+        store = self._open_store()
+        store.put((fid, r["id"], r["text"], r.get("hash") or content_hash(r["text"])) for fid, r in meta.items())
+        store.put_terms((fid, *term_counts(r["text"])) for fid, r in meta.items())
+        self.save()
+        print(f"✅ Migrated {len(meta)} chunks from meta.json to meta.sqlite")
 
     def search(self, query: str, k: int = 5) -> List[Tuple[float, Dict]]:
-        qv = np.array(hf_feature_extraction([query])[0], dtype="float32")[None, :]
-        faiss.normalize_L2(qv)
-        D, I = self.index.search(qv, k)
-        results = []
-        for score, idx in zip(D[0].tolist(), I[0].tolist()):
-            if idx == -1:  # no hit
-                continue
-            results.append((float(score), self.meta[idx]))
-        return results
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[float, Dict]]]:
+        """
+        One embed call and one FAISS search for all queries; metadata for every
+        hit is fetched in a single query. Returns one hit list per query.
+
+        With hybrid search on, each query also gets BM25 hits and the two rankings
+        are merged by reciprocal-rank fusion; scores are then fused ranks in 0..1
+        rather than cosine similarities.
+        """
+        if not queries:
+            return []
+        start = time.perf_counter()
+        n = k * HYBRID_CANDIDATES if self.hybrid else k
+        Q = embed_texts(queries)
+        faiss.normalize_L2(Q)
+        with self.lock, timed(SEARCH_SECONDS, "search", stage="dense"):
+            D, I = self.index.search(Q, n)
+        hits = [[(float(score), idx) for score, idx in zip(d, i) if idx != -1]
+                for d, i in zip(D.tolist(), I.tolist())]
+        if self.hybrid:
+            with timed(SEARCH_SECONDS, "bm25", stage="lexical"):
+                lexical = self._lexical_batch(queries, n)
+            # Lexical list first: on equal fused scores an exact term match wins
+            hits = [rrf([lex, [idx for _, idx in dense]], RRF_K)[:k] for dense, lex in zip(hits, lexical)]
+            hits = [[(score, idx) for idx, score in hs] for hs in hits]
+        rows = self._open_store().fetch(sorted({idx for hs in hits for _, idx in hs}))
+        SEARCH_SECONDS.observe(time.perf_counter() - start, stage="total")
+        return [[(score, rows[idx]) for score, idx in hs if idx in rows] for hs in hits]
+
+    def _lexical_batch(self, queries: List[str], n: int) -> List[List[int]]:
+        """Top-n fids by BM25 for each query."""
+        store = self._open_store()
+        terms = [tokenize(q) for q in queries]
+        postings = store.postings(sorted({t for ts in terms for t in ts}))
+        if not postings:
+            return [[] for _ in queries]
+        n_docs, avgdl = store.lexical_totals()
+        doclens = store.doc_lengths(sorted({fid for plist in postings.values() for fid, _ in plist}))
+        out = []
+        for ts in terms:
+            scores = bm25(ts, postings, doclens, n_docs, avgdl, BM25_K1, BM25_B)
+            out.append([fid for fid, _ in sorted(scores.items(), key=lambda x: -x[1])[:n]])
+        if self._shared:
+            # Near-duplicates are ranked by the vector they share (best rank wins)
+            vids = store.vector_ids(sorted({fid for fids in out for fid in fids}))
+            out = [list(dict.fromkeys(vids.get(fid, fid) for fid in fids)) for fids in out]
+        return out
 
 def format_prompt(contexts: List[Dict], user_query: str) -> str:
     """
@@ -66,7 +601,7 @@ def format_prompt(contexts: List[Dict], user_query: str) -> str:
     Creates a clear, concise prompt for the NVIDIA API.
     """
     # Format context - keep it concise
-    context_text = "\n".join(f"- {c['text'][:400]}" for c in contexts)  # Shorter chunks
+    context_text = "\n".join(f"- {c['text'][:CONTEXT_CHARS]}" for c in contexts)  # Shorter chunks
     
     # User-friendly system instruction
     system_instruction = (
@@ -0,0 +1,165 @@
+"""
+Re-ranking of retrieved chunks with a local cross-encoder, and the adaptive
+cutoff that decides how many of them go into the prompt.
+
+The first-stage search over-fetches RERANK_CANDIDATES chunks; the
+cross-encoder scores every (query, chunk) pair (0..1) and only the chunks
+scoring at least RERANK_MIN_SCORE, up to top_k and CONTEXT_TOKEN_BUDGET
+prompt tokens, are kept. Scores are cached per (query, chunk text), so a
+repeated question or an overlapping candidate list costs no model call.
+Without sentence-transformers the retrieval order is kept and only the
+token budget applies.
+"""
+import os, hashlib, threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import numpy as np
+
+from embed_cache import normalize_text
+from hf import count_tokens
+from metrics import SEARCH_SECONDS, timed
+from rag import CONTEXT_CHARS
+
+RERANK_ENABLED = os.getenv("RERANK", "0") != "0"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Chunks fetched by the first-stage search for the cross-encoder to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "32"))
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", "0.05"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+# Prompt tokens allowed for contexts (0 = no limit); applies with or without the cross-encoder
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+
+Hit = Tuple[float, Dict]
+
+def _key(model: str, query: str, text: str) -> str:
+    return hashlib.sha1(f"{model}\0{normalize_text(query)}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class Reranker:
+    """Cross-encoder with an LRU of (query, chunk) scores."""
+    def __init__(self, model_name: str = RERANK_MODEL, cache_size: int = RERANK_CACHE_SIZE,
+                 min_score: float = RERANK_MIN_SCORE, token_budget: int = CONTEXT_TOKEN_BUDGET):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.min_score = min_score
+        self.token_budget = token_budget
+        self.scores: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.candidates = 0
+        self.kept = 0
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+    def model(self):
+        """The cross-encoder, loaded on first use (None if sentence-transformers is missing or it failed to load)."""
+        with self._model_lock:
+            if not hasattr(self, "_model"):
+                self._model = None
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                    print(f"✅ Using re-ranking model: {self.model_name}")
+                except ImportError:
+                    print("⚠️  sentence-transformers not installed: re-ranking keeps the retrieval order")
+                except Exception as e:
+                    print(f"⚠️  Re-ranking model failed to load: {e}")
+            return self._model
+
+    def score(self, pairs: List[Tuple[str, str]]) -> np.ndarray | None:
+        """Cross-encoder scores (0..1) for (query, text) pairs; None without a model."""
+        model = self.model()
+        if model is None:
+            return None
+        keys = [_key(self.model_name, q, t) for q, t in pairs]
+        out = np.empty(len(pairs), dtype="float32")
+        todo: Dict[str, int] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self.scores:
+                    self.scores.move_to_end(key)
+                    out[i] = self.scores[key]
+                    self.hits += 1
+                else:
+                    todo.setdefault(key, i)
+            self.misses += len(todo)
+        if todo:
+            with timed(SEARCH_SECONDS, "rerank", stage="rerank"):
+                fresh = np.asarray(model.predict([pairs[i] for i in todo.values()], batch_size=RERANK_BATCH,
+                                                 show_progress_bar=False), dtype="float32").reshape(-1)
+            with self._lock:
+                for key, s in zip(todo, fresh.tolist()):
+                    self.scores[key] = s
+                    self.scores.move_to_end(key)
+                while len(self.scores) > self.cache_size:
+                    self.scores.popitem(last=False)
+            by_key = dict(zip(todo, fresh.tolist()))
+            for i, key in enumerate(keys):
+                if key in by_key:
+                    out[i] = by_key[key]
+        return out
+
+    def rerank_batch(self, queries: List[str], hits: List[List[Hit]], top_k: int) -> List[List[Hit]]:
+        """
+        Re-order each query's candidates by cross-encoder score (all pairs scored
+        in one batched call) and cut each list adaptively.
+        """
+        pairs = [(q, m["text"]) for q, hs in zip(queries, hits) for _, m in hs]
+        scores = self.score(pairs) if pairs else None
+        out, pos = [], 0
+        for hs in hits:
+            if scores is None:
+                ranked, min_score = list(hs), None
+            else:
+                ranked = sorted(zip(scores[pos:pos + len(hs)].tolist(), (m for _, m in hs)), key=lambda h: -h[0])
+                min_score = self.min_score
+            pos += len(hs)
+            out.append(self.cutoff(ranked, top_k, min_score))
+        with self._lock:
+            self.candidates += len(pairs)
+            self.kept += sum(len(hs) for hs in out)
+        return out
+
+    def cutoff(self, ranked: List[Hit], top_k: int, min_score: float | None = None) -> List[Hit]:
+        """
+        Best-first hits up to top_k, stopping below min_score or once the
+        contexts would exceed the token budget. The best hit is always kept.
+        """
+        ranked = ranked[:top_k]
+        if min_score is not None:
+            ranked = ranked[:1] + [h for h in ranked[1:] if h[0] >= min_score]
+        if self.token_budget <= 0 or len(ranked) <= 1:
+            return ranked
+        # Counted as the contexts appear in the prompt (see format_prompt)
+        tokens = count_tokens([m["text"][:CONTEXT_CHARS] for _, m in ranked])
+        used = np.cumsum(tokens)
+        return ranked[:max(1, int(np.searchsorted(used, self.token_budget, side="right")))]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"enabled": RERANK_ENABLED, "model": self.model_name, "cached_scores": len(self.scores),
+                    "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "candidates": self.candidates, "kept": self.kept,
+                    "kept_ratio": round(self.kept / self.candidates, 4) if self.candidates else 0.0,
+                    "min_score": self.min_score, "token_budget": self.token_budget}
+
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> Reranker:
+    with _reranker_lock:
+        if not hasattr(get_reranker, "_reranker"):
+            get_reranker._reranker = Reranker()
+        return get_reranker._reranker
+
+def candidates(top_k: int) -> int:
+    """How many hits to ask the first-stage search for."""
+    return max(top_k, RERANK_CANDIDATES) if RERANK_ENABLED else top_k
+
+def select(queries: List[str], hits: List[List[Hit]], top_k: int) -> List[List[Hit]]:
+    """Hits to put in each prompt: re-ranked if RERANK=1, then cut to top_k / the token budget."""
+    if RERANK_ENABLED:
+        return get_reranker().rerank_batch(queries, hits, top_k)
+    if CONTEXT_TOKEN_BUDGET > 0:
+        return [get_reranker().cutoff(hs, top_k) for hs in hits]
+    return hits
@@ -0,0 +1,142 @@
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+def request_key(**parts) -> str:
+    """Exact-match key: sha1 of the canonical JSON of everything that shapes the answer."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM answers.
+
+    Exact tier: key = request_key(model, temperature, prompt, changes, ...).
+    Semantic tier: within a scope (e.g. the same model/temperature and the same
+    retrieved context ids), an entry whose query embedding has cosine >= threshold
+    with the new query is reused.
+
+    Entries expire after ttl seconds and are evicted LRU beyond max_items. The
+    store is write-through to SQLite so it survives restarts.
+    """
+    def __init__(self, path: str, max_items: int = 2000, ttl: float = 24 * 3600, threshold: float = 0.95):
+        self.path = path
+        self.max_items = max_items
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self.scopes: Dict[str, set] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key       TEXT PRIMARY KEY,
+                scope     TEXT NOT NULL,
+                answer    TEXT NOT NULL,
+                reasoning TEXT,
+                vec       BLOB,
+                created   REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self._load()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self.conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+        rows = self.conn.execute(
+            "SELECT key, scope, answer, reasoning, vec, created FROM responses ORDER BY last_used DESC LIMIT ?",
+            (self.max_items,)).fetchall()
+        for key, scope, answer, reasoning, vec, created in reversed(rows):
+            self._insert(key, {
+                "scope": scope, "answer": answer, "reasoning": reasoning, "created": created,
+                "vec": np.frombuffer(vec, dtype="float32") if vec else None,
+            })
+        self.conn.commit()
+
+    def _insert(self, key: str, entry: Dict):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.scopes.setdefault(entry["scope"], set()).add(key)
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self.scopes.get(entry["scope"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.scopes[entry["scope"]]
+        self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _fresh(self, key: str) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry["created"] > self.ttl:
+            self._drop(key)
+            return None
+        return entry
+
+    def get(self, key: str, scope: str | None = None, vec: np.ndarray | None = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Returns (entry, "exact" | "semantic") on a hit, (None, None) on a miss.
+        The semantic tier needs both scope and the query embedding.
+        """
+        with self._lock:
+            hit, kind = self._fresh(key), "exact"
+            if hit is None and scope is not None and vec is not None and self.scopes.get(scope):
+                q = vec / (np.linalg.norm(vec) + 1e-8)
+                best, best_sim = None, self.threshold
+                for k in list(self.scopes[scope]):
+                    entry = self._fresh(k)
+                    if entry is None or entry["vec"] is None:
+                        continue
+                    sim = float(np.dot(entry["vec"], q))
+                    if sim >= best_sim:
+                        best, best_sim = k, sim
+                if best is not None:
+                    key, hit, kind = best, self.entries[best], "semantic"
+            if hit is None:
+                self.misses += 1
+                self.conn.commit()
+                return None, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            if kind == "semantic":
+                self.semantic_hits += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return hit, kind
+
+    def put(self, key: str, answer: str, reasoning: str | None = None,
+            scope: str | None = None, vec: np.ndarray | None = None):
+        scope = scope or key
+        if vec is not None:
+            vec = (vec / (np.linalg.norm(vec) + 1e-8)).astype("float32")
+        now = time.time()
+        with self._lock:
+            self._drop(key)
+            self._insert(key, {"scope": scope, "answer": answer, "reasoning": reasoning, "vec": vec, "created": now})
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, answer, reasoning, vec, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, answer, reasoning, vec.tobytes() if vec is not None else None, now, now))
+            while len(self.entries) > self.max_items:
+                self._drop(next(iter(self.entries)))
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "items": len(self.entries),
+        }
@@ -0,0 +1,120 @@
+"""
+Server-side port of lib/diff.ts (walk / diffSchemas).
+
+Documents are read as a stream of parse events (ijson when installed), so a
+multi-hundred-MB payload is never materialized: memory is proportional to the
+number of distinct paths. Unlike the browser version, every array item is
+walked and the element types seen at a path are merged ("number|string").
+"""
+import io, json
+from typing import Any, Dict, Iterator, List, Tuple
+
+try:
+    import ijson
+except ImportError:  # optional: falls back to json.load (materializes the document)
+    ijson = None
+
+_SCALARS = {"null": "null", "boolean": "boolean", "integer": "number", "double": "number",
+            "number": "number", "string": "string"}
+
+def _object_events(obj: Any) -> Iterator[Tuple[str, Any]]:
+    """ijson.basic_parse-style events for an already-parsed value."""
+    if isinstance(obj, dict):
+        yield "start_map", None
+        for k, v in obj.items():
+            yield "map_key", k
+            yield from _object_events(v)
+        yield "end_map", None
+    elif isinstance(obj, list):
+        yield "start_array", None
+        for v in obj:
+            yield from _object_events(v)
+        yield "end_array", None
+    elif obj is None:
+        yield "null", None
+    elif isinstance(obj, bool):
+        yield "boolean", obj
+    elif isinstance(obj, (int, float)):
+        yield "number", obj
+    else:
+        yield "string", obj
+
+def parse_events(source) -> Iterator[Tuple[str, Any]]:
+    """
+    Parse events for source: a binary file object, bytes/str of JSON, or a parsed value.
+    """
+    if isinstance(source, (bytes, str)):
+        if ijson is not None:
+            source = io.BytesIO(source.encode("utf-8") if isinstance(source, str) else source)
+        else:
+            return _object_events(json.loads(source))
+    if hasattr(source, "read"):
+        if ijson is not None:
+            return ijson.basic_parse(source)
+        return _object_events(json.load(source))
+    return _object_events(source)
+
+def schema_types(source) -> Dict[str, str]:
+    """
+    path -> type for every field, like walk() in lib/diff.ts: "a.b", "items[].price".
+    Types: null | boolean | number | string | object | array, or several joined
+    by "|" when array items disagree. Element paths ("tags[]") are only kept for
+    arrays that hold objects, as in the TypeScript version.
+    """
+    types: Dict[str, set] = {}
+    # Frames: [path, is_array, current key]
+    stack: List[list] = []
+
+    def value_path() -> str:
+        if not stack:
+            return ""
+        path, is_array, key = stack[-1]
+        if is_array:
+            return f"{path}[]"
+        return f"{path}.{key}" if path else key
+
+    for event, value in parse_events(source):
+        if event == "map_key":
+            stack[-1][2] = value
+            continue
+        if event in ("end_map", "end_array"):
+            stack.pop()
+            continue
+        path = value_path()
+        if event == "start_map":
+            t = "object"
+        elif event == "start_array":
+            t = "array"
+        else:
+            t = _SCALARS[event]
+        if path:
+            types.setdefault(path, set()).add(t)
+        if event in ("start_map", "start_array"):
+            stack.append([path, event == "start_array", None])
+
+    return {p: "|".join(sorted(ts)) for p, ts in types.items()
+            if not p.endswith("[]") or "object" in ts}
+
+def diff_types(A: Dict[str, str], B: Dict[str, str]) -> Dict:
+    """diffSchemas over two path -> type maps."""
+    changes: List[Dict[str, str]] = []
+    for p, t in A.items():
+        if p not in B:
+            changes.append({"kind": "REMOVED_FIELD", "path": p, "oldType": t})
+        elif t != B[p]:
+            changes.append({"kind": "TYPE_CHANGED", "path": p, "oldType": t, "newType": B[p]})
+    for p, t in B.items():
+        if p not in A:
+            changes.append({"kind": "ADDED_FIELD", "path": p, "newType": t})
+    return {"changes": changes, "summary": {
+        "added": sum(1 for c in changes if c["kind"] == "ADDED_FIELD"),
+        "removed": sum(1 for c in changes if c["kind"] == "REMOVED_FIELD"),
+        "risky": sum(1 for c in changes if c["kind"] != "ADDED_FIELD"),
+    }}
+
+def diff_schemas(old, new) -> Dict:
+    """
+    Same report as diffSchemas() in lib/diff.ts. old/new: file objects, JSON
+    bytes/str or parsed values.
+    """
+    return diff_types(schema_types(old), schema_types(new))
@@ -0,0 +1,132 @@
+"""
+Bytes per chunk and retrieval recall: default vs. compact storage.
+
+Ingests the same corpus twice, into scratch directories:
+  default  flat float32 index, every chunk its own vector, plain-text metadata
+  compact  SQ8 index, near-duplicate chunks share a vector (NEAR_DUP_SIM),
+           texts compressed with a trained dictionary (TEXT_COMPRESSION)
+and reports disk per chunk (index, metadata, texts) and recall@k of compact
+search against the default store's results.
+
+  python storage_report.py --folder data/docs
+  python storage_report.py --synthetic 2000 --near-dup 0.97 --json storage.json
+  python storage_report.py --index ivfsq8 --compression zlib
+"""
+import argparse, json, os, shutil, tempfile, time
+from typing import Dict, List
+import numpy as np
+
+from rag import VectorStore
+from utils import iter_chunks_parallel, dedupe_chunks
+
+def measure(vs: VectorStore) -> Dict:
+    store = vs._open_store()
+    store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    chunks = store.count()
+    text_bytes = store.conn.execute("SELECT SUM(LENGTH(CAST(text AS BLOB))) FROM chunks").fetchone()[0] or 0
+    index_bytes = os.path.getsize(vs.index_path)
+    meta_bytes = os.path.getsize(vs.meta_path)
+    return {
+        "spec": vs.index_spec,
+        "chunks": chunks,
+        "vectors": int(vs.index.ntotal),
+        "codec": store.codec.codec if store.codec is not None else None,
+        "index_bytes": index_bytes,
+        "meta_bytes": meta_bytes,
+        "text_bytes": text_bytes,
+        "bytes_per_chunk": round((index_bytes + meta_bytes) / max(1, chunks), 1),
+        "index_bytes_per_chunk": round(index_bytes / max(1, chunks), 1),
+        "text_bytes_per_chunk": round(text_bytes / max(1, chunks), 1),
+    }
+
+def groups(vs: VectorStore) -> Dict[str, int]:
+    """chunk id -> id of the vector it is searched by."""
+    rows = vs._open_store().conn.execute("SELECT id, COALESCE(ref, fid) FROM chunks").fetchall()
+    return dict(rows)
+
+def recall(base: VectorStore, compact: VectorStore, queries: List[str], k: int, hybrid: bool) -> float:
+    """
+    Share of the default store's top k that compact search also returns. A
+    near-duplicate counts as found when the chunk whose vector it shares is.
+    """
+    base.hybrid = compact.hybrid = hybrid
+    truth = base.search_batch(queries, k)
+    found = compact.search_batch(queries, k)
+    group = groups(compact)
+    hits = []
+    for t, f in zip(truth, found):
+        got = {group.get(row["id"]) for _, row in f}
+        hits.append(sum(group.get(row["id"]) in got for _, row in t) / max(1, len(t)))
+    return round(float(np.mean(hits)), 4) if hits else 0.0
+
+def sample_queries(chunks: List[Dict[str, str]], n: int, seed: int = 1) -> List[str]:
+    # A window of words out of random chunks, so every query has a real answer
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in rng.integers(0, len(chunks), n):
+        words = chunks[i]["text"].split()
+        start = int(rng.integers(0, max(1, len(words) - 8)))
+        out.append(" ".join(words[start:start + 8]))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--folder", default="data/docs")
+    ap.add_argument("--synthetic", type=int, default=0, help="generate this many diff-report docs instead (bench.py corpus)")
+    ap.add_argument("--index", default="sq8", help="compact index type")
+    ap.add_argument("--near-dup", type=float, default=0.98, help="cosine at which chunks share a vector (0 = off)")
+    ap.add_argument("--compression", default="auto", help="none | auto | zstd | zlib")
+    ap.add_argument("--min-vectors", type=int, default=0, help="train the compact index even on a small corpus")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="storage-report-")
+    try:
+        folder = args.folder
+        if args.synthetic:
+            from bench import write_corpus
+            folder = os.path.join(scratch, "docs")
+            write_corpus(folder, args.synthetic, changes_per_doc=40)
+        chunks = list(dedupe_chunks(iter_chunks_parallel(folder)))
+        if not chunks:
+            raise SystemExit(f"No text found in {folder}")
+
+        stores = {
+            "default": VectorStore(index_type="flat", path=os.path.join(scratch, "default"),
+                                   near_dup=0, text_compression="none"),
+            "compact": VectorStore(index_type=args.index, index_params={"min_vectors": args.min_vectors},
+                                   path=os.path.join(scratch, "compact"),
+                                   near_dup=args.near_dup, text_compression=args.compression),
+        }
+        rows = {}
+        for name, vs in stores.items():
+            t0 = time.perf_counter()
+            vs.build(chunks)
+            rows[name] = {**measure(vs), "build_s": round(time.perf_counter() - t0, 2)}
+
+        queries = sample_queries(chunks, args.queries)
+        for hybrid in (False, True):
+            rows["compact"][f"recall@{args.k}" + ("_hybrid" if hybrid else "")] = recall(
+                stores["default"], stores["compact"], queries, args.k, hybrid)
+        rows["compact"]["ratio"] = round(rows["default"]["bytes_per_chunk"] / max(1.0, rows["compact"]["bytes_per_chunk"]), 2)
+
+        print(f"{len(chunks)} chunks, {args.queries} queries, k={args.k}\n")
+        print(f"{'store':<9} {'index':<10} {'vectors':>8} {'codec':>6} {'B/chunk':>9} {'index':>8} {'text':>8} {'build s':>8}")
+        for name, r in rows.items():
+            print(f"{name:<9} {r['spec']['type']:<10} {r['vectors']:>8} {r['codec'] or '-':>6} {r['bytes_per_chunk']:>9} "
+                  f"{r['index_bytes_per_chunk']:>8} {r['text_bytes_per_chunk']:>8} {r['build_s']:>8}")
+        c = rows["compact"]
+        print(f"\ncompact: {c['ratio']}x smaller, recall@{args.k} {c[f'recall@{args.k}']} dense / "
+              f"{c[f'recall@{args.k}_hybrid']} hybrid (vs. default results)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"chunks": len(chunks), "k": args.k, "near_dup": args.near_dup, "results": rows}, f, indent=2)
+        for vs in stores.values():
+            vs.store.close()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
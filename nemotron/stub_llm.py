@@ -0,0 +1,88 @@
+"""
+Minimal OpenAI-compatible chat-completions server for local testing.
+
+Answers every request with a canned reply, streamed token by token when
+stream=true. Point the service at it with:
+
+  python stub_llm.py --port 8001 --delay 0.02
+  NVIDIA_BASE_URL=http://127.0.0.1:8001/v1 python main.py
+"""
+import argparse, asyncio, json, time, uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "The field was removed because its data moved into a nested object. "
+    "Update clients to read the new path and treat the old field as gone."
+)
+
+def create_app(reply: str = REPLY, delay: float = 0.0, first_token_delay: float = 0.0,
+               reasoning: str = "", fail_first: int = 0, stall_first: int = 0, stall: float = 5.0) -> FastAPI:
+    """
+    delay: seconds between streamed tokens (and total/len for non-streaming).
+    fail_first: answer this many requests with 503 first, to exercise retries.
+    stall_first: then hold this many for `stall` seconds before answering, to exercise timeouts.
+    """
+    app = FastAPI(title="Stub LLM")
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if app.state.requests <= fail_first:
+            return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=503)
+        if app.state.requests <= fail_first + stall_first:
+            await asyncio.sleep(stall)
+
+        model = body.get("model", "stub")
+        words = reply.split(" ")
+        tokens = [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+        tokens = tokens[:max(1, int(body.get("max_tokens") or len(tokens)))]
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + delay * len(tokens))
+            return {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+
+        def chunk(delta: dict, finish: str | None = None) -> str:
+            return "data: " + json.dumps({
+                "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }) + "\n\n"
+
+        async def events():
+            await asyncio.sleep(first_token_delay)
+            if reasoning:
+                yield chunk({"role": "assistant", "reasoning_content": reasoning})
+            for tok in tokens:
+                yield chunk({"content": tok})
+                await asyncio.sleep(delay)
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--delay", type=float, default=0.0)
+    ap.add_argument("--first-token-delay", type=float, default=0.0)
+    ap.add_argument("--reasoning", default="")
+    ap.add_argument("--fail-first", type=int, default=0)
+    ap.add_argument("--stall-first", type=int, default=0)
+    ap.add_argument("--stall", type=float, default=5.0)
+    args = ap.parse_args()
+    uvicorn.run(create_app(delay=args.delay, first_token_delay=args.first_token_delay,
+                           reasoning=args.reasoning, fail_first=args.fail_first,
+                           stall_first=args.stall_first, stall=args.stall),
+                host="127.0.0.1", port=args.port)
@@ -0,0 +1,61 @@
+"""
+Versioned collections (pytest): python -m pytest -q test_collections.py
+"""
+import os, threading, time
+
+import pytest
+
+import collection_store
+import hf
+from collection_store import Collections
+from hash_embed import HashingEmbedder
+
+@pytest.fixture(autouse=True)
+def offline_embeddings(monkeypatch):
+    emb = HashingEmbedder()
+    monkeypatch.setattr(hf, "_compute_embeddings", lambda texts: (emb.embed(texts), "fallback"))
+    monkeypatch.setattr(hf, "get_embed_cache", lambda: None)
+
+def docs(n: int, tag: str):
+    return [{"id": f"{tag}{i}#0", "text": f"{tag}: Field 'user.f{i}' changed from string to integer"} for i in range(n)]
+
+def current(root, name="api"):
+    with open(os.path.join(root, name, "CURRENT"), encoding="utf-8") as f:
+        return f.read()
+
+def test_rebuild_publishes_through_current(tmp_path):
+    writer, reader = Collections(str(tmp_path), keep_versions=2), Collections(str(tmp_path))
+    v1 = writer.rebuild("api", docs(3, "one"))["version"]
+    assert current(tmp_path) == v1 and reader.get("api").index.ntotal == 3
+    time.sleep(0.002)  # version names are per millisecond
+    v2 = writer.rebuild("api", docs(5, "two"))["version"]
+    # Another worker picks up the new version on its next get()
+    assert current(tmp_path) == v2 and reader.get("api").index.ntotal == 5
+
+    def cancel(stats):
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        writer.rebuild("api", docs(4, "three"), progress=cancel)
+    assert current(tmp_path) == v2 and reader.get("api").index.ntotal == 5
+
+    time.sleep(0.002)
+    v3 = writer.rebuild("api", docs(2, "four"))["version"]
+    # Current plus the one before it: older versions are removed, failed builds leave nothing
+    assert sorted(d for d in os.listdir(tmp_path / "api") if d.startswith("v")) == sorted([v2, v3])
+    assert writer.update("api", docs(2, "five"), prune=False)["embedded"] == 2
+    assert current(tmp_path) == v3 and reader.get("api").index.ntotal == 4
+
+@pytest.mark.skipif(collection_store.fcntl is None, reason="no flock on this platform")
+def test_writers_wait_for_the_collection_lock(tmp_path):
+    cols = Collections(str(tmp_path))
+    os.makedirs(tmp_path / "api")
+    # Held through its own open file, as another worker process would
+    with open(tmp_path / "api" / ".lock", "a") as held:
+        collection_store.fcntl.flock(held.fileno(), collection_store.fcntl.LOCK_EX)
+        done = threading.Event()
+        writer = threading.Thread(target=lambda: (cols.rebuild("api", docs(2, "one")), done.set()))
+        writer.start()
+        assert not done.wait(0.3) and not os.path.exists(tmp_path / "api" / "CURRENT")
+        collection_store.fcntl.flock(held.fileno(), collection_store.fcntl.LOCK_UN)
+    writer.join(10)
+    assert done.is_set() and cols.get("api").index.ntotal == 2
@@ -0,0 +1,76 @@
+"""
+Background job queue (pytest): python -m pytest -q test_jobs.py
+"""
+import asyncio, os, socket, time
+
+import pytest
+
+import jobs
+from jobs import JobQueue
+
+@pytest.fixture(autouse=True)
+def fast_heartbeats(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(jobs, "JOBS_HEARTBEAT_TIMEOUT", 1.0)
+
+async def count(job):
+    for i in range(job.params["n"]):
+        await asyncio.sleep(0.02)
+        job.update(i=i)
+    return {"n": job.params["n"]}
+
+async def wait(queue, job_id, *statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)["status"] not in statuses:
+        assert time.monotonic() < deadline, queue.get(job_id)
+        await asyncio.sleep(0.02)
+    return queue.get(job_id)
+
+def test_restart_requeues_interrupted_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+
+    async def first_run():
+        queue = JobQueue(path, {"count": (count, 1)})
+        await queue.start()
+        running = queue.submit("count", {"n": 200})["id"]
+        waiting = queue.submit("count", {"n": 2})["id"]
+        await wait(queue, running, "running")
+        await queue.stop()  # the process goes away mid-job
+        return running, waiting
+
+    async def second_run(running, waiting):
+        queue = JobQueue(path, {"count": (count, 1)})
+        await queue.start()
+        try:
+            return await wait(queue, running, "done", timeout=10), await wait(queue, waiting, "done")
+        finally:
+            await queue.stop()
+
+    running, waiting = asyncio.run(first_run())
+    first, second = asyncio.run(second_run(running, waiting))
+    assert first["result"] == {"n": 200} and second["result"] == {"n": 2}
+    assert first["owner"] == f"{socket.gethostname()}:{os.getpid()}"
+
+def test_live_owner_keeps_its_job_until_heartbeats_stop(tmp_path):
+    async def run():
+        queue = JobQueue(str(tmp_path / "jobs.sqlite"), {"count": (count, 1)})
+        await queue.start()
+        store = queue.store
+        # Claimed by another live process on this host (our parent), heartbeat current
+        job_id = queue.submit("count", {"n": 2})["id"]
+        store.update(job_id, status="running", owner=f"{socket.gethostname()}:{os.getppid()}", heartbeat=time.time())
+        await asyncio.sleep(0.3)
+        assert queue.get(job_id)["status"] == "running"
+        # Cancelling it only flags it for the owner
+        cancelled = queue.cancel(job_id)
+        assert cancelled["status"] == "running" and cancelled["cancel_requested"]
+        # Heartbeats stop: taken over, and the pending cancel is honoured
+        store.update(job_id, heartbeat=time.time() - 10)
+        done = await wait(queue, job_id, "cancelled", "done")
+        other = queue.submit("count", {"n": 2})["id"]
+        store.update(other, status="running", owner="elsewhere:1", heartbeat=time.time() - 10)
+        taken = await wait(queue, other, "done")
+        await queue.stop()
+        return done, taken
+    done, taken = asyncio.run(run())
+    assert done["status"] == "cancelled" and taken["result"] == {"n": 2}
@@ -0,0 +1,74 @@
+"""
+LLM client retries, streaming and fallback against stub_llm.py on a local
+port (pytest): python -m pytest -q test_llm_client.py
+"""
+import asyncio, contextlib, functools, threading, time
+
+import pytest
+import uvicorn
+
+import hf
+import llm_client
+from stub_llm import REPLY, create_app
+
+@contextlib.contextmanager
+def stub_llm(**options):
+    """(base_url, app) of a stub LLM server running for the duration of the block."""
+    app = create_app(**options)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/v1", app
+    finally:
+        server.should_exit = True
+        thread.join(5)
+
+def run(coro_fn, **manager_options):
+    """coro_fn(manager) on a fresh client pool (httpx pools belong to one event loop)."""
+    async def main():
+        manager = llm_client.init_llm_manager(backoff_base=0, **manager_options)
+        try:
+            return await coro_fn(manager)
+        finally:
+            await llm_client.close_llm_manager()
+    return asyncio.run(main())
+
+async def drain(stream):
+    return [event async for event in stream]
+
+MESSAGES = [{"role": "user", "content": "What changed?"}]
+
+def test_retries_after_5xx():
+    with stub_llm(fail_first=2) as (url, app):
+        async def call(manager):
+            completion = await manager.create(url, "x", model="stub", messages=MESSAGES)
+            return completion.choices[0].message.content, manager.retries
+        assert run(call, max_retries=2) == (REPLY, 2)
+        assert app.state.requests == 3
+
+def test_retries_after_timeout():
+    with stub_llm(stall_first=1, stall=2.0) as (url, app):
+        events = run(lambda m: drain(hf.stream_completion(url, "x", model="stub", messages=MESSAGES)),
+                     max_retries=1, timeout=0.3)
+        assert "".join(e["text"] for e in events) == REPLY
+        assert app.state.requests == 2
+
+def test_stream_assembles_sse_deltas():
+    with stub_llm(reasoning="Compare both schemas.") as (url, _):
+        events = run(lambda m: drain(hf.stream_completion(url, "x", model="stub", messages=MESSAGES)))
+    assert events[0] == {"type": "reasoning", "text": "Compare both schemas."}
+    tokens = [e["text"] for e in events[1:]]
+    assert all(e["type"] == "token" for e in events[1:]) and len(tokens) == len(REPLY.split(" "))
+    assert "".join(tokens) == REPLY
+
+def test_falls_back_when_the_llm_keeps_failing(monkeypatch):
+    with stub_llm(fail_first=100) as (url, app):
+        monkeypatch.setattr(hf, "stream_completion", functools.partial(hf.stream_completion, url, "x"))
+        prompt = "Context:\n- REMOVED: Field \"user.email\" (was string)\nUser Question: what changed?"
+        events = run(lambda m: drain(hf.hf_generate_stream(prompt)), max_retries=1)
+        assert app.state.requests == 2  # first try + one retry, then the local fallback
+    assert len(events) == 1 and events[0]["fallback"] and events[0]["text"]
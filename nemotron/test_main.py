@@ -0,0 +1,64 @@
+"""
+HTTP endpoints (pytest, FastAPI TestClient). Runs offline: hashing embeddings,
+and the LLM is replaced per test: python -m pytest -q test_main.py
+"""
+import os, tempfile
+
+# Before main is imported: its state goes to a scratch directory
+_DATA = tempfile.mkdtemp(prefix="nemotron-test-")
+os.environ.update(JOBS_PATH=os.path.join(_DATA, "jobs.sqlite"), RESPONSE_CACHE="0", STARTUP_WARMUP="0")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import hf
+import main
+from collection_store import Collections
+from hash_embed import HashingEmbedder
+
+@pytest.fixture(autouse=True)
+def offline_embeddings(monkeypatch):
+    emb = HashingEmbedder()
+    monkeypatch.setattr(hf, "_compute_embeddings", lambda texts: (emb.embed(texts), "fallback"))
+    monkeypatch.setattr(hf, "get_embed_cache", lambda: None)
+
+@pytest.fixture(scope="module")
+def client():
+    # Set here, not through COLLECTIONS_DIR: collection_store may have been imported by another test first
+    main.COLLECTIONS = Collections(os.path.join(_DATA, "collections"))
+    with TestClient(main.nemotron) as c:
+        yield c
+
+def upload(*docs):
+    return [("files", (name, text.encode("utf-8"), "text/plain")) for name, text in docs]
+
+def test_ingest_rejects_unknown_mode(client):
+    docs = [("a.md", "REMOVED: Field 'user.email' (was string)"), ("b.md", "ADDED: Field 'user.phone' (string)")]
+    assert client.post("/ingest", data={"collection": "modes"}, files=upload(*docs)).json()["ok"]
+    # A typo must not run a pruning sync that drops b.md
+    r = client.post("/ingest", data={"collection": "modes", "mode": "apend"}, files=upload(docs[0]))
+    assert r.status_code == 422
+    assert main.COLLECTIONS.get("modes").index.ntotal == 2
+    assert not client.post("/jobs", json={"kind": "ingest", "params": {"collection": "modes", "mode": "Append"}}).json()["ok"]
+    with pytest.raises(ValueError):
+        main.run_ingest(iter([{"id": "a#0", "text": "x"}]), "apend", "modes")
+
+def test_chat_reports_llm_failure_mid_answer(client, monkeypatch):
+    assert client.post("/ingest", data={"collection": "llm"},
+                       files=upload(("a.md", "REMOVED: Field 'user.email' (was string)"))).json()["ok"]
+
+    async def broken_stream(prompt, **kwargs):
+        yield {"type": "token", "text": "The field"}
+        raise RuntimeError("upstream reset")
+    monkeypatch.setattr(main, "hf_generate_stream", broken_stream)
+
+    r = client.post("/chat", json={"query": "what happened to user.email?", "collection": "llm"})
+    assert r.status_code == 200 and not r.json()["ok"] and "upstream reset" in r.json()["msg"]
+    r = client.post("/chat/batch", json={"queries": ["user.email?", "email?"], "collection": "llm"})
+    assert r.status_code == 200 and r.json()["ok"]
+    assert [res["ok"] for res in r.json()["results"]] == [False, False]
+
+def test_generate_rejects_unknown_mode(client):
+    r = client.post("/generate", json={"changes": [{"kind": "REMOVED_FIELD", "path": "a.b"}], "mode": "weird"})
+    assert r.status_code == 422
+    assert not client.post("/jobs", json={"kind": "generate", "params": {"mode": "weird"}}).json()["ok"]
@@ -0,0 +1,26 @@
+"""
+Path index for /generate value lookups (pytest): python -m pytest -q test_path_index.py
+"""
+import path_index
+from path_index import PathIndex, get_path_index, lookup_path
+
+DOC = {"user": {"name": "Ada", "tags": ["a", "b"]},
+       "items": [{"price": None}, {"price": 2, "sku": "B"}] + [{"price": i} for i in range(3, 15)]}
+
+PATHS = ["user", "user.name", "user.tags", "user.tags[1]", "items[0].price", "items[1].sku", "items[].price",
+         "items[].sku", "items[12].price", "items[20].price", "user.missing", "user.name.first", "items.price"]
+
+def test_matches_lookup_path():
+    index = PathIndex(DOC, max_items=10)
+    for path in PATHS:
+        assert index.get(path) == lookup_path(DOC, path), path
+    # Wildcards take the first non-null sample; indices past the cap still resolve
+    assert index.get("items[].price") == 2
+    assert index.get("items[12].price") == 13
+    assert "items[12].price" not in index.paths
+
+def test_cached_by_content(monkeypatch):
+    monkeypatch.setattr(path_index, "_cache", path_index.OrderedDict())
+    index = get_path_index(DOC)
+    assert get_path_index({"items": DOC["items"], "user": dict(DOC["user"])}) is index
+    assert get_path_index({**DOC, "extra": 1}) is not index
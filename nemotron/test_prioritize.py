@@ -0,0 +1,28 @@
+"""
+/generate change prioritization (pytest): python -m pytest -q test_prioritize.py
+"""
+from hf import count_tokens
+from prioritize import prioritize_changes, pack
+
+def added(path):
+    return {"kind": "ADDED_FIELD", "path": path, "newType": "string"}
+
+def test_breaking_change_outranks_large_minor_group():
+    changes = [added(f"user.profile.f{i}") for i in range(30)]
+    changes += [{"kind": "TYPE_CHANGED", "path": "order.total", "oldType": "number", "newType": "object"},
+                {"kind": "REMOVED_FIELD", "path": "user.email", "oldType": "string"}]
+    changes += [added(f"billing.f{i}") for i in range(5)]
+    items = prioritize_changes(changes, collapse=4)
+    assert [item["changes"][0]["path"] for item in items[:2]] == ["user.email", "order.total"]
+    # Groups rank by their most severe member; equal severity: the bigger group first
+    assert [len(item["changes"]) for item in items[2:]] == [30, 5]
+    assert items[2]["weight"] == items[3]["weight"] == 5
+
+def test_tight_budget_keeps_the_breaking_change():
+    changes = [added(f"user.profile.f{i}") for i in range(40)] + [{"kind": "REMOVED_FIELD", "path": "user.email"}]
+    items = prioritize_changes(changes, collapse=4)
+    group = next(item for item in items if len(item["changes"]) > 1)
+    # Room for either the group line or the removal, not both
+    kept, dropped = pack(items, lambda item: [item["line"]], budget=count_tokens([group["line"]])[0])
+    assert [c["path"] for item in kept for c in item["changes"]] == ["user.email"]
+    assert len(dropped) == 1
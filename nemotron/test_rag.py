@@ -0,0 +1,81 @@
+"""
+VectorStore index handling (pytest). Embeddings come from the hashing
+embedder, so this runs offline: python -m pytest -q test_rag.py
+"""
+import faiss
+import pytest
+
+import hf
+from hash_embed import HashingEmbedder
+from rag import VectorStore
+
+@pytest.fixture(autouse=True)
+def offline_embeddings(monkeypatch):
+    emb = HashingEmbedder()
+    monkeypatch.setattr(hf, "_compute_embeddings", lambda texts: (emb.embed(texts), "fallback"))
+    monkeypatch.setattr(hf, "get_embed_cache", lambda: None)
+
+def corpus(n: int, tag: str = ""):
+    return [{"id": f"doc{i}#0", "text": f"{tag}REMOVED: Field 'user.f{i}.name{i % 7}' (was string), moved under account{i % 13}"}
+            for i in range(n)]
+
+def ivf_store(path, index_type: str) -> VectorStore:
+    return VectorStore(index_type=index_type, index_params={"min_vectors": 0, "nlist": 8, "nprobe": 4},
+                       hybrid=False, path=str(path))
+
+@pytest.mark.parametrize("index_type", ["ivf", "ivfsq8"])
+def test_reload_applies_nprobe(tmp_path, index_type):
+    ivf_store(tmp_path, index_type).build(corpus(400))
+    vs = VectorStore(path=str(tmp_path))
+    vs.load()
+    assert vs.index_spec["type"] == index_type
+    assert faiss.extract_index_ivf(vs.index).nprobe == 4
+    vs.set_search_params(nprobe=8)
+    assert faiss.extract_index_ivf(vs.index).nprobe == 8
+
+@pytest.mark.parametrize("index_type", ["ivf", "ivfsq8"])
+def test_retrain_ivf_after_removals(tmp_path, index_type):
+    vs = ivf_store(tmp_path, index_type)
+    docs = corpus(400)
+    vs.build(docs)
+    vs.delete([d["id"] for d in docs[:100]])
+    vs.retrain()
+    vs = VectorStore(path=str(tmp_path), hybrid=False)
+    vs.load()
+    assert vs.index_spec["type"] == index_type and vs.index.ntotal == 300
+    # Each remaining chunk is still found by its own text
+    for d in docs[100::37]:
+        assert vs.search(d["text"], 1)[0][1]["id"] == d["id"]
+
+def test_reload_keeps_index_type(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.INDEX_TYPE", "flat")
+    ivf_store(tmp_path, "ivf").build(corpus(400))
+    vs = VectorStore(path=str(tmp_path), index_params={"min_vectors": 0, "nlist": 8}, hybrid=False)
+    vs.load()
+    vs.retrain()
+    assert vs.index_spec["type"] == "ivf"
+    vs.retrain("flat")
+    assert vs.index_spec["type"] == "flat" and vs.index.ntotal == 400
+
+def test_small_store_upgrades_after_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.INDEX_TYPE", "flat")
+    docs = corpus(400)
+    VectorStore(index_type="ivf", index_params={"min_vectors": 300, "nlist": 8}, hybrid=False,
+                path=str(tmp_path)).build(docs[:200])
+    vs = VectorStore(path=str(tmp_path), index_params={"min_vectors": 300, "nlist": 8}, hybrid=False)
+    vs.load()
+    assert vs.index_spec["type"] == "flat"
+    vs.add(docs[200:])
+    assert vs.index_spec["type"] == "ivf" and vs.index.ntotal == 400
+
+def test_empty_build_clears_store(tmp_path):
+    vs = VectorStore(index_type="flat", hybrid=False, path=str(tmp_path))
+    vs.build(corpus(10))
+    assert vs.build([])["chunks"] == 0
+    assert vs.index is None and not vs._shared
+    with pytest.raises(FileNotFoundError):
+        VectorStore(path=str(tmp_path)).load()
+    vs.build(corpus(5, "again "))
+    vs = VectorStore(path=str(tmp_path), hybrid=False)
+    vs.load()
+    assert vs.index.ntotal == 5 and vs._open_store().count() == 5
@@ -0,0 +1,49 @@
+"""
+Re-ranking score cache and adaptive cutoff (pytest): python -m pytest -q test_rerank.py
+"""
+import numpy as np
+
+from rerank import Reranker
+
+class FakeCrossEncoder:
+    """Scores a pair by how many query words the text contains; counts pairs scored."""
+    def __init__(self):
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs += len(pairs)
+        return np.array([sum(w in t for w in q.split()) / len(q.split()) for q, t in pairs], dtype="float32")
+
+def reranker(**options) -> Reranker:
+    r = Reranker(model_name="fake", **options)
+    r._model = FakeCrossEncoder()
+    return r
+
+def hits(*texts):
+    return [(0.5, {"id": f"c{i}", "text": t}) for i, t in enumerate(texts)]
+
+def test_scores_are_cached_per_query_and_text():
+    r = reranker()
+    pairs = [("user email", "user.email removed"), ("user email", "order total"), ("user email", "user.email removed")]
+    first = r.score(pairs)
+    assert r._model.pairs == 2 and first[0] == first[2] == 1.0  # duplicates scored once
+    # Same query / texts up to whitespace: no model call
+    again = r.score([("user  email", "user.email   removed"), ("user email", "order total")])
+    assert r._model.pairs == 2 and again.tolist() == first[:2].tolist()
+    assert (r.hits, r.misses) == (2, 2)
+
+def test_cache_is_bounded_lru():
+    r = reranker(cache_size=2)
+    r.score([("q", "a"), ("q", "b")])
+    r.score([("q", "a")])          # a is now the most recent
+    r.score([("q", "c")])          # evicts b
+    r.score([("q", "a"), ("q", "b")])
+    assert len(r.scores) == 2 and r._model.pairs == 4
+
+def test_rerank_orders_and_cuts_adaptively():
+    r = reranker(min_score=0.5)
+    out = r.rerank_batch(["user email", "nothing matches"],
+                         [hits("order total", "user.email removed", "email changed"), hits("a", "b")], top_k=3)
+    assert [m["id"] for _, m in out[0]] == ["c1", "c2"]  # order total scores 0
+    assert [m["id"] for _, m in out[1]] == ["c0"]        # the best hit is always kept
+    assert r.stats()["candidates"] == 5 and r.stats()["kept"] == 3
@@ -0,0 +1,43 @@
+"""
+Response cache tiers (pytest): python -m pytest -q test_response_cache.py
+"""
+import numpy as np
+
+from response_cache import ResponseCache, request_key
+
+def unit(*xs):
+    v = np.array(xs, dtype="float32")
+    return v / np.linalg.norm(v)
+
+def test_exact_tier_key_covers_every_part(tmp_path):
+    cache = ResponseCache(str(tmp_path / "rc.sqlite"))
+    key = request_key(kind="chat", model="m", temperature=0.3, prompt="p")
+    cache.put(key, "answer", "why")
+    assert request_key(prompt="p", temperature=0.3, model="m", kind="chat") == key  # argument order is irrelevant
+    entry, kind = cache.get(key)
+    assert (entry["answer"], entry["reasoning"], kind) == ("answer", "why", "exact")
+    assert cache.get(request_key(kind="chat", model="m", temperature=0.7, prompt="p")) == (None, None)
+
+def test_semantic_tier_within_scope(tmp_path):
+    cache = ResponseCache(str(tmp_path / "rc.sqlite"), threshold=0.95)
+    cache.put("k1", "answer", scope="s", vec=unit(1, 0, 0))
+    entry, kind = cache.get("k2", scope="s", vec=unit(1, 0.1, 0))  # cosine ~0.995
+    assert (entry["answer"], kind) == ("answer", "semantic")
+    assert cache.get("k3", scope="s", vec=unit(1, 1, 0)) == (None, None)  # cosine ~0.71
+    assert cache.get("k4", scope="other", vec=unit(1, 0, 0)) == (None, None)
+    assert cache.stats()["hits"] == 1 and cache.stats()["semantic_hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_entries_survive_restart_and_expire(tmp_path):
+    path = str(tmp_path / "rc.sqlite")
+    ResponseCache(path).put("k", "answer", scope="s", vec=unit(0, 1, 0))
+    reloaded = ResponseCache(path)
+    assert reloaded.get("k")[1] == "exact" and reloaded.get("x", scope="s", vec=unit(0, 1, 0))[1] == "semantic"
+    assert ResponseCache(path, ttl=0).get("k") == (None, None)
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "rc.sqlite"), max_items=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") == (None, None) and cache.get("a")[0]["answer"] == "1"
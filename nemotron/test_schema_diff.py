@@ -0,0 +1,44 @@
+"""
+Schema diff (pytest): python -m pytest -q test_schema_diff.py
+"""
+import io, json
+
+import pytest
+
+import schema_diff
+from schema_diff import diff_schemas, schema_types
+
+OLD = {"user": {"id": 1, "email": "a@b.c", "tags": ["x", "y"]},
+       "items": [{"price": 1.5, "sku": "A"}, {"price": None, "sku": "B"}],
+       "count": "3"}
+NEW = {"user": {"id": 1, "profile": {"email": "a@b.c"}, "tags": ["x"]},
+       "items": [{"price": 2, "sku": "A", "qty": 1}],
+       "count": 3}
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    # Same output with the streaming parser and without it
+    if request.param == "json":
+        monkeypatch.setattr(schema_diff, "ijson", None)
+    elif schema_diff.ijson is None:
+        pytest.skip("ijson not installed")
+
+def test_schema_types(parser):
+    assert schema_types(OLD) == {
+        "user": "object", "user.id": "number", "user.email": "string", "user.tags": "array",
+        "items": "array", "items[]": "object", "items[].price": "null|number", "items[].sku": "string",
+        "count": "string",
+    }
+
+def test_diff_report(parser):
+    report = diff_schemas(io.BytesIO(json.dumps(OLD).encode("utf-8")), json.dumps(NEW))
+    assert report["changes"] == [
+        {"kind": "REMOVED_FIELD", "path": "user.email", "oldType": "string"},
+        {"kind": "TYPE_CHANGED", "path": "items[].price", "oldType": "null|number", "newType": "number"},
+        {"kind": "TYPE_CHANGED", "path": "count", "oldType": "string", "newType": "number"},
+        {"kind": "ADDED_FIELD", "path": "user.profile", "newType": "object"},
+        {"kind": "ADDED_FIELD", "path": "user.profile.email", "newType": "string"},
+        {"kind": "ADDED_FIELD", "path": "items[].qty", "newType": "number"},
+    ]
+    assert report["summary"] == {"added": 3, "removed": 1, "risky": 3}
+    assert diff_schemas(OLD, OLD)["changes"] == []
@@ -0,0 +1,44 @@
+"""
+Chunk text compression (pytest): python -m pytest -q test_text_codec.py
+"""
+import pytest
+
+import hf
+import text_codec
+from hash_embed import HashingEmbedder
+from rag import VectorStore
+from text_codec import TextCodec
+
+TEXTS = [f"REMOVED: Field 'user.account{i % 9}.field{i}' (was string)\nTYPE CHANGED: 'order.total{i}' number -> object"
+         for i in range(300)] + ["", "ünïcödé 字段 ✅", "x" * 5000]
+
+CODECS = ["zlib"] + (["zstd"] if text_codec.zstandard is not None else [])
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip_through_persisted_dictionary(codec):
+    trained = TextCodec.train(TEXTS[:200], codec)
+    restored = TextCodec.from_info(trained.describe())  # what the store reads back
+    blobs = [trained.encode(t) for t in TEXTS]
+    assert [restored.decode(b) for b in blobs] == TEXTS
+    # The trained dictionary is what makes short chunks worth compressing
+    plain = TextCodec(codec)
+    assert sum(map(len, blobs[:300])) < 0.8 * sum(len(plain.encode(t)) for t in TEXTS[:300])
+    assert sum(map(len, blobs[:300])) < 0.8 * sum(len(t.encode("utf-8")) for t in TEXTS[:300])
+    assert restored.decode("plain text from before compression") == "plain text from before compression"
+
+def test_tiny_samples_still_round_trip():
+    for codec in CODECS:
+        c = TextCodec.train(["a"], codec)
+        assert c.decode(c.encode("short")) == "short"
+
+def test_store_reload_reads_compressed_texts(tmp_path, monkeypatch):
+    emb = HashingEmbedder()
+    monkeypatch.setattr(hf, "_compute_embeddings", lambda texts: (emb.embed(texts), "fallback"))
+    monkeypatch.setattr(hf, "get_embed_cache", lambda: None)
+    chunks = [{"id": f"d{i}#0", "text": t} for i, t in enumerate(TEXTS) if t]
+    VectorStore(index_type="flat", hybrid=False, path=str(tmp_path), text_compression="zlib").build(chunks)
+    vs = VectorStore(path=str(tmp_path), hybrid=False)
+    vs.load()
+    assert vs._open_store().codec.codec == "zlib"
+    hit = vs.search(chunks[42]["text"], 1)[0][1]
+    assert hit["id"] == "d42#0" and hit["text"] == chunks[42]["text"]
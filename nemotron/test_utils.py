@@ -0,0 +1,21 @@
+"""
+Folder chunking (pytest): python -m pytest -q test_utils.py
+"""
+import utils
+
+def write_docs(folder, n: int):
+    (folder / "sub").mkdir()
+    for i in range(n):
+        path = folder / ("sub" if i % 3 == 0 else "") / f"d{i}.md"
+        path.write_text(f"Field user.f{i} changed from string to integer.\n\n" * 60, encoding="utf-8")
+
+def test_parallel_chunks_match_serial_and_share_one_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "INGEST_WORKERS", 2)  # the parallel path even on a single core
+    write_docs(tmp_path, 40)
+    serial = list(utils.iter_chunks(utils.iter_text_files(str(tmp_path))))
+    # Oversized and varying worker counts only limit this ingest: the pool is never resized
+    assert list(utils.iter_chunks_parallel(str(tmp_path), 512)) == serial
+    pool = utils.get_chunk_pool()
+    assert pool._max_workers == 2
+    assert list(utils.iter_chunks_parallel(str(tmp_path), 2)) == serial
+    assert utils.get_chunk_pool() is pool
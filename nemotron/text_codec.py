@@ -0,0 +1,101 @@
+"""
+Chunk text compression with a dictionary shared by the whole store.
+
+Diff-report chunks are short and repeat the same field paths and phrases
+("REMOVED: Field '...' (was string)"), so compressing each one on its own
+gains little; a dictionary trained on a sample of the corpus carries the
+common parts once. zstd (zstandard) when installed, otherwise zlib with a
+preset dictionary (stdlib).
+"""
+import base64, zlib
+from collections import Counter
+from typing import Dict, List
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib with a preset dictionary instead
+    zstandard = None
+
+ZSTD_DICT_BYTES = 64 * 1024
+ZSTD_LEVEL = 9
+# zlib only looks back 32 KB, so a bigger preset dictionary is useless
+ZLIB_DICT_BYTES = 32 * 1024
+ZLIB_LEVEL = 9
+# Raw deflate: no per-chunk header / checksum, which matter at a few hundred bytes a chunk
+_ZLIB_WBITS = -15
+
+def _zlib_dictionary(samples: List[str], size: int) -> bytes:
+    """
+    Preset dictionary for zlib: the lines and words that recur across samples,
+    most valuable last (zlib encodes nearby matches with fewer bits).
+    """
+    counts: Counter = Counter()
+    for text in samples:
+        for line in set(text.splitlines()):
+            if len(line.strip()) > 3:
+                counts[line.strip()] += 1
+        for word in set(text.split()):
+            if len(word) > 3:
+                counts[word] += 1
+    scored = sorted(((n * len(s), s) for s, n in counts.items() if n > 1), reverse=True)
+    picked, total = [], 0
+    for _, s in scored:
+        piece = (s + "\n").encode("utf-8")
+        if total + len(piece) > size:
+            continue
+        picked.append(piece)
+        total += len(piece)
+    return b"".join(reversed(picked))
+
+class TextCodec:
+    """Compresses chunk texts to bytes and back; describe() is what the store persists."""
+    def __init__(self, codec: str, dictionary: bytes = b""):
+        if codec == "zstd" and zstandard is None:
+            raise RuntimeError("This store's texts are zstd-compressed: pip install zstandard")
+        if codec not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown text codec: {codec}")
+        self.codec = codec
+        self.dictionary = dictionary
+        if codec == "zstd":
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zdict, write_dict_id=False)
+            self._d = zstandard.ZstdDecompressor(dict_data=zdict)
+
+    @classmethod
+    def train(cls, samples: List[str], codec: str = "auto") -> "TextCodec":
+        """Codec with a dictionary fitted to samples (e.g. the first ingest batch)."""
+        if codec == "auto":
+            codec = "zstd" if zstandard is not None else "zlib"
+        if codec == "zlib":
+            return cls("zlib", _zlib_dictionary(samples, ZLIB_DICT_BYTES))
+        if zstandard is None:
+            raise RuntimeError("TEXT_COMPRESSION=zstd needs the zstandard package (or use auto / zlib)")
+        try:
+            trained = zstandard.train_dictionary(ZSTD_DICT_BYTES, [s.encode("utf-8") for s in samples])
+            return cls("zstd", trained.as_bytes())
+        except zstandard.ZstdError:
+            # Too few / too small samples to train on: plain zstd
+            return cls("zstd")
+
+    @classmethod
+    def from_info(cls, info: Dict) -> "TextCodec":
+        return cls(info["codec"], base64.b64decode(info["dict"]))
+
+    def describe(self) -> Dict:
+        return {"codec": self.codec, "dict": base64.b64encode(self.dictionary).decode("ascii")}
+
+    def encode(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        if self.codec == "zstd":
+            return self._c.compress(data)
+        c = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, _ZLIB_WBITS, zdict=self.dictionary)
+        return c.compress(data) + c.flush()
+
+    def decode(self, value) -> str:
+        # Rows written before compression was enabled are still plain text
+        if isinstance(value, str):
+            return value
+        if self.codec == "zstd":
+            return self._d.decompress(value).decode("utf-8")
+        d = zlib.decompressobj(_ZLIB_WBITS, zdict=self.dictionary)
+        return (d.decompress(value) + d.flush()).decode("utf-8")
@@ -1,17 +1,138 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-import os, glob
+import os, re, glob, time, atexit, hashlib, threading, multiprocessing
 
-def load_text_files(folder: str) -> List[Dict]:
+from hf import count_tokens
+from metrics import CHUNK_SECONDS
+
+# Processes chunking folder ingests (0 = one per core; never more than the cores)
+INGEST_WORKERS = min(int(os.getenv("INGEST_WORKERS", "0")) or (os.cpu_count() or 1), os.cpu_count() or 1)
+# Threads reading folder-ingest files ahead of the chunking processes
+INGEST_READ_THREADS = int(os.getenv("INGEST_READ_THREADS", "8"))
+
+# "token": boundary-aware token_chunk, "char": legacy simple_chunk
+CHUNKER = os.getenv("CHUNKER", "token")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "128"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "16"))
+
+def list_text_files(folder: str) -> List[str]:
     paths = sorted(glob.glob(os.path.join(folder, "**", "*.*"), recursive=True))
-    texts = []
-    for p in paths:
-        ext = os.path.splitext(p)[1].lower()
-        if ext in [".txt", ".md"]:
-            with open(p, "r", encoding="utf-8", errors="ignore") as f:
-                texts.append({"id": os.path.relpath(p, folder), "text": f.read()})
-        # Add PDF later with pypdf
-    return texts
+    # Add PDF later with pypdf
+    return [p for p in paths if os.path.splitext(p)[1].lower() in [".txt", ".md"]]
+
+def iter_text_files(folder: str) -> Iterator[Dict]:
+    """
+    Yields {"id", "text"} one file at a time, so only one document is in memory.
+    """
+    for p in list_text_files(folder):
+        with open(p, "r", encoding="utf-8", errors="ignore") as f:
+            yield {"id": os.path.relpath(p, folder), "text": f.read()}
+
+def load_text_files(folder: str) -> List[Dict]:
+    return list(iter_text_files(folder))
+
+def iter_chunks(docs: Iterable[Dict]) -> Iterator[Dict[str, str]]:
+    """
+    Streams {"id": "doc#i", "text": ...} chunks out of documents.
+    """
+    for d in docs:
+        start = time.perf_counter()
+        pieces = chunk_text(d["text"])
+        CHUNK_SECONDS.observe(time.perf_counter() - start)
+        for i, ch in enumerate(pieces):
+            yield {"id": d["id"] + f"#{i}", "text": ch}
+
+def dedupe_chunks(chunks: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+    """
+    Drops chunks whose (whitespace-normalized) text was already yielded,
+    so boilerplate repeated across documents is embedded and stored once.
+    """
+    seen = set()
+    for c in chunks:
+        h = hashlib.sha1(" ".join(c["text"].split()).encode("utf-8")).digest()
+        if h in seen:
+            continue
+        seen.add(h)
+        yield c
+
+def chunk_text(text: str) -> List[str]:
+    if CHUNKER == "char":
+        return simple_chunk(text)
+    return token_chunk(text)
+
+def _chunk_doc(doc_id: str, text: str) -> Tuple[List[Dict[str, str]], float]:
+    # Runs in a worker process: chunk one file (the parent records the time)
+    start = time.perf_counter()
+    chunks = list(iter_chunks([{"id": doc_id, "text": text}]))
+    return chunks, time.perf_counter() - start
+
+_chunk_pool_lock = threading.Lock()
+
+def get_chunk_pool() -> ProcessPoolExecutor:
+    """The process-wide chunking pool (INGEST_WORKERS processes), shared by concurrent ingests."""
+    with _chunk_pool_lock:
+        if not hasattr(get_chunk_pool, "_pool"):
+            # Not fork: the server process has threads (event loop executors, HTTP clients) whose
+            # locks a forked child could inherit held. The fork server imports this module once.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            ctx = multiprocessing.get_context(method)
+            if method == "forkserver":
+                ctx.set_forkserver_preload([__name__])
+            get_chunk_pool._pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=ctx)
+        return get_chunk_pool._pool
+
+@atexit.register
+def _shutdown_chunk_pool():
+    pool = getattr(get_chunk_pool, "_pool", None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def iter_chunks_parallel(folder: str, workers: int | None = None) -> Iterator[Dict[str, str]]:
+    """
+    Like iter_chunks(iter_text_files(folder)), but files are read by a thread pool
+    and chunked in the shared process pool. workers (clamped to 1..INGEST_WORKERS)
+    caps how many files this ingest has in the pool at once. Results come back in
+    file order and at most 4 files per worker are in flight, so memory stays bounded
+    on huge folders.
+    """
+    workers = max(1, min(workers or INGEST_WORKERS, INGEST_WORKERS))
+    paths = list_text_files(folder)
+    if workers <= 1 or len(paths) <= 1:
+        yield from iter_chunks(iter_text_files(folder))
+        return
+
+    pool = get_chunk_pool()
+    readers = ThreadPoolExecutor(max_workers=INGEST_READ_THREADS, thread_name_prefix="ingest-read")
+    slots = threading.BoundedSemaphore(workers)
+    def read_and_chunk(path: str):
+        # Reader thread: the file I/O, then hand the text to a chunking process
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        slots.acquire()
+        fut = pool.submit(_chunk_doc, os.path.relpath(path, folder), text)
+        fut.add_done_callback(lambda _: slots.release())
+        return fut
+    todo = iter(paths)
+    window = deque()
+    def submit():
+        p = next(todo, None)
+        if p is not None:
+            window.append(readers.submit(read_and_chunk, p))
+    for _ in range(workers * 4):
+        submit()
+    try:
+        while window:
+            chunks, seconds = window.popleft().result().result()
+            CHUNK_SECONDS.observe(seconds)
+            submit()
+            yield from chunks
+    finally:
+        for fut in window:
+            if not fut.cancel() and fut.done() and fut.exception() is None:
+                fut.result().cancel()
+        readers.shutdown(wait=False, cancel_futures=True)
 
 def simple_chunk(text: str, chunk_size: int = 900, overlap: int = 150) -> List[str]:
     """
@@ -29,6 +150,91 @@ def simple_chunk(text: str, chunk_size: int = 900, overlap: int = 150) -> List[s
         if i <= 0: break
     return [c for c in chunks if c]
 
+# Markdown headings start a new block; ==== / ---- underlines stay with the line above
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s")
+# Split overlong lines only after whitespace or commas, so field paths like
+# user.address.zip or items[].price are never cut in half
+_SPLIT_RE = re.compile(r"(?<=[\s,])")
+
+def _blocks(text: str) -> List[List[str]]:
+    blocks, cur = [], []
+    for line in text.splitlines():
+        if not line.strip() or (_HEADING_RE.match(line) and cur):
+            if cur:
+                blocks.append(cur)
+            cur = [line] if line.strip() else []
+            continue
+        cur.append(line.rstrip())
+    if cur:
+        blocks.append(cur)
+    return blocks
+
+def _split_long(line: str, max_tokens: int) -> List[Tuple[str, int]]:
+    pieces = [p for p in _SPLIT_RE.split(line) if p]
+    out, cur, n = [], "", 0
+    for piece, k in zip(pieces, count_tokens(pieces)):
+        if cur and n + k > max_tokens:
+            out.append((cur.strip(), n))
+            cur, n = "", 0
+        cur += piece
+        n += k
+    if cur.strip():
+        out.append((cur.strip(), n))
+    return out
+
+def token_chunk(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Token-aware chunker. Packs whole blocks (paragraphs / sections separated by
+    blank lines), then whole lines, into chunks of at most max_tokens tokens of
+    the embedding model's tokenizer. Only a single line longer than the budget is
+    split, and only at whitespace/commas. Up to overlap_tokens of trailing
+    lines/blocks are repeated at the start of the next chunk.
+    """
+    if not text or not text.strip():
+        return []
+    blocks = _blocks(text)
+    joined = ["\n".join(b) for b in blocks]
+    # units: (text, tokens, separator before it)
+    units: List[Tuple[str, int, str]] = []
+    for lines, block, n in zip(blocks, joined, count_tokens(joined)):
+        if n <= max_tokens:
+            units.append((block, n, "\n\n"))
+            continue
+        for j, (line, ln) in enumerate(zip(lines, count_tokens(lines))):
+            sep = "\n\n" if j == 0 else "\n"
+            if ln <= max_tokens:
+                units.append((line, ln, sep))
+            else:
+                for k, (piece, pn) in enumerate(_split_long(line, max_tokens)):
+                    units.append((piece, pn, sep if k == 0 else " "))
+
+    chunks: List[str] = []
+    cur: List[Tuple[str, int, str]] = []
+    cur_n = 0
+    for u in units:
+        if cur and cur_n + u[1] > max_tokens:
+            chunks.append(_join_units(cur))
+            carry, carry_n = [], 0
+            for prev in reversed(cur):
+                if carry_n + prev[1] > overlap_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_n += prev[1]
+            if carry_n + u[1] > max_tokens:
+                carry, carry_n = [], 0
+            cur, cur_n = carry, carry_n
+        cur.append(u)
+        cur_n += u[1]
+    if cur:
+        chunks.append(_join_units(cur))
+    return [c for c in chunks if c]
+
+def _join_units(units: List[Tuple[str, int, str]]) -> str:
+    out = units[0][0]
+    for text, _, sep in units[1:]:
+        out += sep + text
+    return out.strip()
+
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     denom = (np.linalg.norm(a) * np.linalg.norm(b)) + 1e-8
     return float(np.dot(a, b) / denom)